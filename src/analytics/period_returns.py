@@ -0,0 +1,200 @@
+# period_returns.py
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from src.db_connection import get_snowflake_connection
+from src.query_cache import cached_read_sql
+
+PERFORMANCE_TABLE = "PORTFOLIOPERFORMANCE"
+DEFAULT_PERFORMANCE_TYPE = "Net Return"
+PERIOD_RETURNS_CSV = os.path.join("output", "period_returns.csv")
+
+# Trailing periods in years; periods of a year or more are annualized
+TRAILING_YEARS = {"1Y": 1, "3Y": 3, "5Y": 5, "10Y": 10}
+
+def fetch_performance(conn, performance_type=DEFAULT_PERFORMANCE_TYPE):
+    """Read every PERFORMANCEFACTOR of one PERFORMANCETYPE in a single query."""
+    query = f"""
+        SELECT PORTFOLIOCODE, HISTORYDATE, PERFORMANCEINCEPTIONDATE, PERFORMANCEFACTOR
+        FROM {PERFORMANCE_TABLE}
+        WHERE PERFORMANCETYPE = %(performance_type)s
+    """
+    return cached_read_sql(query, conn, params={"performance_type": performance_type}, categories=["PORTFOLIOCODE"])
+
+class PerformanceMatrix:
+    """
+    Portfolio x date matrix of log returns with cumulative log-return indexes.
+
+    Each HISTORYDATE is the end of the period its PERFORMANCEFACTOR covers.
+    cum_log[p, k] holds the summed log returns of portfolio p over the first k
+    dates, so the compounded return over dates i..j-1 for every portfolio is
+
+        exp(cum_log[:, j] - cum_log[:, i]) - 1
+
+    which makes any period return a vectorized lookup instead of a loop over
+    portfolios. Dates missing inside a portfolio's history count as a zero
+    return; dates before its first or after its last row are outside its
+    history and make periods that need them NaN.
+    """
+    def __init__(self, portfolios, dates, log_returns, first_idx, last_idx, inception_dates=None, num_periods=None):
+        self.portfolios = pd.Index(portfolios, name="PORTFOLIOCODE")
+        self.dates = pd.DatetimeIndex(dates)
+        self.log_returns = log_returns
+        self.cum_log = np.concatenate(
+            [np.zeros((len(self.portfolios), 1)), np.cumsum(log_returns, axis=1)], axis=1
+        )
+        self.first_idx = first_idx
+        self.last_idx = last_idx
+        if inception_dates is None:
+            inception_dates = self.dates[np.minimum(first_idx, len(self.dates) - 1)]
+        self.inception_dates = pd.DatetimeIndex(inception_dates)
+        # Return rows per portfolio; without it every date in its history counts as one
+        self.num_periods = np.asarray(num_periods if num_periods is not None else np.maximum(last_idx - first_idx + 1, 0))
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build the matrix from PORTFOLIOCODE, HISTORYDATE, PERFORMANCEFACTOR rows.
+        Duplicate (portfolio, date) rows keep the last one. The earliest
+        PERFORMANCEINCEPTIONDATE per portfolio is used when the column is
+        present, otherwise its first HISTORYDATE.
+        """
+        df = df.dropna(subset=["PERFORMANCEFACTOR"]).drop_duplicates(["PORTFOLIOCODE", "HISTORYDATE"], keep="last")
+        portfolio_codes, portfolios = pd.factorize(df["PORTFOLIOCODE"].astype(str), sort=True)
+        date_codes, dates = pd.factorize(pd.to_datetime(df["HISTORYDATE"]), sort=True)
+
+        log_returns = np.zeros((len(portfolios), len(dates)))
+        log_returns[portfolio_codes, date_codes] = np.log1p(df["PERFORMANCEFACTOR"].to_numpy(dtype=float))
+
+        first_idx = np.full(len(portfolios), len(dates))
+        last_idx = np.full(len(portfolios), -1)
+        np.minimum.at(first_idx, portfolio_codes, date_codes)
+        np.maximum.at(last_idx, portfolio_codes, date_codes)
+
+        inception_dates = None
+        if "PERFORMANCEINCEPTIONDATE" in df.columns:
+            inception = pd.to_datetime(df["PERFORMANCEINCEPTIONDATE"]).groupby(portfolio_codes).min()
+            inception_dates = inception.reindex(range(len(portfolios))).fillna(
+                pd.Series(dates[np.minimum(first_idx, len(dates) - 1)])
+            )
+        num_periods = np.bincount(portfolio_codes, minlength=len(portfolios))
+        return cls(portfolios, dates, log_returns, first_idx, last_idx, inception_dates, num_periods)
+
+    def _position(self, date):
+        """Number of matrix dates on or before date."""
+        return int(self.dates.searchsorted(pd.Timestamp(date), side="right"))
+
+    def _spacing_days(self):
+        """Average days between each portfolio's returns, or between matrix dates when it has only one."""
+        last_position = len(self.dates) - 1
+        history_days = (
+            self.dates[np.clip(self.last_idx, 0, last_position)] - self.dates[np.minimum(self.first_idx, last_position)]
+        ).days.to_numpy()
+        matrix_spacing = (self.dates[-1] - self.dates[0]).days / last_position if last_position > 0 else np.nan
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.num_periods > 1, history_days / (self.num_periods - 1), matrix_spacing)
+
+    def cumulative_return(self, start, end):
+        """
+        Compounded return of every portfolio over dates after start up to and including end.
+
+        Portfolios whose history does not cover the whole window get NaN,
+        including those whose first return period starts after the window does.
+
+        Returns:
+            Series: PORTFOLIOCODE -> return.
+        """
+        i, j = self._position(start), self._position(end)
+        values = np.expm1(self.cum_log[:, j] - self.cum_log[:, i])
+        covered = (self.first_idx <= i) & (self.last_idx >= j - 1) & (j > i)
+        if i < len(self.dates):
+            # A first return at date i only reaches back one of the portfolio's own periods
+            gap_days = (self.dates[i] - pd.Timestamp(start)).days
+            covered &= (self.first_idx < i) | (gap_days < 1.5 * self._spacing_days())
+        return pd.Series(np.where(covered, values, np.nan), index=self.portfolios)
+
+    def annualized_return(self, end, years):
+        """Return over the trailing years up to end, annualized for every portfolio."""
+        end = pd.Timestamp(end)
+        total = self.cumulative_return(end - pd.DateOffset(years=years), end)
+        return (1 + total) ** (1 / years) - 1
+
+    def since_inception(self, as_of):
+        """
+        Cumulative return of every portfolio from its first return through
+        as_of, and the same figure annualized once the returns span a year.
+
+        Each HISTORYDATE ends a period, so the first date is already one period
+        after inception. The span is therefore counted in return periods, at
+        each portfolio's own spacing, and divided by its periods per year:
+        12 monthly returns are exactly one year.
+        """
+        j = self._position(as_of)
+        rows = np.arange(len(self.portfolios))
+        values = np.expm1(self.cum_log[rows, j] - self.cum_log[rows, np.minimum(self.first_idx, j)])
+        cumulative = np.where((self.first_idx < j) & (self.last_idx >= j - 1), values, np.nan)
+
+        first_date = self.dates[np.minimum(self.first_idx, len(self.dates) - 1)]
+        elapsed_days = (self.dates[max(j - 1, 0)] - first_date).days.to_numpy()
+        spacing = self._spacing_days()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            periods = np.round(elapsed_days / spacing) + 1
+            years = periods / np.round(365.25 / spacing)
+        annualized = np.where(years >= 1, (1 + cumulative) ** (1 / np.where(years >= 1, years, 1)) - 1, cumulative)
+        return pd.DataFrame(
+            {"SI": cumulative, "SI_ANN": annualized, "INCEPTIONDATE": self.inception_dates}, index=self.portfolios
+        )
+
+    def period_returns(self, as_of=None):
+        """
+        Fact sheet returns for every portfolio as of one date.
+
+        MTD, QTD and YTD are cumulative; 1Y, 3Y, 5Y and 10Y are annualized;
+        SI is cumulative since inception and SI_ANN annualized once the
+        history spans a year. as_of defaults to the latest date in the matrix.
+
+        Returns:
+            DataFrame: One row per PORTFOLIOCODE.
+        """
+        as_of = pd.Timestamp(as_of) if as_of is not None else self.dates[-1]
+        month_start = as_of.to_period("M").start_time
+        quarter_start = as_of.to_period("Q").start_time
+        year_start = as_of.to_period("Y").start_time
+        day = pd.Timedelta(days=1)
+
+        result = pd.DataFrame({
+            "MTD": self.cumulative_return(month_start - day, as_of),
+            "QTD": self.cumulative_return(quarter_start - day, as_of),
+            "YTD": self.cumulative_return(year_start - day, as_of),
+        })
+        for label, years in TRAILING_YEARS.items():
+            result[label] = self.annualized_return(as_of, years)
+        result = result.join(self.since_inception(as_of))
+        result["ASOFDATE"] = as_of
+        return result
+
+def load_performance_matrix(conn, performance_type=DEFAULT_PERFORMANCE_TYPE):
+    """Read PORTFOLIOPERFORMANCE once and build the matrix."""
+    return PerformanceMatrix.from_frame(fetch_performance(conn, performance_type))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute fact sheet period returns for every portfolio.")
+    parser.add_argument("--as-of", default=None, help="Report date (YYYY-MM-DD); defaults to the latest HISTORYDATE")
+    parser.add_argument("--performance-type", default=DEFAULT_PERFORMANCE_TYPE)
+    parser.add_argument("--output", default=PERIOD_RETURNS_CSV, help="CSV file to write")
+    args = parser.parse_args()
+
+    conn = get_snowflake_connection()
+    matrix = load_performance_matrix(conn, args.performance_type)
+    conn.close()
+    print(f"Loaded {len(matrix.portfolios)} portfolios x {len(matrix.dates)} dates")
+
+    returns = matrix.period_returns(args.as_of)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    returns.to_csv(args.output)
+    print(f"Wrote period returns for {len(returns)} portfolios to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# risk_statistics.py
+
+import argparse
+import numpy as np
+import pandas as pd
+from src.db_connection import get_snowflake_connection, fetch_dataframe
+from src.query_cache import cached_read_sql
+from src.analytics.period_returns import DEFAULT_PERFORMANCE_TYPE, fetch_performance
+from src.insert_generate_data.generate_insert_benchmark_returns import MONTHLY_RETURN_TYPE
+from src.insert_generate_data.generate_insert_correlated_performance import fetch_associations
+
+BENCHMARK_TABLE = "BENCHMARKPERFORMANCE"
+RISK_TABLE = "PORTFOLIORISKSTATISTICS"
+ROLLING_WINDOWS = (12, 36, 60)
+RISK_FREE_RATE = 0.0  # Annual; no risk-free series is loaded, override per run if needed
+STAT_COLUMNS = [
+    "ANNUALIZEDRETURN", "VOLATILITY", "TRACKINGERROR", "INFORMATIONRATIO",
+    "BETA", "ALPHA", "SHARPERATIO", "MAXDRAWDOWN",
+]
+
+def fetch_benchmark_monthly_returns(conn):
+    """Month-end benchmark returns derived by generate_insert_benchmark_returns."""
+    query = f"""
+        SELECT BENCHMARKCODE, HISTORYDATE, VALUE
+        FROM {BENCHMARK_TABLE}
+        WHERE PERFORMANCEDATATYPE = %(monthly)s
+    """
+    return cached_read_sql(query, conn, params={"monthly": MONTHLY_RETURN_TYPE}, categories=["BENCHMARKCODE"])
+
+def fetch_risk_watermarks(conn):
+    """Latest stored window end per portfolio."""
+    query = f"SELECT PORTFOLIOCODE, MAX(HISTORYDATE) AS MAX_DATE FROM {RISK_TABLE} GROUP BY PORTFOLIOCODE"
+    df = fetch_dataframe(query, conn)
+    return dict(zip(df["PORTFOLIOCODE"], pd.to_datetime(df["MAX_DATE"])))
+
+def align_returns(performance, benchmark_returns, associations):
+    """
+    Align portfolio and benchmark monthly returns on one month grid.
+
+    Rows are matched by calendar month of HISTORYDATE, since portfolio returns
+    are dated on their generation day and benchmark returns at month end.
+    Portfolios without an associated benchmark series are dropped.
+
+    Returns:
+        portfolios (pd.Index): Portfolio codes, in matrix row order.
+        benchmarks (np.ndarray): (P,) benchmark code of each portfolio.
+        months (pd.PeriodIndex): (T,) month grid.
+        portfolio_returns, benchmark_returns (np.ndarray): (P, T) simple returns, NaN where missing.
+    """
+    perf_month = pd.to_datetime(performance["HISTORYDATE"]).dt.to_period("M")
+    bench_month = pd.to_datetime(benchmark_returns["HISTORYDATE"]).dt.to_period("M")
+    months = pd.period_range(min(perf_month.min(), bench_month.min()), max(perf_month.max(), bench_month.max()), freq="M")
+
+    bench_idx, bench_codes = pd.factorize(benchmark_returns["BENCHMARKCODE"].astype(str), sort=True)
+    bench_matrix = np.full((len(bench_codes), len(months)), np.nan)
+    bench_matrix[bench_idx, months.get_indexer(bench_month)] = benchmark_returns["VALUE"].to_numpy(dtype=float)
+
+    mapping = pd.Series(
+        associations["BENCHMARKCODE"].astype(str).to_numpy(), index=associations["PORTFOLIOCODE"].astype(str)
+    )
+    mapping = mapping[mapping.isin(bench_codes)]
+    codes = performance["PORTFOLIOCODE"].astype(str)
+    keep = codes.isin(mapping.index).to_numpy()
+    print(f"Aligned {codes[keep].nunique()} portfolios; {codes[~keep].nunique()} have no benchmark returns")
+
+    portfolio_idx, portfolios = pd.factorize(codes[keep], sort=True)
+    portfolio_matrix = np.full((len(portfolios), len(months)), np.nan)
+    portfolio_matrix[portfolio_idx, months.get_indexer(perf_month[keep])] = (
+        performance["PERFORMANCEFACTOR"].to_numpy(dtype=float)[keep]
+    )
+
+    benchmarks = mapping.reindex(portfolios).to_numpy()
+    aligned_bench = bench_matrix[pd.Index(bench_codes).get_indexer(benchmarks)]
+    return pd.Index(portfolios, name="PORTFOLIOCODE"), benchmarks, months, portfolio_matrix, aligned_bench
+
+def _rolling_sum(values, window):
+    """Trailing window sums along axis 1; the first window - 1 columns are NaN."""
+    cumulative = np.concatenate([np.zeros((values.shape[0], 1)), np.cumsum(values, axis=1)], axis=1)
+    sums = np.full(values.shape, np.nan)
+    sums[:, window - 1:] = cumulative[:, window:] - cumulative[:, :-window]
+    return sums
+
+def _rolling_max_drawdown(log_wealth, window):
+    """
+    Worst peak-to-trough loss inside every trailing window, for all portfolios at once.
+
+    Loops over positions within the window (at most 60), not over portfolios or
+    window ends, so each step is one vectorized operation on the (P, T) grid.
+    """
+    num_portfolios, num_points = log_wealth.shape
+    drawdown = np.full((num_portfolios, num_points - 1), np.nan)
+    if num_points - 1 < window:
+        return drawdown
+    ends = np.arange(window - 1, num_points - 1)
+    running_max = log_wealth[:, ends - window + 1]
+    worst = np.zeros_like(running_max)
+    for offset in range(1, window + 1):
+        level = log_wealth[:, ends - window + 1 + offset]
+        running_max = np.maximum(running_max, level)
+        worst = np.maximum(worst, running_max - level)
+    drawdown[:, window - 1:] = np.expm1(-worst)
+    return drawdown
+
+def compute_rolling_statistics(portfolio_returns, benchmark_returns, windows=ROLLING_WINDOWS, risk_free_rate=RISK_FREE_RATE):
+    """
+    Rolling risk statistics for every portfolio, window end and window length.
+
+    All moments come from cumulative sums of the aligned (P, T) matrices, so
+    each window length costs a handful of array subtractions regardless of how
+    many portfolios or months there are. A window is only reported when both
+    series have all of its months.
+
+    Returns:
+        dict: window -> {statistic name -> (P, T) array}, NaN where the window is incomplete.
+    """
+    valid = ~np.isnan(portfolio_returns) & ~np.isnan(benchmark_returns)
+    r = np.where(valid, portfolio_returns, 0.0)
+    b = np.where(valid, benchmark_returns, 0.0)
+    active = r - b
+    rf = (1 + risk_free_rate) ** (1 / 12) - 1
+    log_wealth = np.concatenate([np.zeros((r.shape[0], 1)), np.cumsum(np.log1p(r), axis=1)], axis=1)
+
+    results = {}
+    for window in windows:
+        complete = _rolling_sum(valid.astype(float), window) == window
+        n = float(window)
+        sum_r, sum_b, sum_a = (_rolling_sum(x, window) for x in (r, b, active))
+        mean_r, mean_b, mean_a = sum_r / n, sum_b / n, sum_a / n
+        var_r = np.clip((_rolling_sum(r * r, window) - n * mean_r ** 2) / (n - 1), 0.0, None)
+        var_b = np.clip((_rolling_sum(b * b, window) - n * mean_b ** 2) / (n - 1), 0.0, None)
+        var_a = np.clip((_rolling_sum(active * active, window) - n * mean_a ** 2) / (n - 1), 0.0, None)
+        cov_rb = (_rolling_sum(r * b, window) - n * mean_r * mean_b) / (n - 1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            volatility = np.sqrt(var_r * 12)
+            tracking_error = np.sqrt(var_a * 12)
+            beta = cov_rb / var_b
+            stats = {
+                "ANNUALIZEDRETURN": np.expm1(_rolling_sum(np.log1p(r), window) * 12 / n),
+                "VOLATILITY": volatility,
+                "TRACKINGERROR": tracking_error,
+                "INFORMATIONRATIO": mean_a * 12 / tracking_error,
+                "BETA": beta,
+                "ALPHA": (mean_r - rf - beta * (mean_b - rf)) * 12,
+                "SHARPERATIO": (mean_r - rf) * 12 / volatility,
+                "MAXDRAWDOWN": _rolling_max_drawdown(log_wealth, window),
+            }
+        results[window] = {
+            name: np.where(complete & np.isfinite(values), values, np.nan) for name, values in stats.items()
+        }
+    return results
+
+def risk_statistics_frame(portfolios, benchmarks, months, results, watermarks=None):
+    """
+    Long PORTFOLIORISKSTATISTICS rows for every complete window, keeping only
+    window ends after each portfolio's watermark.
+    """
+    month_ends = months.to_timestamp(how="end").normalize()
+    marks = pd.Series(watermarks or {}, dtype="datetime64[ns]").reindex(portfolios)
+    mark_values = marks.fillna(pd.Timestamp.min).to_numpy()
+
+    frames = []
+    for window, stats in results.items():
+        complete = ~np.isnan(stats["ANNUALIZEDRETURN"]) & (month_ends.to_numpy()[None, :] > mark_values[:, None])
+        rows, cols = np.nonzero(complete)
+        frame = pd.DataFrame({
+            "PORTFOLIOCODE": portfolios[rows],
+            "BENCHMARKCODE": benchmarks[rows],
+            "HISTORYDATE": month_ends[cols],
+            "WINDOWMONTHS": window,
+        })
+        for name in STAT_COLUMNS:
+            frame[name] = np.round(stats[name][rows, cols], 8)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+def insert_risk_statistics(conn, df):
+    columns = ["PORTFOLIOCODE", "BENCHMARKCODE", "HISTORYDATE", "WINDOWMONTHS"] + STAT_COLUMNS
+    insert_sql = f"INSERT INTO {RISK_TABLE} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    df = df[columns].copy()
+    df["HISTORYDATE"] = pd.to_datetime(df["HISTORYDATE"]).dt.date
+    rows = df.astype(object).where(df.notna(), None).values.tolist()
+    with conn.cursor() as cur:
+        cur.executemany(insert_sql, rows)
+    conn.commit()
+    print(f"Inserted {len(rows)} rows into {RISK_TABLE}.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute rolling risk statistics versus each portfolio's benchmark.")
+    parser.add_argument("--performance-type", default=DEFAULT_PERFORMANCE_TYPE)
+    parser.add_argument("--risk-free-rate", type=float, default=RISK_FREE_RATE, help="Annual rate for Sharpe and alpha")
+    args = parser.parse_args()
+
+    conn = get_snowflake_connection()
+    if conn is None:
+        print("Failed to connect to Snowflake.")
+        return
+
+    try:
+        portfolios, benchmarks, months, portfolio_returns, benchmark_returns = align_returns(
+            fetch_performance(conn, args.performance_type),
+            fetch_benchmark_monthly_returns(conn),
+            fetch_associations(conn),
+        )
+        results = compute_rolling_statistics(portfolio_returns, benchmark_returns, risk_free_rate=args.risk_free_rate)
+        df = risk_statistics_frame(portfolios, benchmarks, months, results, fetch_risk_watermarks(conn))
+        if df.empty:
+            print("No new risk statistics to store.")
+            return
+        insert_risk_statistics(conn, df)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
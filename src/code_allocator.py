@@ -0,0 +1,135 @@
+# code_allocator.py
+
+import threading
+
+# Code formats: prefix + zero-padded number. Each format is backed by its own
+# Snowflake sequence whose INCREMENT is the block size, so one NEXTVAL
+# reserves a whole block of numbers. Offline (worker) codes use their own
+# prefix plus a run tag, so they never share a number space with sequence
+# codes or with earlier offline runs.
+CODE_FORMATS = {
+    "portfolio": {"prefix": "NVLN", "offline_prefix": "NVLX", "width": 6, "sequence": "PORTFOLIOCODE_SEQ"},
+    "product": {"prefix": "NOV", "offline_prefix": "NOX", "width": 6, "sequence": "PRODUCTCODE_SEQ"},
+}
+DEFAULT_BLOCK_SIZE = 100
+
+class SnowflakeBlockSource:
+    """
+    Reserves blocks from a Snowflake sequence; the block size is the sequence's INCREMENT.
+    Sequence values are unique across sessions, so concurrent generators never overlap.
+    """
+    def __init__(self, conn, sequence_name):
+        self.conn = conn
+        self.sequence_name = sequence_name
+        self._block_size = None
+
+    @property
+    def block_size(self):
+        """The sequence's INCREMENT, read once; a block larger than it would overlap the next NEXTVAL."""
+        if self._block_size is None:
+            with self.conn.cursor() as cur:
+                cur.execute(f"SHOW SEQUENCES LIKE '{self.sequence_name}'")
+                row = cur.fetchone()
+                if row is None:
+                    raise ValueError(f"Sequence {self.sequence_name} not found; run create_code_sequences.py")
+                columns = [column[0].lower() for column in cur.description]
+            self._block_size = int(row[columns.index("interval")])
+        return self._block_size
+
+    def reserve_block(self):
+        with self.conn.cursor() as cur:
+            cur.execute(f"SELECT {self.sequence_name}.NEXTVAL")
+            start = cur.fetchone()[0]
+        return start, start + self.block_size
+
+    def reserve_blocks(self, num_blocks):
+        """Reserve num_blocks blocks with one GENERATOR query instead of one NEXTVAL round trip each."""
+        with self.conn.cursor() as cur:
+            cur.execute(f"SELECT {self.sequence_name}.NEXTVAL FROM TABLE(GENERATOR(ROWCOUNT => {int(num_blocks)}))")
+            starts = sorted(row[0] for row in cur.fetchall())
+        return [(start, start + self.block_size) for start in starts]
+
+class WorkerBlockSource:
+    """
+    Offline block source: worker worker_index of num_workers takes every
+    num_workers-th block, so workers never overlap without talking to each other.
+    Numbers restart at start on every run, so codes are only unique together
+    with the run tag CodeAllocator.for_worker puts in the prefix.
+    """
+    def __init__(self, worker_index, num_workers, block_size=DEFAULT_BLOCK_SIZE, start=0):
+        self.worker_index = worker_index
+        self.num_workers = num_workers
+        self.block_size = block_size
+        self.start = start
+        self._blocks_taken = 0
+
+    def reserve_block(self):
+        block_number = self._blocks_taken * self.num_workers + self.worker_index
+        self._blocks_taken += 1
+        start = self.start + block_number * self.block_size
+        return start, start + self.block_size
+
+    def reserve_blocks(self, num_blocks):
+        return [self.reserve_block() for _ in range(num_blocks)]
+
+class CodeAllocator:
+    """
+    Issues unique codes like NVLN000123 in O(1) from a locally reserved block.
+    A new block is reserved only when the current one is used up, and existing
+    codes never need to be loaded.
+    """
+    def __init__(self, source, prefix, width):
+        self.source = source
+        self.prefix = prefix
+        self.width = width
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_snowflake(cls, conn, code_type):
+        fmt = CODE_FORMATS[code_type]
+        source = SnowflakeBlockSource(conn, fmt["sequence"])
+        return cls(source, fmt["prefix"], fmt["width"])
+
+    @classmethod
+    def for_worker(cls, code_type, run_tag, worker_index, num_workers, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Allocator for offline workers. Codes look like NVLX<run_tag>-000123: the
+        offline prefix keeps them apart from sequence codes, and run_tag (shared by
+        all workers of one run, unique per run) keeps runs apart from each other.
+        """
+        fmt = CODE_FORMATS[code_type]
+        source = WorkerBlockSource(worker_index, num_workers, block_size)
+        return cls(source, f"{fmt['offline_prefix']}{run_tag}-", fmt["width"])
+
+    def format_code(self, number):
+        if number >= 10 ** self.width:
+            raise ValueError(f"Code space exhausted for {self.prefix} with width {self.width}")
+        return f"{self.prefix}{number:0{self.width}d}"
+
+    def next_code(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self.source.reserve_block()
+            number = self._next
+            self._next += 1
+        return self.format_code(number)
+
+    def allocate(self, count):
+        """
+        Issue count codes, reserving every block the current one cannot cover
+        in a single reserve_blocks call, so bulk runs cost one round trip.
+        """
+        with self._lock:
+            numbers = list(range(self._next, min(self._end, self._next + count)))
+            self._next += len(numbers)
+            remaining = count - len(numbers)
+            if remaining > 0:
+                blocks = self.source.reserve_blocks(-(-remaining // self.source.block_size))
+                for start, end in blocks:
+                    taken = min(end - start, remaining)
+                    numbers.extend(range(start, start + taken))
+                    remaining -= taken
+                    self._next, self._end = start + taken, end
+        return [self.format_code(number) for number in numbers]
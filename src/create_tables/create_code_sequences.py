@@ -0,0 +1,25 @@
+from dotenv import load_dotenv
+from src.db_connection import get_snowflake_connection
+from src.code_allocator import CODE_FORMATS, DEFAULT_BLOCK_SIZE
+
+load_dotenv()
+
+def create_code_sequences(conn, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Create the sequences backing CodeAllocator if they do not exist.
+    INCREMENT equals the block size, so each NEXTVAL reserves one block of codes.
+    """
+    with conn.cursor() as cur:
+        for fmt in CODE_FORMATS.values():
+            cur.execute(f"""
+            CREATE SEQUENCE IF NOT EXISTS {fmt['sequence']}
+                START = 0
+                INCREMENT = {block_size}
+                ORDER;
+            """)
+            print(f"Created or verified: {fmt['sequence']}")
+
+if __name__ == "__main__":
+    conn = get_snowflake_connection()
+    create_code_sequences(conn)
+    conn.close()
@@ -0,0 +1,37 @@
+import os
+import logging
+from dotenv import load_dotenv
+from src.db_connection import get_snowflake_connection
+
+load_dotenv()
+
+TABLE_NAME = "HOLDINGSEXPOSURE"
+
+def create_holdings_exposure_table(conn):
+    """
+    Create the HOLDINGSEXPOSURE table in Snowflake if it does not exist.
+    One row per (PORTFOLIOCODE, HISTORYDATE, DIMENSION, DIMENSIONVALUE), aggregated
+    from HOLDINGSDETAILS so fact sheet allocation breakdowns are plain lookups.
+    """
+    create_sql = f"""
+    CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+        PORTFOLIOCODE STRING,
+        HISTORYDATE TIMESTAMP_NTZ,            -- Same as the HOLDINGSDETAILS snapshot date
+        DIMENSION STRING,                     -- SECTOR, REGION, CURRENCY, ASSETCLASS or POSITION
+        DIMENSIONVALUE STRING,                -- e.g. Technology, Europe, USD, Equity, LONG
+        LONGVALUE FLOAT,                      -- Market value of long positions
+        SHORTVALUE FLOAT,                     -- Market value of short positions, as a positive number
+        NETWEIGHT FLOAT,                      -- (long - short) / portfolio gross market value
+        GROSSWEIGHT FLOAT,                    -- (long + short) / portfolio gross market value
+        POSITIONCOUNT INTEGER,
+        SOURCEHASH NUMBER(19, 0)              -- HASH_AGG of the snapshot's holdings, for change detection
+    );
+    """
+    with conn.cursor() as cur:
+        cur.execute(create_sql)
+    print(f"Ensured {TABLE_NAME} exists.")
+
+if __name__ == "__main__":
+    conn = get_snowflake_connection()
+    create_holdings_exposure_table(conn)
+    conn.close()
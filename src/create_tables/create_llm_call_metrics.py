@@ -0,0 +1,38 @@
+import os
+import logging
+from dotenv import load_dotenv
+from src.db_connection import get_snowflake_connection
+
+load_dotenv()
+
+TABLE_NAME = "LLMCALLMETRICS"
+
+def create_llm_call_metrics_table(conn):
+    """
+    Create the LLMCALLMETRICS table in Snowflake if it does not exist.
+    One row per LLM call or parse failure, tagged with the pipeline run and
+    generator step, so latency and spend can be compared across runs.
+    """
+    create_sql = f"""
+    CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+        RUNID STRING,                         -- One id per pipeline process
+        STEP STRING,                          -- Generator that made the call, e.g. portfolio_general_info
+        EVENTTYPE STRING,                     -- call or parse_failure
+        SOURCE STRING,                        -- api, cache or batch
+        MODEL STRING,
+        CALLEDAT TIMESTAMP_NTZ,
+        LATENCYMS FLOAT,
+        PROMPTTOKENS INTEGER,
+        COMPLETIONTOKENS INTEGER,
+        RETRIES INTEGER,
+        ERRORTYPE STRING                      -- Exception class name when the call failed
+    );
+    """
+    with conn.cursor() as cur:
+        cur.execute(create_sql)
+    print(f"Ensured {TABLE_NAME} exists.")
+
+if __name__ == "__main__":
+    conn = get_snowflake_connection()
+    create_llm_call_metrics_table(conn)
+    conn.close()
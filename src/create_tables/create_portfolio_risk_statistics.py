@@ -0,0 +1,39 @@
+import os
+import logging
+from dotenv import load_dotenv
+from src.db_connection import get_snowflake_connection
+
+load_dotenv()
+
+TABLE_NAME = "PORTFOLIORISKSTATISTICS"
+
+def create_portfolio_risk_statistics_table(conn):
+    """
+    Create the PORTFOLIORISKSTATISTICS table in Snowflake if it does not exist.
+    One row per portfolio, window end month and rolling window length, measured
+    against the portfolio's PORTFOLIOBENCHMARKASSOCIATION benchmark.
+    """
+    create_sql = f"""
+    CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+        PORTFOLIOCODE STRING,
+        BENCHMARKCODE STRING,
+        HISTORYDATE DATE,                     -- Month end of the last month in the window
+        WINDOWMONTHS INTEGER,                 -- 12, 36 or 60
+        ANNUALIZEDRETURN FLOAT,
+        VOLATILITY FLOAT,                     -- Annualized standard deviation of monthly returns
+        TRACKINGERROR FLOAT,                  -- Annualized standard deviation of active returns
+        INFORMATIONRATIO FLOAT,
+        BETA FLOAT,
+        ALPHA FLOAT,                          -- Annualized Jensen's alpha
+        SHARPERATIO FLOAT,
+        MAXDRAWDOWN FLOAT                     -- Worst peak-to-trough loss within the window, <= 0
+    );
+    """
+    with conn.cursor() as cur:
+        cur.execute(create_sql)
+    print(f"Created or verified: {TABLE_NAME}")
+
+if __name__ == "__main__":
+    conn = get_snowflake_connection()
+    create_portfolio_risk_statistics_table(conn)
+    conn.close()
@@ -12,11 +12,13 @@ def create_firm_info_table(conn):
     create_sql = f"""
     CREATE TABLE IF NOT EXISTS {FIRM_TABLE} (
         SECTION STRING PRIMARY KEY,
-        CONTENT STRING
+        CONTENT STRING,
+        PROMPTHASH STRING       -- Hash of prompt, model and parameters that produced CONTENT
     );
     """
     with conn.cursor() as cur:
         cur.execute(create_sql)
+        cur.execute(f"ALTER TABLE {FIRM_TABLE} ADD COLUMN IF NOT EXISTS PROMPTHASH STRING")
     print(f"Created/verified: {FIRM_TABLE}")
 
 def create_strategy_info_table(conn):
@@ -24,11 +26,15 @@ def create_strategy_info_table(conn):
     CREATE TABLE IF NOT EXISTS {STRATEGY_TABLE} (
         STRATEGYCODE STRING,
         SECTION      STRING,
-        CONTENT      STRING
+        CONTENT      STRING,
+        STRATEGYNAME STRING,    -- Keeps STRATEGYCODE stable across regeneration runs
+        PROMPTHASH   STRING     -- Hash of prompt, model and parameters that produced CONTENT
     );
     """
     with conn.cursor() as cur:
         cur.execute(create_sql)
+        cur.execute(f"ALTER TABLE {STRATEGY_TABLE} ADD COLUMN IF NOT EXISTS STRATEGYNAME STRING")
+        cur.execute(f"ALTER TABLE {STRATEGY_TABLE} ADD COLUMN IF NOT EXISTS PROMPTHASH STRING")
     print(f"Created/verified: {STRATEGY_TABLE}")
 
 if __name__ == "__main__":
@@ -2,6 +2,8 @@ import logging
 import dotenv
 import os
 dotenv.load_dotenv("local_config.env")
+import pandas as pd
+import pyarrow as pa
 import snowflake.connector
 
 def get_snowflake_connection():
@@ -19,4 +21,46 @@ def get_snowflake_connection():
         return ctx
     except Exception as err:
         logging.error(f"Failed to connect to Snowflake. Error: {err}")
-        return None
\ No newline at end of file
+        return None
+
+def _compact_batch(batch, categories=()):
+    """
+    Type one Arrow result chunk the way pd.read_sql would, and shrink it.
+
+    Fixed-point NUMBER columns become int64 (scale 0) or float64, matching the
+    numbers pd.read_sql returns; string columns named in categories are
+    dictionary-encoded so each distinct code is held once per chunk.
+    """
+    columns = []
+    for name, column in zip(batch.column_names, batch.columns):
+        if pa.types.is_decimal(column.type):
+            column = column.cast(pa.int64() if column.type.scale == 0 else pa.float64(), safe=False)
+        elif name in categories and (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+            column = column.dictionary_encode()
+        columns.append(column)
+    return pa.table(columns, names=batch.column_names)
+
+def fetch_dataframe(query, conn, params=None, categories=()):
+    """
+    Run a read and return the result as a DataFrame, converted from Arrow.
+
+    Replaces pd.read_sql(query, conn, params=params), which builds a Python
+    object per value. The connector's result chunks are pulled one at a time
+    with fetch_arrow_batches and compacted as they arrive, then converted to
+    pandas column by column while the Arrow buffers are released, so peak
+    memory stays near the size of the compact result even for large tables.
+
+    Args:
+        categories (iterable): String columns to return as pandas categoricals,
+            for repeated codes such as PORTFOLIOCODE or TICKER in large reads.
+    """
+    categories = set(categories)
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+        columns = [column[0] for column in cur.description]
+        chunks = [_compact_batch(batch, categories) for batch in cur.fetch_arrow_batches()]
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    table = pa.concat_tables(chunks, promote_options="default")
+    del chunks
+    return table.to_pandas(split_blocks=True, self_destruct=True)
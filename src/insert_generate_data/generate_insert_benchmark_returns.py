@@ -0,0 +1,177 @@
+# Benchmark returns derived from stored prices
+
+import numpy as np
+import pandas as pd
+from src.db_connection import get_snowflake_connection, fetch_dataframe
+from src.schemas import BENCHMARK_PERFORMANCE_SCHEMA, apply_schema, constant_column
+
+TABLE_NAME = "BENCHMARKPERFORMANCE"
+PRICE_TYPE = "Prices"
+DAILY_RETURN_TYPE = "Daily Return"
+MONTHLY_RETURN_TYPE = "Monthly Return"
+RETURN_TYPES = {DAILY_RETURN_TYPE: "Daily", MONTHLY_RETURN_TYPE: "Monthly"}
+
+def fetch_return_watermarks(conn):
+    """Latest stored HISTORYDATE per (BENCHMARKCODE, PERFORMANCEDATATYPE) for derived returns."""
+    query = f"""
+        SELECT BENCHMARKCODE, PERFORMANCEDATATYPE, MAX(HISTORYDATE) AS MAX_DATE
+        FROM {TABLE_NAME}
+        WHERE PERFORMANCEDATATYPE IN (%(daily)s, %(monthly)s)
+        GROUP BY BENCHMARKCODE, PERFORMANCEDATATYPE
+    """
+    df = fetch_dataframe(query, conn, params={"daily": DAILY_RETURN_TYPE, "monthly": MONTHLY_RETURN_TYPE})
+    return {
+        return_type: dict(zip(group["BENCHMARKCODE"], pd.to_datetime(group["MAX_DATE"])))
+        for return_type, group in df.groupby("PERFORMANCEDATATYPE")
+    }
+
+def fetch_prices(conn, incremental=True):
+    """
+    Fetch daily prices needed to extend the derived returns.
+
+    With incremental, each benchmark's prices are read only from the earlier of
+    its last daily return date and the start of its last stored month, which
+    covers the base price of both the next daily and the next monthly return.
+    Benchmarks missing either return type are read in full.
+    """
+    query = f"""
+        SELECT p.BENCHMARKCODE, p.HISTORYDATE, p.VALUE, p.CURRENCY, p.CURRENCYCODE
+        FROM {TABLE_NAME} p
+    """
+    params = {"prices": PRICE_TYPE}
+    if incremental:
+        query += f"""
+        LEFT JOIN (
+            SELECT BENCHMARKCODE,
+                   MAX(CASE WHEN PERFORMANCEDATATYPE = %(daily)s THEN HISTORYDATE END) AS DAILY_MAX,
+                   MAX(CASE WHEN PERFORMANCEDATATYPE = %(monthly)s THEN HISTORYDATE END) AS MONTHLY_MAX
+            FROM {TABLE_NAME}
+            WHERE PERFORMANCEDATATYPE IN (%(daily)s, %(monthly)s)
+            GROUP BY BENCHMARKCODE
+        ) w ON p.BENCHMARKCODE = w.BENCHMARKCODE
+        WHERE p.PERFORMANCEDATATYPE = %(prices)s
+          AND (w.DAILY_MAX IS NULL OR w.MONTHLY_MAX IS NULL
+               OR p.HISTORYDATE >= LEAST(w.DAILY_MAX, DATE_TRUNC('MONTH', w.MONTHLY_MAX)))
+        """
+        params.update({"daily": DAILY_RETURN_TYPE, "monthly": MONTHLY_RETURN_TYPE})
+    else:
+        query += " WHERE p.PERFORMANCEDATATYPE = %(prices)s"
+    return fetch_dataframe(query, conn, params=params, categories=["BENCHMARKCODE", "CURRENCY", "CURRENCYCODE"])
+
+def _after_watermark(df, watermarks):
+    """Rows dated after their benchmark's watermark; benchmarks without one keep every row."""
+    if not watermarks:
+        return df
+    marks = pd.to_datetime(df["BENCHMARKCODE"].map(watermarks))
+    return df[(marks.isna() | (df["HISTORYDATE"] > marks)).to_numpy()]
+
+def compute_daily_returns(prices, watermarks=None):
+    """
+    Day-over-day returns per benchmark from its price series.
+
+    Returns:
+        DataFrame: BENCHMARKCODE, HISTORYDATE, VALUE for dates after each watermark.
+    """
+    ordered = prices.sort_values(["BENCHMARKCODE", "HISTORYDATE"])
+    previous = ordered.groupby("BENCHMARKCODE", sort=False)["VALUE"].shift(1)
+    returns = ordered.assign(VALUE=ordered["VALUE"] / previous - 1).dropna(subset=["VALUE"])
+    return _after_watermark(returns[["BENCHMARKCODE", "HISTORYDATE", "VALUE"]], watermarks)
+
+def compute_monthly_returns(prices, watermarks=None):
+    """
+    Month-end to month-end returns per benchmark, dated at calendar month end.
+
+    A month is only returned once the benchmark has a price in a later month,
+    so a month-end value is never written from a partial month.
+
+    Returns:
+        DataFrame: BENCHMARKCODE, HISTORYDATE, VALUE for months after each watermark.
+    """
+    ordered = prices.sort_values(["BENCHMARKCODE", "HISTORYDATE"])
+    month = ordered["HISTORYDATE"].dt.year * 12 + ordered["HISTORYDATE"].dt.month - 1
+    month_end = ordered.groupby([ordered["BENCHMARKCODE"], month.rename("MONTH")], sort=True)["VALUE"].last().reset_index()
+
+    grouped = month_end.groupby("BENCHMARKCODE", sort=False)
+    previous = grouped["VALUE"].shift(1)
+    # Only consecutive months with a later month already priced
+    keep = (month_end["MONTH"] - grouped["MONTH"].shift(1) == 1) & grouped["MONTH"].shift(-1).notna()
+
+    month_start = pd.to_datetime(pd.DataFrame({
+        "year": month_end["MONTH"] // 12, "month": month_end["MONTH"] % 12 + 1, "day": 1,
+    }))
+    returns = month_end.assign(
+        HISTORYDATE=month_start + pd.offsets.MonthEnd(0),
+        VALUE=month_end["VALUE"] / previous - 1,
+    )[keep.to_numpy()]
+    return _after_watermark(returns[["BENCHMARKCODE", "HISTORYDATE", "VALUE"]], watermarks)
+
+def compute_benchmark_returns(prices, watermarks=None):
+    """
+    Daily and monthly return rows for every benchmark in one pass over its prices.
+
+    Args:
+        prices (DataFrame): BENCHMARKCODE, HISTORYDATE, VALUE, CURRENCY, CURRENCYCODE price rows.
+        watermarks (dict): PERFORMANCEDATATYPE -> {BENCHMARKCODE: last stored date}.
+            Only later dates are returned, which makes the derivation incremental.
+
+    Returns:
+        DataFrame: BENCHMARKPERFORMANCE rows typed per BENCHMARK_PERFORMANCE_SCHEMA.
+    """
+    watermarks = watermarks or {}
+    prices = prices.assign(
+        BENCHMARKCODE=prices["BENCHMARKCODE"].astype(str),
+        HISTORYDATE=pd.to_datetime(prices["HISTORYDATE"]),
+    ).dropna(subset=["VALUE"]).drop_duplicates(["BENCHMARKCODE", "HISTORYDATE"], keep="last")
+    currencies = prices.sort_values("HISTORYDATE").groupby("BENCHMARKCODE")[["CURRENCY", "CURRENCYCODE"]].last()
+
+    frames = []
+    for return_type, compute in [(DAILY_RETURN_TYPE, compute_daily_returns), (MONTHLY_RETURN_TYPE, compute_monthly_returns)]:
+        returns = compute(prices, watermarks.get(return_type))
+        num_rows = len(returns)
+        frames.append(pd.DataFrame({
+            "BENCHMARKCODE": returns["BENCHMARKCODE"].to_numpy(),
+            "PERFORMANCEDATATYPE": constant_column(return_type, num_rows),
+            "CURRENCYCODE": currencies["CURRENCYCODE"].reindex(returns["BENCHMARKCODE"]).to_numpy(),
+            "CURRENCY": currencies["CURRENCY"].reindex(returns["BENCHMARKCODE"]).to_numpy(),
+            "PERFORMANCEFREQUENCY": constant_column(RETURN_TYPES[return_type], num_rows),
+            "HISTORYDATE": returns["HISTORYDATE"].to_numpy(),
+            "VALUE": np.round(returns["VALUE"].to_numpy(dtype=np.float64), 8),
+        }))
+    # Re-encode after concat: per-type categoricals union back to object dtype
+    return apply_schema(pd.concat(frames, ignore_index=True), BENCHMARK_PERFORMANCE_SCHEMA)
+
+def insert_benchmark_returns(conn, df):
+    columns = ["BENCHMARKCODE", "PERFORMANCEDATATYPE", "CURRENCYCODE", "CURRENCY", "PERFORMANCEFREQUENCY", "HISTORYDATE", "VALUE"]
+    insert_sql = f"INSERT INTO {TABLE_NAME} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    df = df[columns].copy()
+    df["HISTORYDATE"] = pd.to_datetime(df["HISTORYDATE"]).dt.date
+    rows = df.astype(object).where(df.notna(), None).values.tolist()
+    with conn.cursor() as cur:
+        cur.executemany(insert_sql, rows)
+    conn.commit()
+    print(f"Inserted {len(rows)} rows into {TABLE_NAME}.")
+
+def main():
+    """Derive benchmark returns for dates newer than what is stored and insert them."""
+    conn = get_snowflake_connection()
+    if conn is None:
+        print("Failed to connect to Snowflake.")
+        return
+
+    try:
+        watermarks = fetch_return_watermarks(conn)
+        prices = fetch_prices(conn, incremental=True)
+        print(f"Fetched {len(prices)} price rows for {prices['BENCHMARKCODE'].nunique()} benchmarks")
+
+        df = compute_benchmark_returns(prices, watermarks)
+        if df.empty:
+            print("No new benchmark returns to derive.")
+            return
+
+        print(df.groupby("PERFORMANCEDATATYPE", observed=True).size())
+        insert_benchmark_returns(conn, df)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# Benchmark-linked synthetic portfolio performance
+
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from src.db_connection import get_snowflake_connection
+from src.query_cache import cached_read_sql
+from src.insert_generate_data.generate_insert_portfolio_performance import (
+    PERFORMANCE_SEED, generate_monthly_dates, generate_performance_data, get_portfolio_codes, insert_performance_data
+)
+
+BENCHMARK_TABLE = "BENCHMARKPERFORMANCE"
+ASSOCIATION_TABLE = "PORTFOLIOBENCHMARKASSOCIATION"
+
+def fetch_benchmark_prices(conn):
+    """Fetch stored daily benchmark prices as a long (BENCHMARKCODE, HISTORYDATE, VALUE) frame."""
+    query = f"""
+        SELECT BENCHMARKCODE, HISTORYDATE, VALUE
+        FROM {BENCHMARK_TABLE}
+        WHERE PERFORMANCEDATATYPE = 'Prices'
+    """
+    return cached_read_sql(query, conn)
+
+def fetch_associations(conn):
+    """Fetch the portfolio -> benchmark mapping (first benchmark per portfolio)."""
+    query = f"SELECT PORTFOLIOCODE, BENCHMARKCODE FROM {ASSOCIATION_TABLE};"
+    df = cached_read_sql(query, conn)
+    return df.drop_duplicates(subset=["PORTFOLIOCODE"])
+
+def estimate_benchmark_moments(prices):
+    """
+    Estimate the mean vector and covariance matrix of monthly benchmark log returns.
+
+    Returns:
+        codes (list): Benchmark codes, in matrix order.
+        mean (np.ndarray): (B,) mean monthly log return.
+        cov (np.ndarray): (B, B) covariance of monthly log returns.
+    """
+    wide = prices.pivot_table(index="HISTORYDATE", columns="BENCHMARKCODE", values="VALUE", aggfunc="last")
+    wide.index = pd.to_datetime(wide.index)
+    month_end = wide.groupby(wide.index.to_period("M")).last()
+    log_returns = np.log(month_end).diff().iloc[1:]
+    # Pairwise-complete covariance so benchmarks with shorter histories still contribute
+    cov = log_returns.cov(min_periods=12).fillna(0.0)
+    mean = log_returns.mean().fillna(0.0)
+    return list(cov.columns), mean.to_numpy(), cov.to_numpy()
+
+def simulate_benchmark_paths(mean, cov, num_periods, rng, num_paths=1, jitter=1e-10):
+    """
+    Draw correlated benchmark log-return paths.
+
+    cov may be a single (B, B) matrix or a stack (..., B, B); np.linalg.cholesky
+    factors the whole batch at once and every path is drawn with one matmul.
+
+    Returns:
+        np.ndarray: (num_paths, num_periods, B) log returns.
+    """
+    cov = np.asarray(cov, dtype=np.float64)
+    num_benchmarks = cov.shape[-1]
+    # Nearest positive semi-definite matrix, so pairwise-estimated covariances factor cleanly
+    eigvals, eigvecs = np.linalg.eigh(cov)
+    cov = (eigvecs * np.clip(eigvals, 0.0, None)[..., None, :]) @ np.swapaxes(eigvecs, -1, -2)
+    chol = np.linalg.cholesky(cov + jitter * np.eye(num_benchmarks))
+
+    shocks = rng.standard_normal((num_paths, num_periods, num_benchmarks))
+    return np.asarray(mean) + shocks @ np.swapaxes(chol, -1, -2)
+
+def simulate_portfolio_returns(benchmark_returns, benchmark_idx, betas, tracking_errors, rng, alphas=None):
+    """
+    Derive every portfolio's return series from its benchmark in one pass.
+
+    r_p = alpha + beta * r_b + tracking-error noise, computed on a (P, T) matrix.
+
+    Args:
+        benchmark_returns (np.ndarray): (T, B) benchmark log returns.
+        benchmark_idx (np.ndarray): (P,) column of each portfolio's benchmark.
+        betas, tracking_errors (np.ndarray): (P,) per-portfolio parameters (monthly).
+        alphas (np.ndarray): Optional (P,) monthly alpha.
+
+    Returns:
+        np.ndarray: (P, T) simple returns.
+    """
+    num_portfolios, num_periods = len(benchmark_idx), benchmark_returns.shape[0]
+    alphas = np.zeros(num_portfolios) if alphas is None else alphas
+    noise = rng.standard_normal((num_portfolios, num_periods)) * tracking_errors[:, None]
+    log_returns = alphas[:, None] + betas[:, None] * benchmark_returns[:, benchmark_idx].T + noise
+    return np.expm1(log_returns)
+
+def generate_correlated_performance_data(
+    portfolios,
+    associations,
+    benchmark_prices,
+    start_date,
+    end_date,
+    seed=PERFORMANCE_SEED,
+    beta_range=(0.7, 1.3),
+    tracking_error_range=(0.01, 0.08)
+):
+    """
+    Generate PORTFOLIOPERFORMANCE rows whose returns follow each portfolio's
+    associated benchmark.
+
+    The portfolio x month grid and inception dates come from
+    generate_performance_data; only PERFORMANCEFACTOR is replaced by
+    beta x simulated benchmark return + tracking-error noise. Annual tracking
+    errors in tracking_error_range are scaled to monthly.
+    """
+    rng = np.random.default_rng(seed)
+    df = generate_performance_data(portfolios, start_date, end_date, seed=rng)
+    if df.empty:
+        return df
+
+    codes, mean, cov = estimate_benchmark_moments(benchmark_prices)
+    if not codes:
+        raise ValueError("No benchmark prices available to estimate covariance.")
+
+    portfolio_codes = list(df["PORTFOLIOCODE"].cat.categories)
+    benchmark_of = dict(zip(associations["PORTFOLIOCODE"], associations["BENCHMARKCODE"]))
+    code_index = {code: i for i, code in enumerate(codes)}
+    benchmark_idx = np.array([code_index.get(benchmark_of.get(p), -1) for p in portfolio_codes])
+    unassigned = benchmark_idx < 0
+    if unassigned.any():
+        print(f"{int(unassigned.sum())} portfolios have no priced benchmark; assigning one at random")
+        benchmark_idx[unassigned] = rng.integers(0, len(codes), size=int(unassigned.sum()))
+
+    dates = generate_monthly_dates(start_date, end_date)
+    benchmark_returns = simulate_benchmark_paths(mean, cov, len(dates), rng)[0]
+
+    num_portfolios = len(portfolio_codes)
+    betas = rng.uniform(*beta_range, size=num_portfolios)
+    tracking_errors = rng.uniform(*tracking_error_range, size=num_portfolios) / np.sqrt(12)
+    returns = simulate_portfolio_returns(benchmark_returns, benchmark_idx, betas, tracking_errors, rng)
+
+    portfolio_idx = df["PORTFOLIOCODE"].cat.codes.to_numpy()
+    date_idx = np.searchsorted(dates, df["HISTORYDATE"].to_numpy().astype("datetime64[D]"))
+    df["PERFORMANCEFACTOR"] = np.round(returns[portfolio_idx, date_idx], 6)
+    return df
+
+if __name__ == "__main__":
+    conn = get_snowflake_connection()
+    portfolios = get_portfolio_codes(conn)
+    associations = fetch_associations(conn)
+    benchmark_prices = fetch_benchmark_prices(conn)
+
+    start = datetime(2010, 1, 1)
+    end = datetime(2025, 7, 31)
+
+    df = generate_correlated_performance_data(portfolios, associations, benchmark_prices, start, end)
+    print(df.head())
+
+    insert_performance_data(conn, df)
+    conn.close()
@@ -1,11 +1,17 @@
 # /app/insert_disclosure_information.py
 
+import os
+import json
 import uuid
 import random
+import argparse
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from src.db_connection import get_snowflake_connection
-from src.open_ai_interactions import get_openai_client_obj, interact_with_chat_application
+from src.open_ai_interactions import get_openai_client_obj, interact_with_chat_application, interact_with_chat_batch
+from src.openai_batch import interact_with_chat_batch_offline
+from src.llm_metrics import llm_step, report_llm_metrics
 
 TABLE_NAME = "DISCLOSUREINFORMATION"
 
@@ -23,42 +29,147 @@ SOURCES = [
     "Other"
 ]
 
-def generate_disclosure_text(open_ai_client, disclosure_type):
-    """
-    Generate disclosure text using GPT for the given disclosure type.
-    """
-    prompt = (
+TEMPLATE_POOL_JSON = os.path.join("cache", "disclosure_templates.json")
+DEFAULT_VARIANTS_PER_TYPE = 5
+
+def disclosure_prompt(disclosure_type):
+    return (
         f"Write a professional {disclosure_type.lower()} disclosure statement "
         f"for an institutional investment fact sheet. Keep it concise, clear, "
         f"and compliant with financial industry standards."
     )
-    response = interact_with_chat_application(prompt, open_ai_client)
+
+def generate_disclosure_text(open_ai_client, disclosure_type):
+    """
+    Generate disclosure text using GPT for the given disclosure type.
+    """
+    response = interact_with_chat_application(disclosure_prompt(disclosure_type), open_ai_client, use_cache=False)
     return response.choices[0].message.content.strip()
 
-def generate_disclosure_data(open_ai_client, num_records=10):
+@llm_step("disclosures")
+def generate_disclosure_data(open_ai_client, num_records=10, offline_batch=False):
     """
     Generate a DataFrame of synthetic disclosure records.
+
+    Rows are laid out first and their texts requested in one go: concurrently,
+    or with offline_batch as one Batch API job whose results are joined back
+    by DISCLOSUREID. Rows whose text could not be generated are dropped.
     """
     records = []
     today = datetime.today()
 
     for _ in range(num_records):
-        disclosure_type = random.choice(DISCLOSURE_TYPES)
-        disclosure_text = generate_disclosure_text(open_ai_client, disclosure_type)
-
         effective_date = today - timedelta(days=random.randint(0, 365 * 5))
         expiry_date = None if random.random() < 0.5 else effective_date + timedelta(days=random.randint(90, 730))
 
         records.append({
             "DISCLOSUREID": str(uuid.uuid4()),
-            "DISCLOSURETYPE": disclosure_type,
-            "DISCLOSURETEXT": disclosure_text,
+            "DISCLOSURETYPE": random.choice(DISCLOSURE_TYPES),
+            "DISCLOSURETEXT": None,
             "EFFECTIVEDATE": effective_date.date(),
             "EXPIRYDATE": expiry_date.date() if expiry_date else None,
             "SOURCE": random.choice(SOURCES)
         })
 
-    return pd.DataFrame(records)
+    prompts = {r["DISCLOSUREID"]: disclosure_prompt(r["DISCLOSURETYPE"]) for r in records}
+    if offline_batch:
+        responses = interact_with_chat_batch_offline(
+            prompts, open_ai_client, use_cache=False, batch_name="disclosures"
+        )
+    else:
+        responses = dict(zip(prompts, interact_with_chat_batch(list(prompts.values()), open_ai_client, use_cache=False)))
+
+    for record in records:
+        response = responses[record["DISCLOSUREID"]]
+        if isinstance(response, Exception):
+            print(f"Failed to generate disclosure {record['DISCLOSUREID']}: {response}")
+            continue
+        record["DISCLOSURETEXT"] = response.choices[0].message.content.strip()
+
+    return pd.DataFrame([r for r in records if r["DISCLOSURETEXT"] is not None])
+
+def template_prompt(disclosure_type, variant, num_variants):
+    """Disclosure prompt for one numbered variant, so every variant is a distinct (cacheable) request."""
+    return (
+        f"{disclosure_prompt(disclosure_type)} "
+        f"This is variant {variant + 1} of {num_variants}: use wording and structure "
+        f"that differ from the other variants."
+    )
+
+@llm_step("disclosure_templates")
+def load_template_pool(open_ai_client, variants_per_type=DEFAULT_VARIANTS_PER_TYPE, path=TEMPLATE_POOL_JSON):
+    """
+    Load the disclosure template pool, generating any missing variants once.
+
+    The pool maps each DISCLOSURE_TYPE to a list of texts and is saved to
+    path, so later runs make no LLM calls unless variants_per_type grows.
+
+    Returns:
+        dict: disclosure type -> list of variant texts.
+    """
+    pool = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            pool = json.load(f)
+
+    missing = [
+        (disclosure_type, variant)
+        for disclosure_type in DISCLOSURE_TYPES
+        for variant in range(len(pool.get(disclosure_type, [])), variants_per_type)
+    ]
+    if missing:
+        responses = interact_with_chat_batch(
+            [template_prompt(t, v, variants_per_type) for t, v in missing], open_ai_client,
+            temperature=0.8, return_exceptions=False
+        )
+        for (disclosure_type, _), response in zip(missing, responses):
+            pool.setdefault(disclosure_type, []).append(response.choices[0].message.content.strip())
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(pool, f, indent=2)
+        print(f"Generated {len(missing)} disclosure templates; pool saved to {path}")
+
+    return {t: pool[t][:variants_per_type] for t in DISCLOSURE_TYPES}
+
+def _uuid4_strings(rng, count):
+    """Random version-4 UUID strings drawn from rng, so seeded runs are reproducible."""
+    raw = np.frombuffer(rng.bytes(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    return [str(uuid.UUID(bytes=row.tobytes())) for row in raw]
+
+def generate_disclosure_data_from_pool(template_pool, num_records, seed=None, today=None):
+    """
+    Synthesize DISCLOSUREINFORMATION rows from a template pool without LLM calls.
+
+    Type, template variant, dates and source are drawn vectorized, with the
+    same distributions as generate_disclosure_data.
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    today = np.datetime64(today or datetime.today().date(), "D")
+
+    types = np.asarray(DISCLOSURE_TYPES, dtype=object)
+    type_idx = rng.integers(0, len(types), size=num_records)
+
+    # Flatten the pool so a (type, variant) pick is one gather
+    offsets = np.cumsum([0] + [len(template_pool[t]) for t in DISCLOSURE_TYPES])
+    texts = np.asarray([text for t in DISCLOSURE_TYPES for text in template_pool[t]], dtype=object)
+    counts = np.diff(offsets)
+    text_idx = offsets[type_idx] + (rng.random(num_records) * counts[type_idx]).astype(np.int64)
+
+    effective = today - rng.integers(0, 365 * 5 + 1, size=num_records)
+    expiry = effective + rng.integers(90, 731, size=num_records)
+    has_expiry = rng.random(num_records) >= 0.5
+
+    return pd.DataFrame({
+        "DISCLOSUREID": _uuid4_strings(rng, num_records),
+        "DISCLOSURETYPE": types[type_idx],
+        "DISCLOSURETEXT": texts[text_idx],
+        "EFFECTIVEDATE": pd.to_datetime(effective),
+        "EXPIRYDATE": pd.to_datetime(np.where(has_expiry, expiry, np.datetime64("NaT"))),
+        "SOURCE": np.asarray(SOURCES, dtype=object)[rng.integers(0, len(SOURCES), size=num_records)],
+    })
 
 def insert_disclosures(conn, df):
     """
@@ -71,25 +182,40 @@ def insert_disclosures(conn, df):
     ) VALUES (%s, %s, %s, %s, %s, %s);
     """
 
+    columns = ["DISCLOSUREID", "DISCLOSURETYPE", "DISCLOSURETEXT", "EFFECTIVEDATE", "EXPIRYDATE", "SOURCE"]
+    rows = df[columns].copy()
+    for column in ["EFFECTIVEDATE", "EXPIRYDATE"]:
+        if pd.api.types.is_datetime64_any_dtype(rows[column]):
+            rows[column] = rows[column].dt.date
+    rows = rows.astype(object).where(rows.notna(), None)
+
     with conn.cursor() as cur:
-        for _, row in df.iterrows():
-            cur.execute(insert_sql, (
-                row["DISCLOSUREID"],
-                row["DISCLOSURETYPE"],
-                row["DISCLOSURETEXT"],
-                row["EFFECTIVEDATE"],
-                row["EXPIRYDATE"],
-                row["SOURCE"]
-            ))
+        cur.executemany(insert_sql, rows.values.tolist())
     conn.commit()
     print(f"Inserted {len(df)} disclosure records into {TABLE_NAME}.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate DISCLOSUREINFORMATION records.")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--offline-batch", action="store_true",
+                        help="Submit all disclosure prompts as one Batch API job instead of live calls")
+    parser.add_argument("--template-pool", action="store_true",
+                        help="Build rows from a cached pool of GPT-written templates instead of one call per row")
+    parser.add_argument("--variants", type=int, default=DEFAULT_VARIANTS_PER_TYPE,
+                        help="Template variants per disclosure type")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
     conn = get_snowflake_connection()
     open_ai_client = get_openai_client_obj()
 
-    df_disclosures = generate_disclosure_data(open_ai_client, num_records=20)
+    if args.template_pool:
+        pool = load_template_pool(open_ai_client, variants_per_type=args.variants)
+        df_disclosures = generate_disclosure_data_from_pool(pool, args.count, seed=args.seed)
+    else:
+        df_disclosures = generate_disclosure_data(open_ai_client, num_records=args.count, offline_batch=args.offline_batch)
     print(df_disclosures.head())
 
     insert_disclosures(conn, df_disclosures)
+    report_llm_metrics(conn)
     conn.close()
\ No newline at end of file
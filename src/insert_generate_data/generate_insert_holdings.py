@@ -3,16 +3,52 @@ import pandas as pd
 import random
 import json
 from datetime import datetime, timedelta
-from src.db_connection import get_snowflake_connection
+from src.db_connection import get_snowflake_connection, fetch_dataframe
+from src.reference_data import fetch_portfolio_codes as fetch_all_portfolio_codes
+from src.schemas import HOLDINGS_SCHEMA, apply_schema
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def fetch_all_portfolio_codes(conn):
-    """Fetch all portfolio codes from PORTFOLIOGENERALINFO table."""
-    query = "SELECT DISTINCT PORTFOLIOCODE FROM PORTFOLIOGENERALINFO;"
-    df = pd.read_sql(query, conn)
-    return df['PORTFOLIOCODE'].dropna().unique().tolist()
+def get_holdings_watermarks(conn, table_name="HOLDINGSDETAILS"):
+    """
+    Fetch the latest stored HISTORYDATE per (PORTFOLIOCODE, TICKER) and the
+    last stored PRICE per TICKER.
+
+    Returns:
+        watermarks (DataFrame): PORTFOLIOCODE, TICKER, MAX_DATE.
+        boundary_prices (dict): TICKER -> last stored PRICE.
+    """
+    watermarks = fetch_dataframe(f"""
+        SELECT PORTFOLIOCODE, TICKER, MAX(HISTORYDATE) AS MAX_DATE
+        FROM {table_name}
+        GROUP BY PORTFOLIOCODE, TICKER
+    """, conn)
+    last_prices = fetch_dataframe(f"""
+        SELECT TICKER, PRICE
+        FROM {table_name}
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY TICKER ORDER BY HISTORYDATE DESC) = 1
+    """, conn)
+    boundary_prices = dict(zip(last_prices['TICKER'], last_prices['PRICE']))
+    return watermarks, boundary_prices
+
+def filter_new_holdings(df, watermarks):
+    """
+    Keep only rows newer than the stored watermark for their (PORTFOLIOCODE, TICKER).
+    Positions with no stored history are kept in full.
+    """
+    if watermarks is None or watermarks.empty or df.empty:
+        return df
+
+    keys = df[['PORTFOLIOCODE', 'TICKER']].astype(object)
+    marks = watermarks.astype({'PORTFOLIOCODE': object, 'TICKER': object})
+    row_marks = keys.merge(marks, on=['PORTFOLIOCODE', 'TICKER'], how='left')['MAX_DATE']
+    row_marks = pd.to_datetime(row_marks).to_numpy()
+    history_dates = pd.to_datetime(df['HISTORYDATE']).to_numpy()
+
+    keep = pd.isna(row_marks) | (history_dates > row_marks)
+    print(f"Watermark filter kept {int(keep.sum())} of {len(df)} holdings rows")
+    return df[keep].reset_index(drop=True)
 
 def assign_portfolio_codes_to_tickers(tickers, portfolio_codes):
     """
@@ -39,11 +75,17 @@ def assign_portfolio_codes_to_tickers(tickers, portfolio_codes):
 def validate_and_impute_holdings_data(
     df,
     country_region_json='app/country_region_map.json',
-    currencies_json='app/valid_currencies.json'
+    currencies_json='app/valid_currencies.json',
+    boundary_prices=None,
+    max_price_jump=0.5
 ):
     """
     Validate and clean a holdings dataset with currency rules
 
+    Meant to run on the delta of an incremental load. boundary_prices carries
+    the last stored PRICE per TICKER so price imputation and the continuity
+    check behave as if the stored history were still attached.
+
     Returns:
         issues (list): Descriptions of all validation issues found.
         df (DataFrame): Cleaned and annotated DataFrame.
@@ -82,8 +124,18 @@ def validate_and_impute_holdings_data(
     # === 3) Sort for time-series ops ===
     df = df.sort_values(by=['TICKER', 'HISTORYDATE'])
 
-    # === 4) Impute PRICE within TICKER ===
-    df['PRICE'] = df.groupby('TICKER')['PRICE'].ffill().bfill()
+    # === 4) Impute PRICE within TICKER, seeded by the last stored price ===
+    boundary_prices = boundary_prices or {}
+    boundary = df['TICKER'].astype(object).map(boundary_prices)
+    df['PRICE'] = df.groupby('TICKER', observed=True)['PRICE'].ffill()
+    df['PRICE'] = df['PRICE'].fillna(boundary).bfill()
+
+    # === 4A) Price continuity across the stored/new boundary ===
+    previous = df.groupby('TICKER', observed=True)['PRICE'].shift(1).fillna(boundary)
+    jumps = (df['PRICE'] / previous - 1).abs() > max_price_jump
+    if jumps.any():
+        jumped = df.loc[jumps, 'TICKER'].astype(object).unique().tolist()
+        issues.append(f"PRICE moved more than {max_price_jump:.0%} from previous value for: {jumped}")
 
     # === 5) Load currency limits (with fallback) ===
     try:
@@ -221,7 +273,8 @@ def get_tickers():
         sp500_tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'META', 'NVDA', 'JPM', 'V', 'JNJ']
     
     extra_tickers = ['SHOP', 'SE', 'BIDU', 'JD', 'MELI', 'TSM', 'TCEHY']
-    tickers = list(set(sp500_tickers + extra_tickers))
+    # Sorted first so the shuffle, and the tickers kept, depend only on the random seed
+    tickers = sorted(set(sp500_tickers + extra_tickers))
     random.shuffle(tickers)
     return tickers[:500]  # Limit to 500 tickers
 
@@ -313,7 +366,7 @@ def generate_holdings_data(tickers, ticker_portfolio_map, max_count=2000):
             continue
     
     print(f"Generated {len(data)} holdings records")
-    return pd.DataFrame(data)
+    return apply_schema(pd.DataFrame(data), HOLDINGS_SCHEMA)
 
 def upload_to_snowflake(df, table_name="HOLDINGSDETAILS"):
     """Upload DataFrame to Snowflake."""
@@ -369,7 +422,7 @@ def upload_to_snowflake(df, table_name="HOLDINGSDETAILS"):
 def main():
     """Main execution function."""
     try:
-        # Step 1: Get database connection and fetch portfolio codes
+        # Step 1: Get database connection, portfolio codes and stored watermarks
         print("Connecting to Snowflake to fetch portfolio codes...")
         conn = get_snowflake_connection()
         if conn is None:
@@ -379,6 +432,8 @@ def main():
         try:
             portfolio_codes = fetch_all_portfolio_codes(conn)
             print(f"Fetched {len(portfolio_codes)} portfolio codes: {portfolio_codes[:5]}{'...' if len(portfolio_codes) > 5 else ''}")
+            watermarks, boundary_prices = get_holdings_watermarks(conn)
+            print(f"Fetched watermarks for {len(watermarks)} stored positions")
         except Exception as e:
             print(f"Error fetching portfolio codes: {e}")
             return
@@ -412,9 +467,16 @@ def main():
         print("Sample data:")
         print(df_holdings[['TICKER', 'PORTFOLIOCODE', 'ISSUENAME', 'PRICE', 'SHARES']].head())
         
-        # Step 5: Validate data
+        # Step 5: Keep only rows newer than what is stored
+        df_holdings = filter_new_holdings(df_holdings, watermarks)
+        
+        if df_holdings.empty:
+            print("No new holdings rows after watermark filter.")
+            return
+        
+        # Step 6: Validate the delta
         print("\nValidating holdings data...")
-        issues, df_clean = validate_and_impute_holdings_data(df_holdings)
+        issues, df_clean = validate_and_impute_holdings_data(df_holdings, boundary_prices=boundary_prices)
         
         if issues:
             print("Validation Issues Found:")
@@ -427,7 +489,7 @@ def main():
         
         print(f"Clean data shape: {df_clean.shape}")
         
-        # Step 6: Upload to Snowflake
+        # Step 7: Upload to Snowflake
         if not df_clean.empty:
             success = upload_to_snowflake(df_clean)
             if success:
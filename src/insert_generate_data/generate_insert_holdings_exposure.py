@@ -0,0 +1,179 @@
+# Holdings exposure cube
+
+import numpy as np
+import pandas as pd
+from src.db_connection import get_snowflake_connection, fetch_dataframe
+
+HOLDINGS_TABLE = "HOLDINGSDETAILS"
+EXPOSURE_TABLE = "HOLDINGSEXPOSURE"
+UNCLASSIFIED = "Unclassified"
+
+# Cube dimension -> HOLDINGSDETAILS column
+EXPOSURE_DIMENSIONS = {
+    "SECTOR": "PRIMARYSECTORNAME",
+    "REGION": "REGIONNAME",
+    "CURRENCY": "CURRENCYCODE",
+    "ASSETCLASS": "ASSETCLASSNAME",
+    "POSITION": "POSITION_FLAG",
+}
+EXPOSURE_COLUMNS = [
+    "PORTFOLIOCODE", "HISTORYDATE", "DIMENSION", "DIMENSIONVALUE", "LONGVALUE", "SHORTVALUE",
+    "NETWEIGHT", "GROSSWEIGHT", "POSITIONCOUNT", "SOURCEHASH",
+]
+
+# Fingerprint of every snapshot, over the columns the cube depends on
+SOURCE_HASH_SQL = f"""
+    SELECT PORTFOLIOCODE, HISTORYDATE,
+           HASH_AGG(TICKER, MARKETVALUE, POSITION_FLAG, {', '.join(EXPOSURE_DIMENSIONS.values())}) AS SOURCEHASH
+    FROM {HOLDINGS_TABLE}
+    GROUP BY PORTFOLIOCODE, HISTORYDATE
+"""
+
+def fetch_changed_holdings(conn):
+    """
+    Fetch holdings only for (PORTFOLIOCODE, HISTORYDATE) snapshots that are new
+    or whose fingerprint differs from the one stored with their exposure rows.
+    The comparison runs in Snowflake, so unchanged snapshots never leave the warehouse.
+    """
+    query = f"""
+        WITH src AS ({SOURCE_HASH_SQL}),
+        stored AS (
+            SELECT PORTFOLIOCODE, HISTORYDATE, ANY_VALUE(SOURCEHASH) AS SOURCEHASH
+            FROM {EXPOSURE_TABLE}
+            GROUP BY PORTFOLIOCODE, HISTORYDATE
+        ),
+        changed AS (
+            SELECT src.PORTFOLIOCODE, src.HISTORYDATE, src.SOURCEHASH
+            FROM src
+            LEFT JOIN stored ON src.PORTFOLIOCODE = stored.PORTFOLIOCODE AND src.HISTORYDATE = stored.HISTORYDATE
+            WHERE stored.SOURCEHASH IS NULL OR stored.SOURCEHASH <> src.SOURCEHASH
+        )
+        SELECT h.PORTFOLIOCODE, h.HISTORYDATE, h.MARKETVALUE, h.POSITION_FLAG,
+               {', '.join('h.' + column for column in EXPOSURE_DIMENSIONS.values() if column != 'POSITION_FLAG')},
+               c.SOURCEHASH
+        FROM {HOLDINGS_TABLE} h
+        JOIN changed c ON h.PORTFOLIOCODE = c.PORTFOLIOCODE AND h.HISTORYDATE = c.HISTORYDATE
+    """
+    return fetch_dataframe(query, conn, categories=["PORTFOLIOCODE", *EXPOSURE_DIMENSIONS.values()])
+
+def delete_stale_exposures(conn):
+    """Remove exposure rows whose snapshot changed or no longer exists in HOLDINGSDETAILS."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            DELETE FROM {EXPOSURE_TABLE} e
+            USING ({SOURCE_HASH_SQL}) s
+            WHERE e.PORTFOLIOCODE = s.PORTFOLIOCODE AND e.HISTORYDATE = s.HISTORYDATE
+              AND e.SOURCEHASH <> s.SOURCEHASH
+        """)
+        changed = cur.rowcount
+        cur.execute(f"""
+            DELETE FROM {EXPOSURE_TABLE} e
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {HOLDINGS_TABLE} h
+                WHERE h.PORTFOLIOCODE = e.PORTFOLIOCODE AND h.HISTORYDATE = e.HISTORYDATE
+            )
+        """)
+        removed = cur.rowcount
+    print(f"Deleted {changed} changed and {removed} orphaned rows from {EXPOSURE_TABLE}.")
+
+def compute_exposures(holdings):
+    """
+    Aggregate positions into the exposure cube for every snapshot in one pass per dimension.
+
+    Short positions count against net exposure; weights are relative to the
+    snapshot's gross market value, matching the exposure base used for
+    holdings-based returns.
+
+    Args:
+        holdings (DataFrame): PORTFOLIOCODE, HISTORYDATE, MARKETVALUE, POSITION_FLAG,
+            the dimension columns and SOURCEHASH.
+
+    Returns:
+        DataFrame: HOLDINGSEXPOSURE rows.
+    """
+    if holdings.empty:
+        return pd.DataFrame(columns=EXPOSURE_COLUMNS)
+
+    # One integer key per snapshot; every dimension groups on (snapshot, value code)
+    portfolio_idx, portfolios = pd.factorize(holdings["PORTFOLIOCODE"])
+    date_idx, dates = pd.factorize(pd.to_datetime(holdings["HISTORYDATE"]))
+    snapshot_idx, snapshots = pd.factorize(portfolio_idx.astype(np.int64) * len(dates) + date_idx)
+    snapshot_portfolio = np.asarray(portfolios, dtype=object)[snapshots // len(dates)]
+    snapshot_date = dates[snapshots % len(dates)]
+    snapshot_hash = np.empty(len(snapshots), dtype=np.int64)
+    snapshot_hash[snapshot_idx] = holdings["SOURCEHASH"].to_numpy(dtype=np.int64)
+
+    value = np.abs(holdings["MARKETVALUE"].to_numpy(dtype=np.float64))
+    is_short = (holdings["POSITION_FLAG"] == "SHORT").to_numpy()
+    long_value = np.where(is_short, 0.0, value)
+    short_value = np.where(is_short, value, 0.0)
+    gross_total = np.bincount(snapshot_idx, weights=value, minlength=len(snapshots))
+
+    frames = []
+    for dimension, column in EXPOSURE_DIMENSIONS.items():
+        value_idx, values = pd.factorize(holdings[column])
+        # Missing labels (code -1) become one extra Unclassified value
+        values = np.append(np.asarray(values, dtype=object), UNCLASSIFIED)
+        value_idx = np.where(value_idx < 0, len(values) - 1, value_idx)
+        cell_idx, cells = pd.factorize(snapshot_idx.astype(np.int64) * len(values) + value_idx)
+        cell_snapshot, cell_value = cells // len(values), cells % len(values)
+
+        longs = np.bincount(cell_idx, weights=long_value, minlength=len(cells))
+        shorts = np.bincount(cell_idx, weights=short_value, minlength=len(cells))
+        counts = np.bincount(cell_idx, minlength=len(cells))
+        base = gross_total[cell_snapshot]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            net_weight = np.where(base > 0, (longs - shorts) / base, np.nan)
+            gross_weight = np.where(base > 0, (longs + shorts) / base, np.nan)
+
+        frames.append(pd.DataFrame({
+            "PORTFOLIOCODE": snapshot_portfolio[cell_snapshot],
+            "HISTORYDATE": snapshot_date[cell_snapshot],
+            "DIMENSION": dimension,
+            "DIMENSIONVALUE": values[cell_value],
+            "LONGVALUE": np.round(longs, 2),
+            "SHORTVALUE": np.round(shorts, 2),
+            "NETWEIGHT": np.round(net_weight, 8),
+            "GROSSWEIGHT": np.round(gross_weight, 8),
+            "POSITIONCOUNT": counts,
+            "SOURCEHASH": snapshot_hash[cell_snapshot],
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+def insert_exposures(conn, df):
+    insert_sql = f"INSERT INTO {EXPOSURE_TABLE} ({', '.join(EXPOSURE_COLUMNS)}) VALUES ({', '.join(['%s'] * len(EXPOSURE_COLUMNS))})"
+    df = df[EXPOSURE_COLUMNS].copy()
+    df["HISTORYDATE"] = pd.to_datetime(df["HISTORYDATE"]).dt.to_pydatetime()
+    rows = df.astype(object).where(df.notna(), None).values.tolist()
+    with conn.cursor() as cur:
+        cur.executemany(insert_sql, rows)
+    print(f"Inserted {len(rows)} rows into {EXPOSURE_TABLE}.")
+
+def main():
+    """Rebuild exposure rows for snapshots whose holdings changed since the last refresh."""
+    conn = get_snowflake_connection()
+    if conn is None:
+        print("Failed to connect to Snowflake.")
+        return
+
+    try:
+        holdings = fetch_changed_holdings(conn)
+        num_snapshots = len(holdings[["PORTFOLIOCODE", "HISTORYDATE"]].drop_duplicates())
+        print(f"Fetched {len(holdings)} holdings rows for {num_snapshots} new or changed snapshots")
+
+        # Delete and insert commit together, so readers never see a half-refreshed snapshot
+        with conn.cursor() as cur:
+            cur.execute("BEGIN")
+        delete_stale_exposures(conn)
+        df = compute_exposures(holdings)
+        if not df.empty:
+            insert_exposures(conn, df)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
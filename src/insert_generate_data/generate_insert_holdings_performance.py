@@ -0,0 +1,207 @@
+# Holdings-driven portfolio performance
+
+import numpy as np
+import pandas as pd
+from src.db_connection import get_snowflake_connection, fetch_dataframe
+from src.schemas import PORTFOLIO_PERFORMANCE_SCHEMA, apply_schema, constant_column
+from src.insert_generate_data.generate_insert_portfolio_performance import insert_performance_data
+
+HOLDINGS_TABLE = "HOLDINGSDETAILS"
+PERFORMANCE_TABLE = "PORTFOLIOPERFORMANCE"
+HOLDINGS_PERFORMANCE_TYPE = "Gross Return"
+HOLDINGS_PERFORMANCE_CATEGORY = "Total Portfolio"
+
+def fetch_performance_watermarks(conn, performance_type=HOLDINGS_PERFORMANCE_TYPE):
+    """Latest stored HISTORYDATE per portfolio for holdings-derived returns."""
+    query = f"""
+        SELECT PORTFOLIOCODE, MAX(HISTORYDATE) AS MAX_DATE
+        FROM {PERFORMANCE_TABLE}
+        WHERE PERFORMANCETYPE = %(performance_type)s
+        GROUP BY PORTFOLIOCODE
+    """
+    df = fetch_dataframe(query, conn, params={"performance_type": performance_type})
+    return dict(zip(df["PORTFOLIOCODE"], pd.to_datetime(df["MAX_DATE"])))
+
+def fetch_inception_dates(conn):
+    """
+    First snapshot date per portfolio over all of HOLDINGSDETAILS. Incremental
+    reads start at the watermark, so inception cannot come from the fetched rows.
+    """
+    query = f"SELECT PORTFOLIOCODE, MIN(HISTORYDATE) AS FIRST_DATE FROM {HOLDINGS_TABLE} GROUP BY PORTFOLIOCODE"
+    df = fetch_dataframe(query, conn)
+    return dict(zip(df["PORTFOLIOCODE"], pd.to_datetime(df["FIRST_DATE"])))
+
+def fetch_holdings(conn, incremental=True, performance_type=HOLDINGS_PERFORMANCE_TYPE):
+    """
+    Fetch the position columns needed for return computation.
+
+    With incremental, each portfolio's snapshots are read only from its last
+    computed period end onwards (that snapshot starts the next period);
+    portfolios without stored returns are read in full.
+    """
+    query = f"""
+        SELECT h.PORTFOLIOCODE, h.TICKER, h.HISTORYDATE, h.SHARES, h.PRICE, h.POSITION_FLAG
+        FROM {HOLDINGS_TABLE} h
+    """
+    params = None
+    if incremental:
+        query += f"""
+        LEFT JOIN (
+            SELECT PORTFOLIOCODE, MAX(HISTORYDATE) AS MAX_DATE
+            FROM {PERFORMANCE_TABLE}
+            WHERE PERFORMANCETYPE = %(performance_type)s
+            GROUP BY PORTFOLIOCODE
+        ) w ON h.PORTFOLIOCODE = w.PORTFOLIOCODE
+        WHERE w.MAX_DATE IS NULL OR h.HISTORYDATE >= w.MAX_DATE
+        """
+        params = {"performance_type": performance_type}
+    return fetch_dataframe(query, conn, params=params, categories=["PORTFOLIOCODE", "TICKER", "POSITION_FLAG"])
+
+def price_history_from_holdings(holdings):
+    """Derive a (TICKER, HISTORYDATE, PRICE) price history from the holdings snapshots themselves."""
+    prices = holdings[["TICKER", "HISTORYDATE", "PRICE"]].dropna().drop_duplicates(subset=["TICKER", "HISTORYDATE"])
+    return prices.reset_index(drop=True)
+
+def asof_prices(ticker_idx, query_dates, price_ticker_idx, price_dates, price_values):
+    """
+    Last known price on or before each query date for each row's ticker.
+
+    Many positions share a (ticker, date) pair, so the pairs are de-duplicated
+    first and resolved with one sorted merge_asof on integer keys, then
+    gathered back to every row.
+    """
+    date_codes, unique_dates = pd.factorize(query_dates)
+    pair_codes, pairs = pd.factorize(ticker_idx.astype(np.int64) * len(unique_dates) + date_codes)
+
+    left = pd.DataFrame({
+        "TICKER": pairs // len(unique_dates),
+        "ASOFDATE": unique_dates[pairs % len(unique_dates)],
+        "PAIR": np.arange(len(pairs)),
+    }).sort_values("ASOFDATE", kind="stable")
+    right = pd.DataFrame({
+        "TICKER": price_ticker_idx,
+        "ASOFDATE": price_dates,
+        "PRICE": price_values,
+    }).sort_values("ASOFDATE", kind="stable")
+
+    merged = pd.merge_asof(left, right, on="ASOFDATE", by="TICKER", direction="backward")
+    pair_prices = np.empty(len(pairs))
+    pair_prices[merged["PAIR"].to_numpy()] = merged["PRICE"].to_numpy()
+    return pair_prices[pair_codes]
+
+def _date_ints(values):
+    return pd.to_datetime(values).to_numpy().astype("datetime64[ns]").astype(np.int64)
+
+def compute_holdings_returns(holdings, price_history, watermarks=None, inception_dates=None, frequency="Monthly", currency="USD"):
+    """
+    Compute portfolio returns from positions x prices for every portfolio in one pass.
+
+    Each holdings snapshot date starts a period that ends at the portfolio's next
+    snapshot date. Positions held at the start are valued with as-of prices at
+    both ends:
+
+        return = sum(sign * shares * (P_end - P_start)) / sum(|shares * P_start|)
+
+    where sign is -1 for SHORT positions. Gross exposure is the denominator, so
+    long/short books are measured against capital at risk.
+
+    Args:
+        holdings (DataFrame): PORTFOLIOCODE, TICKER, HISTORYDATE, SHARES, POSITION_FLAG.
+        price_history (DataFrame): TICKER, HISTORYDATE, PRICE.
+        watermarks (dict): PORTFOLIOCODE -> last computed period end. Only later
+            periods are returned, which makes the computation incremental.
+        inception_dates (dict): PORTFOLIOCODE -> first snapshot date in HOLDINGSDETAILS.
+            Required for correct PERFORMANCEINCEPTIONDATE on incremental runs;
+            portfolios missing from it fall back to their first fetched snapshot.
+
+    Returns:
+        DataFrame: PORTFOLIOPERFORMANCE rows typed per PORTFOLIO_PERFORMANCE_SCHEMA.
+    """
+    # Integer-encode portfolios, tickers and dates once; everything below joins on numbers
+    portfolio_idx, portfolio_codes = pd.factorize(holdings["PORTFOLIOCODE"])
+    ticker_idx, tickers = pd.factorize(holdings["TICKER"])
+    price_ticker_idx = pd.Index(tickers).get_indexer(price_history["TICKER"])
+    known = price_ticker_idx >= 0
+
+    positions = pd.DataFrame({
+        "PORTFOLIO": portfolio_idx,
+        "TICKER": ticker_idx,
+        "HISTORYDATE": _date_ints(holdings["HISTORYDATE"]),
+        "SHARES": holdings["SHARES"].to_numpy(dtype=np.float64),
+        "SIGN": np.where(np.asarray(holdings["POSITION_FLAG"], dtype=object) == "SHORT", -1.0, 1.0),
+    })
+
+    # Period boundaries: each snapshot date and the portfolio's next snapshot date
+    snapshots = positions[["PORTFOLIO", "HISTORYDATE"]].drop_duplicates().sort_values(["PORTFOLIO", "HISTORYDATE"])
+    snapshots["PERIODEND"] = snapshots.groupby("PORTFOLIO")["HISTORYDATE"].shift(-1)
+    inception = snapshots.groupby("PORTFOLIO")["HISTORYDATE"].min()
+    if inception_dates:
+        stored = pd.Series(inception_dates).reindex(portfolio_codes)
+        stored_ints = _date_ints(stored.fillna(pd.Timestamp(0)))
+        inception = pd.Series(
+            np.where(stored.isna().to_numpy(), inception.reindex(range(len(portfolio_codes))).to_numpy(), stored_ints)
+        )
+    snapshots = snapshots.dropna(subset=["PERIODEND"]).astype({"PERIODEND": np.int64})
+
+    if watermarks:
+        marks = pd.Series(watermarks).reindex(portfolio_codes)
+        mark_ints = np.where(marks.isna(), np.iinfo(np.int64).min, _date_ints(marks.fillna(pd.Timestamp(0))))
+        snapshots = snapshots[snapshots["PERIODEND"].to_numpy() > mark_ints[snapshots["PORTFOLIO"].to_numpy()]]
+
+    periods = positions.merge(snapshots, on=["PORTFOLIO", "HISTORYDATE"], how="inner")
+    if periods.empty:
+        return apply_schema(pd.DataFrame(columns=list(PORTFOLIO_PERFORMANCE_SCHEMA)), PORTFOLIO_PERFORMANCE_SCHEMA)
+
+    price_args = (
+        price_ticker_idx[known],
+        _date_ints(price_history["HISTORYDATE"])[known],
+        price_history["PRICE"].to_numpy(dtype=np.float64)[known],
+    )
+    start_price = asof_prices(periods["TICKER"].to_numpy(), periods["HISTORYDATE"].to_numpy(), *price_args)
+    end_price = asof_prices(periods["TICKER"].to_numpy(), periods["PERIODEND"].to_numpy(), *price_args)
+    periods["PNL"] = periods["SIGN"] * periods["SHARES"] * (end_price - start_price)
+    periods["EXPOSURE"] = np.abs(periods["SHARES"] * start_price)
+
+    totals = periods.groupby(["PORTFOLIO", "PERIODEND"], sort=True)[["PNL", "EXPOSURE"]].sum().reset_index()
+    totals = totals[totals["EXPOSURE"] > 0]
+    num_rows = len(totals)
+    row_portfolio = totals["PORTFOLIO"].to_numpy()
+
+    df = pd.DataFrame({
+        "PORTFOLIOCODE": pd.Categorical.from_codes(row_portfolio, categories=list(portfolio_codes)),
+        "HISTORYDATE": totals["PERIODEND"].to_numpy().astype("datetime64[ns]"),
+        "CURRENCYCODE": constant_column(currency, num_rows),
+        "PERFORMANCECATEGORYNAME": constant_column(HOLDINGS_PERFORMANCE_CATEGORY, num_rows),
+        "PERFORMANCEINCEPTIONDATE": inception.reindex(row_portfolio).to_numpy().astype("datetime64[ns]"),
+        "PERFORMANCEFREQUENCY": constant_column(frequency, num_rows),
+        "PERFORMANCEFACTOR": np.round((totals["PNL"] / totals["EXPOSURE"]).to_numpy(), 6),
+        "PERFORMANCETYPE": constant_column(HOLDINGS_PERFORMANCE_TYPE, num_rows),
+    })
+    return apply_schema(df, PORTFOLIO_PERFORMANCE_SCHEMA)
+
+def main():
+    """Compute holdings-based returns for periods newer than what is stored and insert them."""
+    conn = get_snowflake_connection()
+    if conn is None:
+        print("Failed to connect to Snowflake.")
+        return
+
+    try:
+        watermarks = fetch_performance_watermarks(conn)
+        holdings = fetch_holdings(conn, incremental=True)
+        print(f"Fetched {len(holdings)} holdings rows for {len(watermarks)} portfolios with stored returns")
+
+        df = compute_holdings_returns(
+            holdings, price_history_from_holdings(holdings), watermarks, fetch_inception_dates(conn)
+        )
+        if df.empty:
+            print("No new holdings periods to compute.")
+            return
+
+        print(df.head())
+        insert_performance_data(conn, df)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+# Synthetic holdings time series
+
+import os
+import glob
+import argparse
+import json
+import random
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from datetime import datetime
+from dotenv import load_dotenv
+from snowflake.connector.pandas_tools import write_pandas
+from src.db_connection import get_snowflake_connection
+from src.schemas import HOLDINGS_SCHEMA, apply_schema
+from src.streaming_loader import stream_chunks
+from src.insert_generate_data.generate_insert_holdings import fetch_all_portfolio_codes, get_tickers, derive_subsector
+
+load_dotenv()
+
+TABLE_NAME = "HOLDINGSDETAILS"
+HOLDINGS_SEED = 42
+CACHE_DIR = "cache"
+SECURITY_MASTER_CACHE = os.path.join(CACHE_DIR, "security_master.parquet")
+PRICE_HISTORY_CACHE = os.path.join(CACHE_DIR, "price_history.parquet")
+SHARD_DIR = os.path.join("output", "holdings_shards")
+COUNTRY_REGION_JSON = os.path.join("config", "country_region_map.json")
+
+CUSIP_ALPHABET = np.array(list("0123456789ABCDEFGHJKLMNPQRSTUVWXYZ"))
+COUNTRY_ISO = {
+    "United States": "US", "Canada": "CA", "Mexico": "MX", "Brazil": "BR", "Argentina": "AR",
+    "Chile": "CL", "United Kingdom": "GB", "Germany": "DE", "France": "FR", "Netherlands": "NL",
+    "Sweden": "SE", "Switzerland": "CH", "Ireland": "IE", "Japan": "JP", "China": "CN",
+    "Hong Kong": "HK", "India": "IN", "South Korea": "KR", "Singapore": "SG", "Taiwan": "TW",
+    "Australia": "AU", "New Zealand": "NZ", "South Africa": "ZA", "Israel": "IL"
+}
+
+def _char_values(chars):
+    """Map an array of single characters to CUSIP/ISIN values (0-9 -> 0-9, A-Z -> 10-35)."""
+    codes = np.ascontiguousarray(chars, dtype="U1").view(np.uint32)
+    return np.where(codes <= ord("9"), codes - ord("0"), codes - ord("A") + 10).astype(np.int64)
+
+def cusip_check_digits(bases):
+    """
+    Compute CUSIP check digits for an array of 8-character issuer+issue bases.
+    Vectorized modulus-10 "double-add-double" over all bases at once.
+    """
+    chars = np.asarray(bases, dtype="U8").view("U1").reshape(-1, 8)
+    values = _char_values(chars)
+    values[:, 1::2] *= 2
+    total = (values // 10 + values % 10).sum(axis=1)
+    return (10 - total % 10) % 10
+
+def isin_check_digits(bodies):
+    """
+    Compute ISIN check digits for an array of 11-character bodies (country + NSIN).
+
+    Letters expand to two digits, so the digit strings are right-aligned in a
+    fixed-width matrix and the Luhn weights are applied from the right.
+    """
+    chars = np.asarray(bodies, dtype="U11").view("U1").reshape(-1, 11)
+    values = _char_values(chars)
+    is_two_digit = values >= 10
+    # Expand each character into (tens, ones); single digits leave tens empty (-1)
+    tens = np.where(is_two_digit, values // 10, -1)
+    ones = np.where(is_two_digit, values % 10, values)
+    digits = np.stack([tens, ones], axis=2).reshape(len(values), -1)
+    # Right-align: push the -1 placeholders to the left of each row
+    order = np.argsort(digits >= 0, axis=1, kind="stable")
+    digits = np.take_along_axis(digits, order, axis=1)
+    width = digits.shape[1]
+    doubled = (np.arange(width)[::-1] % 2) == 0  # rightmost digit is doubled
+    weighted = np.where(doubled, digits * 2, digits)
+    weighted = np.where(digits >= 0, weighted // 10 + weighted % 10, 0)
+    return (10 - weighted.sum(axis=1) % 10) % 10
+
+def generate_cusips(rng, count):
+    """Generate count random CUSIPs with valid check digits."""
+    picks = rng.integers(0, len(CUSIP_ALPHABET), size=(count, 8))
+    bases = np.ascontiguousarray(CUSIP_ALPHABET[picks]).view("U8").ravel()
+    return np.char.add(bases, cusip_check_digits(bases).astype("U1"))
+
+def isins_from_cusips(cusips, country_codes):
+    """Build ISINs from CUSIPs and two-letter country codes, with valid check digits."""
+    bodies = np.char.add(np.asarray(country_codes, dtype="U2"), np.asarray(cusips, dtype="U9"))
+    return np.char.add(bodies, isin_check_digits(bodies).astype("U1"))
+
+def load_country_region_map(path=COUNTRY_REGION_JSON):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: Could not load country-region JSON ({e}), using defaults")
+        return {"United States": "North America"}
+
+def build_security_master(tickers, cache_path=SECURITY_MASTER_CACHE, refresh=False, seed=HOLDINGS_SEED):
+    """
+    Build or load the cached security master.
+
+    Each ticker's .info is fetched once and cached as Parquet together with its
+    generated CUSIP and ISIN, so identifiers stay stable across runs.
+    """
+    if os.path.exists(cache_path) and not refresh:
+        print(f"Loading security master from {cache_path}")
+        return pd.read_parquet(cache_path)
+
+    region_map = load_country_region_map()
+    records = []
+    for ticker in tickers:
+        try:
+            info = yf.Ticker(ticker).info
+        except Exception as e:
+            print(f"Error processing {ticker}: {e}")
+            continue
+        country = info.get("country", "United States") or "United States"
+        industry = info.get("industry", "Unknown") or "Unknown"
+        dividend_yield = info.get("dividendYield", 0) or 0
+        records.append({
+            "TICKER": ticker,
+            "ISSUENAME": info.get("longName", ticker),
+            "CURRENCYCODE": info.get("currency", "USD"),
+            "HQCOUNTRY": country,
+            "ISSUECOUNTRY": country,
+            "REGIONNAME": region_map.get(country, "North America"),
+            "PRIMARYSECTORNAME": info.get("sector", "Unknown") or "Unknown",
+            "PRIMARYSUBSECTORNAME": derive_subsector(industry),
+            "PRIMARYINDUSTRYNAME": industry,
+            "DIVIDENDYIELD": round(dividend_yield * 100, 2) if dividend_yield else 0,
+            "ASSETCLASSNAME": "Equity"
+        })
+
+    master = pd.DataFrame(records)
+    if master.empty:
+        return master
+
+    rng = np.random.default_rng(seed)
+    master["CUSIP"] = generate_cusips(rng, len(master))
+    countries = master["ISSUECOUNTRY"].map(COUNTRY_ISO).fillna("US").to_numpy()
+    master["ISINCODE"] = isins_from_cusips(master["CUSIP"].to_numpy(), countries)
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    master.to_parquet(cache_path, index=False)
+    print(f"Cached security master for {len(master)} tickers to {cache_path}")
+    return master
+
+def build_price_history(tickers, from_date, to_date, cache_path=PRICE_HISTORY_CACHE, refresh=False):
+    """
+    Build or load cached daily close prices as a long (TICKER, HISTORYDATE, PRICE) frame.
+    All tickers are downloaded in one batched yfinance call.
+    """
+    if os.path.exists(cache_path) and not refresh:
+        print(f"Loading price history from {cache_path}")
+        return pd.read_parquet(cache_path)
+
+    data = yf.download(list(tickers), start=from_date, end=to_date, progress=False)
+    if data.empty:
+        return pd.DataFrame(columns=["TICKER", "HISTORYDATE", "PRICE"])
+
+    closes = data["Close"] if isinstance(data.columns, pd.MultiIndex) else data[["Close"]].rename(columns={"Close": tickers[0]})
+    history = closes.rename_axis("HISTORYDATE").reset_index().melt(
+        id_vars="HISTORYDATE", var_name="TICKER", value_name="PRICE"
+    ).dropna(subset=["PRICE"])
+    history = history[["TICKER", "HISTORYDATE", "PRICE"]]
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    history.to_parquet(cache_path, index=False)
+    print(f"Cached {len(history)} price rows to {cache_path}")
+    return history
+
+def holding_dates(start_date, end_date, frequency="monthly"):
+    """Business-day ('daily') or month-end business-day ('monthly') holding dates."""
+    days = pd.bdate_range(start_date, end_date)
+    if frequency == "daily":
+        return days
+    month_ends = days.to_series().groupby(days.to_period("M")).max()
+    return pd.DatetimeIndex(month_ends.to_numpy())
+
+def build_price_matrix(price_history, tickers, dates):
+    """
+    Pivot the price history into a (dates x tickers) float matrix with as-of
+    (last known price) semantics. Missing history stays NaN.
+    """
+    wide = price_history.pivot_table(index="HISTORYDATE", columns="TICKER", values="PRICE", aggfunc="last")
+    wide.index = pd.to_datetime(wide.index)
+    wide = wide.reindex(columns=list(tickers))
+    wide = wide.reindex(wide.index.union(dates)).sort_index().ffill().reindex(dates)
+    return wide.to_numpy(dtype=np.float64)
+
+def prepare_holdings_inputs(security_master, price_history, dates):
+    """
+    Align the security master with its (dates x securities) price matrix,
+    dropping securities that have no price on any holding date.
+    """
+    security_master = security_master.reset_index(drop=True)
+    price_matrix = build_price_matrix(price_history, security_master["TICKER"], dates)
+    priced = ~np.isnan(price_matrix).all(axis=0)
+    if not priced.all():
+        print(f"Dropping {int((~priced).sum())} securities with no price history")
+        security_master = security_master[priced].reset_index(drop=True)
+        price_matrix = price_matrix[:, priced]
+    return security_master, price_matrix
+
+def generate_holdings_block(
+    portfolio_codes,
+    security_master,
+    price_matrix,
+    dates,
+    rng,
+    securities_per_portfolio=100,
+    short_fraction=0.1,
+    share_drift=0.05
+):
+    """
+    Generate position histories for a block of portfolios in one vectorized pass.
+
+    Each portfolio holds securities_per_portfolio distinct securities. Starting
+    share counts drift as a geometric random walk across dates, SHORT flags are
+    drawn per position, and prices come from price_matrix (dates x securities).
+    Dates before a security has any price are dropped.
+    """
+    num_portfolios = len(portfolio_codes)
+    num_securities = len(security_master)
+    num_dates = len(dates)
+    k = min(securities_per_portfolio, num_securities)
+
+    # Positions: k distinct securities per portfolio
+    picks = np.argsort(rng.random((num_portfolios, num_securities)), axis=1)[:, :k]
+    pos_portfolio = np.repeat(np.arange(num_portfolios), k)
+    pos_security = picks.ravel()
+    num_positions = len(pos_security)
+
+    shares0 = np.maximum(np.round(rng.lognormal(mean=7.0, sigma=1.0, size=num_positions)), 1)
+    is_short = rng.random(num_positions) < short_fraction
+    cost_factor = rng.uniform(0.6, 1.1, size=num_positions)
+    book_factor = rng.uniform(0.5, 2.0, size=num_positions)
+
+    steps = rng.normal(0.0, share_drift, size=(num_positions, num_dates))
+    steps[:, 0] = 0.0
+    shares = np.maximum(np.round(shares0[:, None] * np.exp(np.cumsum(steps, axis=1))), 1)
+
+    prices = np.round(price_matrix[:, pos_security].T, 2)  # (positions x dates)
+    held = ~np.isnan(prices)
+    first_price = prices[np.arange(num_positions), held.argmax(axis=1)]
+
+    pos_idx, date_idx = np.nonzero(held)
+    row_sec = pos_security[pos_idx]
+    row_price = prices[pos_idx, date_idx]
+    row_shares = shares[pos_idx, date_idx]
+
+    df = pd.DataFrame({
+        "PRICE": row_price,
+        "SHARES": row_shares,
+        "MARKETVALUE": np.round(row_price * row_shares, 2),
+        "BOOKVALUE": np.round(book_factor[pos_idx] * row_shares, 2),
+        "COSTBASIS": np.round(cost_factor[pos_idx] * first_price[pos_idx], 2),
+        "HISTORYDATE": np.asarray(dates, dtype="datetime64[us]")[date_idx],
+        "POSITION_FLAG": pd.Categorical.from_codes(is_short[pos_idx].astype(np.int8), categories=["LONG", "SHORT"]),
+        "PORTFOLIOCODE": pd.Categorical.from_codes(pos_portfolio[pos_idx], categories=list(portfolio_codes)),
+    })
+
+    # Security-level descriptive columns are gathered by categorical codes
+    for col in ["CUSIP", "ISINCODE", "ISSUENAME", "TICKER", "CURRENCYCODE", "HQCOUNTRY", "ISSUECOUNTRY", "ASSETCLASSNAME",
+                "PRIMARYINDUSTRYNAME", "PRIMARYSECTORNAME", "PRIMARYSUBSECTORNAME", "REGIONNAME"]:
+        master_col = security_master[col].astype("category")
+        df[col] = pd.Categorical.from_codes(master_col.cat.codes.to_numpy()[row_sec], categories=master_col.cat.categories)
+    df["DIVIDENDYIELD"] = security_master["DIVIDENDYIELD"].to_numpy(dtype=np.float64)[row_sec]
+
+    return apply_schema(df[list(HOLDINGS_SCHEMA)], HOLDINGS_SCHEMA)
+
+def iter_holdings_chunks(
+    portfolio_codes,
+    security_master,
+    price_history,
+    dates,
+    portfolios_per_shard=50,
+    seed=HOLDINGS_SEED,
+    **block_kwargs
+):
+    """
+    Yield holdings for portfolios_per_shard portfolios at a time.
+
+    Each chunk draws from its own Generator seeded with (seed, chunk index), so a
+    chunk's content does not depend on which other chunks are generated.
+    """
+    security_master, price_matrix = prepare_holdings_inputs(security_master, price_history, dates)
+    for shard_index, start in enumerate(range(0, len(portfolio_codes), portfolios_per_shard)):
+        block = portfolio_codes[start:start + portfolios_per_shard]
+        rng = np.random.default_rng([seed, shard_index])
+        yield generate_holdings_block(block, security_master, price_matrix, dates, rng, **block_kwargs)
+
+def write_holdings_shards(
+    portfolio_codes,
+    security_master,
+    price_history,
+    dates,
+    output_dir=SHARD_DIR,
+    portfolios_per_shard=50,
+    seed=HOLDINGS_SEED,
+    **block_kwargs
+):
+    """
+    Generate holdings for all portfolios in blocks and write one Parquet shard per block.
+
+    Returns:
+        list: Paths of the written shards.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    chunks = iter_holdings_chunks(
+        portfolio_codes, security_master, price_history, dates,
+        portfolios_per_shard=portfolios_per_shard, seed=seed, **block_kwargs
+    )
+    for shard_index, df in enumerate(chunks):
+        path = os.path.join(output_dir, f"holdings_{shard_index:05d}.parquet")
+        df.to_parquet(path, index=False)
+        paths.append(path)
+        print(f"Wrote {len(df)} rows to {path}")
+    return paths
+
+def load_holdings_chunk(conn, df, table_name=TABLE_NAME):
+    """Load one in-memory holdings chunk with write_pandas (Parquet upload + COPY)."""
+    success, _, num_rows, _ = write_pandas(conn, df, table_name)
+    if not success:
+        raise RuntimeError(f"write_pandas failed for {table_name}")
+    return num_rows
+
+def load_parquet_shards(conn, shard_dir=SHARD_DIR, table_name=TABLE_NAME):
+    """
+    Bulk load Parquet shards into Snowflake via a temporary stage and COPY INTO.
+    """
+    shard_paths = sorted(glob.glob(os.path.join(shard_dir, "*.parquet")))
+    if not shard_paths:
+        print(f"No shards found in {shard_dir}")
+        return 0
+
+    stage = f"{table_name}_SHARD_STAGE"
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TEMPORARY STAGE IF NOT EXISTS {stage} FILE_FORMAT = (TYPE = PARQUET)")
+        for path in shard_paths:
+            cur.execute(f"PUT 'file://{os.path.abspath(path)}' @{stage} AUTO_COMPRESS=FALSE OVERWRITE=TRUE PARALLEL=8")
+        cur.execute(f"""
+            COPY INTO {table_name}
+            FROM @{stage}
+            FILE_FORMAT = (TYPE = PARQUET)
+            MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+            PURGE = TRUE
+        """)
+        results = cur.fetchall()
+    conn.commit()
+    loaded = sum(row[3] for row in results if len(row) > 3 and isinstance(row[3], int))
+    print(f"Loaded {loaded} rows from {len(shard_paths)} shards into {table_name}")
+    return loaded
+
+def main():
+    """
+    Generate holdings histories for every portfolio and load them.
+
+    By default each chunk is loaded with write_pandas while the next one is
+    generated; --via-shards writes every chunk to Parquet first and loads the
+    shards with one COPY INTO.
+    """
+    parser = argparse.ArgumentParser(description="Generate and load synthetic holdings histories.")
+    parser.add_argument("--via-shards", action="store_true", help=f"Write Parquet shards to {SHARD_DIR} and COPY them in")
+    parser.add_argument("--portfolios-per-chunk", type=int, default=50)
+    args = parser.parse_args()
+
+    conn = get_snowflake_connection()
+    if conn is None:
+        print("Failed to connect to Snowflake.")
+        return
+
+    try:
+        portfolio_codes = fetch_all_portfolio_codes(conn)
+        print(f"Fetched {len(portfolio_codes)} portfolio codes")
+        if not portfolio_codes:
+            print("No portfolio codes found in PORTFOLIOGENERALINFO table.")
+            return
+
+        random.seed(HOLDINGS_SEED)
+        tickers = get_tickers()
+        security_master = build_security_master(tickers)
+        price_history = build_price_history(security_master["TICKER"].tolist(), "2018-01-01", datetime.today().strftime("%Y-%m-%d"))
+
+        dates = holding_dates("2018-01-01", datetime.today(), frequency="monthly")
+        if args.via_shards:
+            write_holdings_shards(
+                portfolio_codes, security_master, price_history, dates, portfolios_per_shard=args.portfolios_per_chunk
+            )
+            load_parquet_shards(conn)
+        else:
+            # Generate chunk N+1 while chunk N is being loaded
+            chunks = iter_holdings_chunks(
+                portfolio_codes, security_master, price_history, dates, portfolios_per_shard=args.portfolios_per_chunk
+            )
+            stream_chunks(chunks, lambda df: load_holdings_chunk(conn, df))
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 # /app/insert_portfolio_attributes.py
 import json
 import random
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from src.db_connection import get_snowflake_connection
+from src.reference_data import fetch_portfolio_codes as fetch_all_portfolio_codes
+from src.schemas import PORTFOLIO_ATTRIBUTES_SCHEMA, apply_schema
+from src.streaming_loader import stream_chunks
 from src.open_ai_interactions import get_openai_client_obj, interact_with_chat_application
 
 TABLE_NAME = "PORTFOLIOATTRIBUTES"
@@ -35,23 +39,37 @@ ATTRIBUTE_OPTIONS = {
     ]
 }
 
-def fetch_all_portfolio_codes(conn):
-    query = "SELECT DISTINCT PORTFOLIOCODE FROM PORTFOLIOGENERALINFO;"
-    df = pd.read_sql(query, conn)
-    return df['PORTFOLIOCODE'].dropna().unique().tolist()
+def generate_attribute_rows(portfolio_codes, seed=None):
+    """
+    Pick one option per attribute type for every portfolio.
+    Pass seed (int or np.random.Generator) for reproducible output.
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    attr_types = list(ATTRIBUTE_OPTIONS)
+    num_portfolios = len(portfolio_codes)
+
+    # (portfolio x attribute type) matrices of picked codes and values
+    attr_codes = np.empty((num_portfolios, len(attr_types)), dtype=object)
+    attr_values = np.empty((num_portfolios, len(attr_types)), dtype=object)
+    for j, attr_type in enumerate(attr_types):
+        options = ATTRIBUTE_OPTIONS[attr_type]
+        picks = rng.integers(0, len(options), size=num_portfolios)
+        attr_codes[:, j] = np.array([code for code, _ in options], dtype=object)[picks]
+        attr_values[:, j] = np.array([value for _, value in options], dtype=object)[picks]
 
-def generate_attribute_rows(portfolio_codes):
-    rows = []
-    for code in portfolio_codes:
-        for attr_type, options in ATTRIBUTE_OPTIONS.items():
-            attr_code, attr_value = random.choice(options)
-            rows.append({
-                "PORTFOLIOCODE": code,
-                "ATTRIBUTETYPE": attr_type,
-                "ATTRIBUTETYPECODE": attr_code,
-                "ATTRIBUTETYPEVALUE": attr_value
-            })
-    return pd.DataFrame(rows)
+    df = pd.DataFrame({
+        "PORTFOLIOCODE": np.repeat(np.asarray(portfolio_codes, dtype=object), len(attr_types)),
+        "ATTRIBUTETYPE": np.tile(np.asarray(attr_types, dtype=object), num_portfolios),
+        "ATTRIBUTETYPECODE": attr_codes.ravel(),
+        "ATTRIBUTETYPEVALUE": attr_values.ravel()
+    })
+    return apply_schema(df, PORTFOLIO_ATTRIBUTES_SCHEMA)
+
+def iter_attribute_chunks(portfolio_codes, seed=None, portfolios_per_chunk=5000):
+    """Yield attribute rows in chunks of portfolios_per_chunk portfolios from one Generator."""
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    for start in range(0, len(portfolio_codes), portfolios_per_chunk):
+        yield generate_attribute_rows(portfolio_codes[start:start + portfolios_per_chunk], seed=rng)
 
 def insert_portfolio_attributes(conn, df):
     insert_sql = f"""
@@ -61,14 +79,9 @@ def insert_portfolio_attributes(conn, df):
     VALUES (%s, %s, %s, %s);
     """
 
+    columns = ['PORTFOLIOCODE', 'ATTRIBUTETYPE', 'ATTRIBUTETYPECODE', 'ATTRIBUTETYPEVALUE']
     with conn.cursor() as cur:
-        for _, row in df.iterrows():
-            cur.execute(insert_sql, (
-                row['PORTFOLIOCODE'],
-                row['ATTRIBUTETYPE'],
-                row['ATTRIBUTETYPECODE'],
-                row['ATTRIBUTETYPEVALUE']
-            ))
+        cur.executemany(insert_sql, df[columns].astype(object).values.tolist())
     conn.commit()
     print(f"Inserted {len(df)} rows into {TABLE_NAME}.")
 
@@ -78,8 +91,6 @@ if __name__ == "__main__":
     portfolio_codes = fetch_all_portfolio_codes(conn)
     print(f"Fetched {len(portfolio_codes)} portfolio codes.")
 
-    df_attributes = generate_attribute_rows(portfolio_codes)
-    print(df_attributes.head())
-
-    insert_portfolio_attributes(conn, df_attributes)
+    chunks = iter_attribute_chunks(portfolio_codes)
+    stream_chunks(chunks, lambda df: insert_portfolio_attributes(conn, df))
     conn.close()
@@ -1,38 +1,27 @@
 import yfinance as yf
-import pandas as pd
+import numpy as np
 import os
 import logging
 import dotenv
 import random
 from src.db_connection import get_snowflake_connection
+from src.reference_data import fetch_portfolio_codes as fetch_portfolios, fetch_benchmark_codes as fetch_benchmarks
 from dotenv import load_dotenv
 load_dotenv()
 
 TABLE_NAME = "PORTFOLIOBENCHMARKASSOCIATION"
 
-def fetch_portfolios(conn):
-    query = "SELECT DISTINCT PORTFOLIOCODE FROM PORTFOLIOGENERALINFO;"
-    df = pd.read_sql(query, conn)
-    return df['PORTFOLIOCODE'].dropna().tolist()
-
-def fetch_benchmarks(conn):
-    query = "SELECT DISTINCT BENCHMARKCODE FROM BENCHMARKGENERALINFO;"
-    df = pd.read_sql(query, conn)
-    return df['BENCHMARKCODE'].dropna().tolist()
-
-def generate_associations(portfolios, benchmarks):
+def generate_associations(portfolios, benchmarks, seed=None):
     """
     Randomly assign 1 benchmark to each portfolio.
+    Pass seed (int or np.random.Generator) for reproducible output.
     """
     if not portfolios or not benchmarks:
         raise ValueError("Portfolios or Benchmarks list is empty.")
 
-    records = []
-    for code in portfolios:
-        benchmark = random.choice(benchmarks)
-        records.append((code, benchmark))
-
-    return records
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    picks = rng.integers(0, len(benchmarks), size=len(portfolios))
+    return [(code, benchmarks[i]) for code, i in zip(portfolios, picks)]
 
 def insert_associations(conn, associations):
     insert_sql = f"""
@@ -2,23 +2,28 @@
 
 import json
 import random
+import argparse
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from src.db_connection import get_snowflake_connection
-from src.open_ai_interactions import get_openai_client_obj, interact_with_chat_application
+from src.reference_data import fetch_product_codes as fetch_existing_product_codes
+from src.code_allocator import CodeAllocator
+from src.lexicon import load_lexicon, seed_lexicon_from_llm, choose, combine_names
+from src.llm_metrics import llm_step, record_parse_failure, report_llm_metrics
+from src.open_ai_interactions import (
+    get_openai_client_obj, interact_with_chat_batch, generate_structured_records
+)
 
 TABLE_NAME = "PORTFOLIOGENERALINFO"
 PRODUCT_TABLE = "PRODUCTMASTER"
 
-def fetch_existing_portfolio_codes(conn):
-    query = f"SELECT PORTFOLIOCODE FROM {TABLE_NAME};"
-    df = pd.read_sql(query, conn)
-    return set(df['PORTFOLIOCODE'].tolist()) if not df.empty else set()
-
-def fetch_existing_product_codes(conn):
-    query = f"SELECT DISTINCT PRODUCTCODE FROM {PRODUCT_TABLE};"
-    df = pd.read_sql(query, conn)
-    return df['PRODUCTCODE'].dropna().tolist()
+PORTFOLIO_CATEGORIES = ["Individual Account", "Composite", "Consolidated"]
+INVESTMENT_STYLES = [
+    "Growth", "Value", "Index", "Thematic", "Balanced", "Opportunistic",
+    "ESG Focus", "Dividend Yield", "Capital Appreciation"
+]
+BASE_CURRENCIES = [("USD", "US Dollar"), ("EUR", "Euro"), ("JPY", "Japanese Yen")]
 
 def extract_json_from_response(content):
     content = content.strip()
@@ -26,25 +31,19 @@ def extract_json_from_response(content):
         content = content.split("```")[1]
     return content.strip()
 
-def generate_single_portfolio(open_ai_client, index, strategy):
-    """
-    Generate one portfolio object using GPT with creative naming.
-    """
-    prompt = (
-        f"Generate ONE synthetic institutional portfolio as a valid JSON object. "
-        f"Required fields: "
-        f"PORTFOLIOCODE (format NVLN###), "
-        f"NAME (be original: use diverse terms like Trust, Plan, Fund, Reserve, Strategy, Overlay, Allocation, Opportunities, Capital, etc.), "
-        f"PORTFOLIOCATEGORY (randomly pick from: 'Individual Account', 'Composite', 'Consolidated'), "
-        f"INVESTMENTSTYLE (randomly pick from: 'Growth', 'Value', 'Index', 'Thematic', 'Balanced', 'Opportunistic', 'ESG Focus', 'Dividend Yield', 'Capital Appreciation'). "
-        f"Examples of good names: 'Starlight Opportunity Allocation', 'Silverwood Retirement Trust', "
-        f"'Apex Climate Composite', 'Ironleaf Strategic Reserve', 'Blue Horizon Capital Pool'. "
-        f"Respond with ONE valid JSON object only. No list. No extra text. No prefix/suffix. Just raw JSON."
-    )
-
-
+PORTFOLIO_PROMPT = (
+    f"Generate ONE synthetic institutional portfolio as a valid JSON object. "
+    f"Required fields: "
+    f"NAME (be original: use diverse terms like Trust, Plan, Fund, Reserve, Strategy, Overlay, Allocation, Opportunities, Capital, etc.), "
+    f"PORTFOLIOCATEGORY (randomly pick from: 'Individual Account', 'Composite', 'Consolidated'), "
+    f"INVESTMENTSTYLE (randomly pick from: 'Growth', 'Value', 'Index', 'Thematic', 'Balanced', 'Opportunistic', 'ESG Focus', 'Dividend Yield', 'Capital Appreciation'). "
+    f"Examples of good names: 'Starlight Opportunity Allocation', 'Silverwood Retirement Trust', "
+    f"'Apex Climate Composite', 'Ironleaf Strategic Reserve', 'Blue Horizon Capital Pool'. "
+    f"Respond with ONE valid JSON object only. No list. No extra text. No prefix/suffix. Just raw JSON."
+)
 
-    response = interact_with_chat_application(prompt, open_ai_client)
+def parse_portfolio(response, index):
+    """Parse one portfolio JSON object from a chat completion."""
     content = extract_json_from_response(response.choices[0].message.content.strip())
 
     try:
@@ -52,48 +51,157 @@ def generate_single_portfolio(open_ai_client, index, strategy):
         portfolio["INVESTMENTSTYLE"] = portfolio.get("INVESTMENTSTYLE", random.choice(["Growth", "Value", "Index", "Balanced", "Thematic"]))
         return portfolio
     except Exception as e:
+        record_parse_failure()
         raise ValueError(f"Error parsing GPT portfolio {index}: {content}") from e
 
+PORTFOLIO_RECORD_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "NAME": {"type": "string"},
+        "PORTFOLIOCATEGORY": {"type": "string", "enum": PORTFOLIO_CATEGORIES},
+        "INVESTMENTSTYLE": {"type": "string", "enum": INVESTMENT_STYLES},
+    },
+    "required": ["NAME", "PORTFOLIOCATEGORY", "INVESTMENTSTYLE"],
+    "additionalProperties": False,
+}
+
+PORTFOLIO_BATCH_INSTRUCTIONS = (
+    "Generate synthetic institutional portfolios. Every NAME must be distinct and original: "
+    "use diverse terms like Trust, Plan, Fund, Reserve, Strategy, Overlay, Allocation, Opportunities, Capital, etc. "
+    "Examples of good names: 'Starlight Opportunity Allocation', 'Silverwood Retirement Trust', "
+    "'Apex Climate Composite', 'Ironleaf Strategic Reserve', 'Blue Horizon Capital Pool'. "
+    "Vary PORTFOLIOCATEGORY and INVESTMENTSTYLE across records."
+)
+
+def portfolio_record_validator():
+    """Validator for batched portfolio records; rejects bad enums and repeated names."""
+    seen_names = set()
+
+    def validate(record):
+        name = str(record.get("NAME", "")).strip()
+        if not name or name.lower() in seen_names:
+            raise ValueError(f"Missing or duplicate NAME: {name!r}")
+        if record.get("PORTFOLIOCATEGORY") not in PORTFOLIO_CATEGORIES:
+            raise ValueError(f"Invalid PORTFOLIOCATEGORY: {record.get('PORTFOLIOCATEGORY')!r}")
+        if record.get("INVESTMENTSTYLE") not in INVESTMENT_STYLES:
+            raise ValueError(f"Invalid INVESTMENTSTYLE: {record.get('INVESTMENTSTYLE')!r}")
+        seen_names.add(name.lower())
+        return {"NAME": name, "PORTFOLIOCATEGORY": record["PORTFOLIOCATEGORY"], "INVESTMENTSTYLE": record["INVESTMENTSTYLE"]}
+
+    return validate
+
 def generate_random_date(start="2010-01-01", end="2023-12-31"):
     start_date = datetime.strptime(start, "%Y-%m-%d")
     end_date = datetime.strptime(end, "%Y-%m-%d")
     delta = (end_date - start_date).days
     return start_date + timedelta(days=random.randint(0, delta))
 
-def generate_portfolio_data(open_ai_client, conn, strategy, num_portfolios=10):
-    existing_codes = fetch_existing_portfolio_codes(conn)
-    product_codes = fetch_existing_product_codes(conn)
-    portfolios = []
+def add_portfolio_details(portfolio, code_allocator, product_codes):
+    """Fill code, dates, currency and product on a GPT-named portfolio record."""
+    # Unique PORTFOLIOCODE from the reserved block
+    portfolio['PORTFOLIOCODE'] = code_allocator.next_code()
 
-    for i in range(num_portfolios):
-        try:
-            portfolio = generate_single_portfolio(open_ai_client, i + 1, strategy)
+    open_date = generate_random_date()
+    perf_date = open_date + timedelta(days=random.randint(30, 365))
+    currency = random.choice(BASE_CURRENCIES)
+
+    portfolio.update({
+        "OPENDATE": open_date.date(),
+        "PERFORMANCEINCEPTIONDATE": perf_date.date(),
+        "ISBEGINOFDAYPERFORMANCE": random.choice([True, False]),
+        "BASECURRENCYCODE": currency[0],
+        "BASECURRENCYNAME": currency[1],
+        "PRODUCTCODE": random.choice(product_codes)
+    })
+    return portfolio
 
-            # Ensure unique PORTFOLIOCODE
-            while portfolio['PORTFOLIOCODE'] in existing_codes:
-                portfolio['PORTFOLIOCODE'] = f"NVLN{random.randint(100,999)}"
-            existing_codes.add(portfolio['PORTFOLIOCODE'])
+@llm_step("portfolio_general_info")
+def generate_portfolio_data(open_ai_client, conn, num_portfolios=10, code_allocator=None):
+    code_allocator = code_allocator or CodeAllocator.for_snowflake(conn, "portfolio")
+    product_codes = fetch_existing_product_codes(conn)
+    portfolios = []
 
-            open_date = generate_random_date()
-            perf_date = open_date + timedelta(days=random.randint(30, 365))
-            currency = random.choice([("USD", "US Dollar"), ("EUR", "Euro"), ("JPY", "Japanese Yen")])
+    # All GPT calls run concurrently; responses come back in request order
+    responses = interact_with_chat_batch([PORTFOLIO_PROMPT] * num_portfolios, open_ai_client, use_cache=False)
 
-            portfolio.update({
-                "OPENDATE": open_date.date(),
-                "PERFORMANCEINCEPTIONDATE": perf_date.date(),
-                "ISBEGINOFDAYPERFORMANCE": random.choice([True, False]),
-                "BASECURRENCYCODE": currency[0],
-                "BASECURRENCYNAME": currency[1],
-                "PRODUCTCODE": random.choice(product_codes)
-            })
+    for i, response in enumerate(responses):
+        try:
+            if isinstance(response, Exception):
+                raise response
+            portfolio = parse_portfolio(response, i + 1)
 
-            portfolios.append(portfolio)
+            portfolios.append(add_portfolio_details(portfolio, code_allocator, product_codes))
 
         except Exception as e:
             print(f"Failed to generate portfolio {i+1}: {e}")
 
     return pd.DataFrame(portfolios)
 
+@llm_step("portfolio_general_info")
+def generate_portfolio_data_batched(open_ai_client, conn, num_portfolios=100, code_allocator=None, records_per_call=25):
+    """
+    Generate portfolios with multi-record structured-output calls instead of one call each.
+    Invalid records are re-requested individually, so the result holds num_portfolios
+    rows unless the model keeps failing for every round.
+    """
+    code_allocator = code_allocator or CodeAllocator.for_snowflake(conn, "portfolio")
+    product_codes = fetch_existing_product_codes(conn)
+
+    records, stats = generate_structured_records(
+        open_ai_client, PORTFOLIO_BATCH_INSTRUCTIONS, PORTFOLIO_RECORD_SCHEMA, num_portfolios,
+        portfolio_record_validator(), schema_name="portfolios", records_per_call=records_per_call,
+        temperature=0.9
+    )
+    print(f"Portfolio generation: {stats}")
+    return pd.DataFrame([add_portfolio_details(record, code_allocator, product_codes) for record in records])
+
+def generate_portfolio_data_bulk(product_codes, num_portfolios, code_allocator, seed=None, lexicon=None,
+                                 start="2010-01-01", end="2023-12-31"):
+    """
+    Generate portfolio records without the LLM, vectorized over all rows.
+
+    NAME is assembled combinatorially from the lexicon (prefix + theme + suffix);
+    category, style, dates, currency and product are drawn the same way the
+    per-record path draws them. Use seed_lexicon_from_llm once beforehand to
+    mix LLM-sampled terms into the lexicon.
+
+    Args:
+        product_codes (list): PRODUCTCODEs to attach portfolios to.
+        num_portfolios (int): Number of records.
+        code_allocator (CodeAllocator): Source of unique PORTFOLIOCODEs.
+        seed (int | np.random.Generator): Seed for reproducible output.
+        lexicon (dict): Name parts; defaults to load_lexicon().
+
+    Returns:
+        DataFrame: PORTFOLIOGENERALINFO rows.
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    lexicon = lexicon or load_lexicon()
+
+    start_date = np.datetime64(start, "D")
+    span = (np.datetime64(end, "D") - start_date).astype(int)
+    open_dates = start_date + rng.integers(0, span + 1, size=num_portfolios)
+    perf_dates = open_dates + rng.integers(30, 366, size=num_portfolios)
+    currency_idx = rng.integers(0, len(BASE_CURRENCIES), size=num_portfolios)
+    currency_codes, currency_names = (np.array(col, dtype=object) for col in zip(*BASE_CURRENCIES))
+
+    names = combine_names(rng, [
+        lexicon["portfolio_prefixes"], lexicon["portfolio_themes"], lexicon["portfolio_suffixes"]
+    ], num_portfolios)
+
+    return pd.DataFrame({
+        "PORTFOLIOCODE": code_allocator.allocate(num_portfolios),
+        "NAME": names,
+        "INVESTMENTSTYLE": choose(rng, INVESTMENT_STYLES, num_portfolios),
+        "PORTFOLIOCATEGORY": choose(rng, PORTFOLIO_CATEGORIES, num_portfolios),
+        "OPENDATE": pd.to_datetime(open_dates),
+        "PERFORMANCEINCEPTIONDATE": pd.to_datetime(perf_dates),
+        "ISBEGINOFDAYPERFORMANCE": rng.random(num_portfolios) < 0.5,
+        "BASECURRENCYCODE": currency_codes[currency_idx],
+        "BASECURRENCYNAME": currency_names[currency_idx],
+        "PRODUCTCODE": choose(rng, product_codes, num_portfolios),
+    })
+
 def insert_into_portfolio_table(conn, df):
     insert_sql = f"""
     INSERT INTO {TABLE_NAME} (
@@ -123,14 +231,67 @@ def insert_into_portfolio_table(conn, df):
     conn.commit()
     print(f"Inserted {len(df)} new rows into {TABLE_NAME}.")
 
+def insert_portfolios_bulk(conn, df):
+    """
+    Insert allocator-coded portfolios in one batched statement.
+    Codes from CodeAllocator are unique, so no per-row existence check is needed.
+    """
+    insert_sql = f"""
+    INSERT INTO {TABLE_NAME} (
+        PORTFOLIOCODE, NAME, INVESTMENTSTYLE, PORTFOLIOCATEGORY,
+        OPENDATE, PERFORMANCEINCEPTIONDATE, ISBEGINOFDAYPERFORMANCE,
+        BASECURRENCYCODE, BASECURRENCYNAME, PRODUCTCODE
+    )
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
+    """
+
+    columns = [
+        'PORTFOLIOCODE', 'NAME', 'INVESTMENTSTYLE', 'PORTFOLIOCATEGORY',
+        'OPENDATE', 'PERFORMANCEINCEPTIONDATE', 'ISBEGINOFDAYPERFORMANCE',
+        'BASECURRENCYCODE', 'BASECURRENCYNAME', 'PRODUCTCODE'
+    ]
+    rows = df[columns].copy()
+    rows['OPENDATE'] = rows['OPENDATE'].dt.date
+    rows['PERFORMANCEINCEPTIONDATE'] = rows['PERFORMANCEINCEPTIONDATE'].dt.date
+    with conn.cursor() as cur:
+        cur.executemany(insert_sql, rows.astype(object).values.tolist())
+    conn.commit()
+    print(f"Inserted {len(df)} rows into {TABLE_NAME}.")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate PORTFOLIOGENERALINFO records.")
+    parser.add_argument("--bulk", type=int, default=None,
+                        help="Generate this many portfolios from the name lexicon instead of one GPT call each")
+    parser.add_argument("--seed-lexicon", action="store_true",
+                        help="Sample fresh name parts from GPT once and merge them into the lexicon")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--records-per-call", type=int, default=None,
+                        help="Ask GPT for this many portfolios per structured-output call")
+    parser.add_argument("--count", type=int, default=50)
+    args = parser.parse_args()
+
     conn = get_snowflake_connection()
-    open_ai_client = get_openai_client_obj()
 
-    strategy = "Global Value Equity"
-    df = generate_portfolio_data(open_ai_client, conn, strategy, num_portfolios=50)
-    print(df)
+    if args.bulk:
+        lexicon = seed_lexicon_from_llm(get_openai_client_obj()) if args.seed_lexicon else None
+        df = generate_portfolio_data_bulk(
+            fetch_existing_product_codes(conn), args.bulk,
+            CodeAllocator.for_snowflake(conn, "portfolio"), seed=args.seed, lexicon=lexicon
+        )
+        print(df.head())
+        insert_portfolios_bulk(conn, df)
+    elif args.records_per_call:
+        df = generate_portfolio_data_batched(
+            get_openai_client_obj(), conn, num_portfolios=args.count, records_per_call=args.records_per_call
+        )
+        print(df)
+        insert_into_portfolio_table(conn, df)
+    else:
+        open_ai_client = get_openai_client_obj()
+        df = generate_portfolio_data(open_ai_client, conn, num_portfolios=args.count)
+        print(df)
 
-    insert_into_portfolio_table(conn, df)
+        insert_into_portfolio_table(conn, df)
+    report_llm_metrics(conn)
     conn.close()
     print("Done.")
@@ -1,45 +1,88 @@
 # /app/insert_portfolio_performance.py
 
 import json
-import random
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
 from src.db_connection import get_snowflake_connection
+from src.reference_data import fetch_portfolio_codes as get_portfolio_codes
+from src.schemas import PORTFOLIO_PERFORMANCE_SCHEMA, apply_schema, constant_column
+from src.streaming_loader import stream_chunks
 from src.open_ai_interactions import get_openai_client_obj, interact_with_chat_application
 
 TABLE_NAME = "PORTFOLIOPERFORMANCE"
-
-def get_portfolio_codes(conn):
-    query = "SELECT DISTINCT PORTFOLIOCODE FROM PORTFOLIOGENERALINFO;"
-    return pd.read_sql(query, conn)['PORTFOLIOCODE'].dropna().unique().tolist()
+PERFORMANCE_SEED = 42
+PERFORMANCE_CATEGORIES = ["Equities", "Cash and Equiv."]
 
 def generate_monthly_dates(start_date, end_date):
-    current = start_date
-    while current <= end_date:
-        yield current
-        current += relativedelta(months=1)
-
-def generate_performance_data(portfolios, start_date, end_date):
-    rows = []
-    dates = list(generate_monthly_dates(start_date, end_date))
-
-    for code in portfolios:
-        inception_date = random.choice(dates)
-        for date in dates:
-            if date < inception_date:
-                continue
-            rows.append({
-                "PORTFOLIOCODE": code,
-                "HISTORYDATE": date.strftime('%Y-%m-%d'),
-                "CURRENCYCODE": "USD",
-                "PERFORMANCECATEGORYNAME": random.choice(["Equities", "Cash and Equiv."]),
-                "PERFORMANCEINCEPTIONDATE": inception_date.strftime('%Y-%m-%d'),
-                "PERFORMANCEFREQUENCY": "Monthly",
-                "PERFORMANCEFACTOR": round(random.uniform(-0.05, 0.05), 6),
-                "PERFORMANCETYPE": "Net Return"
-            })
-    return pd.DataFrame(rows)
+    """
+    Return month-stepped dates from start_date to end_date as a datetime64[D] array.
+    The day of month follows start_date, clipped to the last day of shorter months.
+    """
+    start = np.datetime64(pd.Timestamp(start_date).date(), "D")
+    end = np.datetime64(pd.Timestamp(end_date).date(), "D")
+    months = np.arange(start.astype("datetime64[M]"), end.astype("datetime64[M]") + 1)
+    month_lengths = ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(int)
+    day_offset = int((start - start.astype("datetime64[M]").astype("datetime64[D]")).astype(int))
+    dates = months.astype("datetime64[D]") + np.minimum(day_offset, month_lengths - 1)
+    return dates[dates <= end]
+
+def generate_performance_data(portfolios, start_date, end_date, seed=PERFORMANCE_SEED, inception_mask=None):
+    """
+    Generate monthly performance rows for every portfolio in one vectorized pass.
+
+    Builds the full portfolio x month grid, keeps the cells on or after each
+    portfolio's inception date and draws all random fields from a single
+    numpy Generator, so the same seed always produces the same frame.
+
+    Args:
+        portfolios (list): Portfolio codes.
+        start_date, end_date: Date range of the monthly grid.
+        seed (int | np.random.Generator): Seed or Generator for all random draws.
+        inception_mask (np.ndarray): Optional boolean (portfolio x month) mask of
+            active cells. When omitted, each portfolio gets a random inception month.
+
+    Returns:
+        DataFrame: PORTFOLIOPERFORMANCE rows typed per PORTFOLIO_PERFORMANCE_SCHEMA.
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    portfolios = list(dict.fromkeys(portfolios))
+    dates = generate_monthly_dates(start_date, end_date)
+    num_portfolios, num_dates = len(portfolios), len(dates)
+
+    if inception_mask is None:
+        inception_idx = rng.integers(0, num_dates, size=num_portfolios)
+        inception_mask = np.arange(num_dates)[None, :] >= inception_idx[:, None]
+    else:
+        inception_mask = np.asarray(inception_mask, dtype=bool)
+        inception_idx = inception_mask.argmax(axis=1)
+
+    portfolio_idx, date_idx = np.nonzero(inception_mask)
+    num_rows = len(portfolio_idx)
+
+    df = pd.DataFrame({
+        "PORTFOLIOCODE": pd.Categorical.from_codes(portfolio_idx, categories=portfolios),
+        "HISTORYDATE": dates[date_idx],
+        "CURRENCYCODE": constant_column("USD", num_rows),
+        "PERFORMANCECATEGORYNAME": pd.Categorical.from_codes(
+            rng.integers(0, len(PERFORMANCE_CATEGORIES), size=num_rows), categories=PERFORMANCE_CATEGORIES
+        ),
+        "PERFORMANCEINCEPTIONDATE": dates[inception_idx[portfolio_idx]],
+        "PERFORMANCEFREQUENCY": constant_column("Monthly", num_rows),
+        "PERFORMANCEFACTOR": np.round(rng.uniform(-0.05, 0.05, size=num_rows), 6),
+        "PERFORMANCETYPE": constant_column("Net Return", num_rows),
+    })
+    return apply_schema(df, PORTFOLIO_PERFORMANCE_SCHEMA)
+
+def iter_performance_chunks(portfolios, start_date, end_date, seed=PERFORMANCE_SEED, portfolios_per_chunk=1000):
+    """
+    Yield performance rows in chunks of portfolios_per_chunk portfolios.
+    All chunks draw from one Generator, so the sequence is reproducible for a seed.
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    portfolios = list(dict.fromkeys(portfolios))
+    for start in range(0, len(portfolios), portfolios_per_chunk):
+        yield generate_performance_data(portfolios[start:start + portfolios_per_chunk], start_date, end_date, seed=rng)
 
 def insert_performance_data(conn, df):
     sql = f"""
@@ -50,18 +93,16 @@ def insert_performance_data(conn, df):
     )
     VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
     """
+    df = df.copy()
+    df['HISTORYDATE'] = pd.to_datetime(df['HISTORYDATE']).dt.date
+    df['PERFORMANCEINCEPTIONDATE'] = pd.to_datetime(df['PERFORMANCEINCEPTIONDATE']).dt.date
+
+    columns = [
+        'PORTFOLIOCODE', 'HISTORYDATE', 'CURRENCYCODE', 'PERFORMANCECATEGORYNAME',
+        'PERFORMANCEINCEPTIONDATE', 'PERFORMANCEFREQUENCY', 'PERFORMANCEFACTOR', 'PERFORMANCETYPE'
+    ]
     with conn.cursor() as cur:
-        for _, row in df.iterrows():
-            cur.execute(sql, (
-                row['PORTFOLIOCODE'],
-                row['HISTORYDATE'],
-                row['CURRENCYCODE'],
-                row['PERFORMANCECATEGORYNAME'],
-                row['PERFORMANCEINCEPTIONDATE'],
-                row['PERFORMANCEFREQUENCY'],
-                row['PERFORMANCEFACTOR'],
-                row['PERFORMANCETYPE']
-            ))
+        cur.executemany(sql, df[columns].astype(object).values.tolist())
     conn.commit()
     print(f"Inserted {len(df)} rows into {TABLE_NAME}.")
 
@@ -72,8 +113,7 @@ if __name__ == "__main__":
     start = datetime(2010, 1, 1)
     end = datetime(2025, 7, 31)
 
-    df = generate_performance_data(portfolios, start, end)
-    print(df.head())
-
-    insert_performance_data(conn, df)
+    # Generate chunk N+1 while chunk N is being inserted
+    chunks = iter_performance_chunks(portfolios, start, end, seed=PERFORMANCE_SEED)
+    stream_chunks(chunks, lambda df: insert_performance_data(conn, df))
     conn.close()
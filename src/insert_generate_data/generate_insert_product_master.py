@@ -1,41 +1,32 @@
 import json
-import random
+from datetime import date
+import argparse
+import numpy as np
 import pandas as pd
 from src.db_connection import get_snowflake_connection
-from src.open_ai_interactions import interact_with_chat_application, get_openai_client_obj
+from src.reference_data import STRATEGY_NAMES, fetch_strategy_names
+from src.code_allocator import CodeAllocator
+from src.lexicon import load_lexicon, seed_lexicon_from_llm, choose, combine_names
+from src.llm_metrics import llm_step, record_parse_failure, report_llm_metrics
+from src.open_ai_interactions import (
+    interact_with_chat_batch, generate_structured_records, get_openai_client_obj
+)
 
 TABLE_NAME = "PRODUCTMASTER"
 
-def fetch_existing_product_codes(conn):
-    """
-    Fetch all existing PRODUCTCODEs from Snowflake to avoid duplicates.
-    """
-    query = f"SELECT PRODUCTCODE FROM {TABLE_NAME};"
-    df = pd.read_sql(query, conn)
-    return set(df['PRODUCTCODE'].tolist()) if not df.empty else set()
-
+ASSET_CLASSES = ["Equity", "Fixed Income", "Multi-Asset"]
+VEHICLE_TYPES = ["Separate Account", "Pooled Vehicle", "Mutual Fund"]
+VEHICLE_CATEGORIES = ["Hedge Fund", "ETF"]
+PRODUCT_STATUSES = ["Active", "Closed"]
 
 def fetch_strategies_from_snowflake(conn):
     """
-    Fetch unique strategy sections from StrategyInfo table.
-    """
-    query = "SELECT DISTINCT SECTION FROM StrategyInfo;"
-    df = pd.read_sql(query, conn)
-    strategies = df['SECTION'].tolist()
-    if not strategies:
-        strategies = [
-            "Long/Short Equity",
-            "Global Macro",
-            "Market Neutral",
-            "ESG Focus",
-            "Credit Arbitrage",
-            "Event Driven",
-            "Quantitative Equity",
-            "Sector Rotation",
-            "Multi-Asset",
-            "Opportunistic Alpha"
-        ]
-    return strategies
+    Fetch unique strategy names from StrategyInfo table.
+    PRODUCTMASTER.STRATEGY must match STRATEGYINFO.STRATEGYNAME so fact sheets
+    can join a product to its strategy text; without stored strategies the
+    names the qualitative generator uses are the fallback.
+    """
+    return fetch_strategy_names(conn) or list(STRATEGY_NAMES)
 
 
 def extract_json_from_response(content):
@@ -48,13 +39,10 @@ def extract_json_from_response(content):
     return content.strip()
 
 
-def generate_single_product(open_ai_client, product_index, strategy):
-    """
-    Generate one unique Novalon product using GPT, injecting a specific strategy.
-    """
-    prompt = (
+def product_prompt(strategy):
+    """Prompt for one Novalon product with the given strategy."""
+    return (
         f"Generate one synthetic hedge fund product as a JSON object with these keys: "
-        f"PRODUCTCODE (format NOVXXX where XXX is a 3-digit unique number), "
         f"PRODUCTNAME (must start with 'Novalon'), "
         f"ASSETCLASS (Equity, Fixed Income, Multi-Asset), "
         f"VEHICLETYPE (Separate Account, Pooled Vehicle, Mutual Fund), "
@@ -67,34 +55,101 @@ def generate_single_product(open_ai_client, product_index, strategy):
         f"Return only valid JSON, no explanations."
     )
 
-    response = interact_with_chat_application(prompt, open_ai_client)
+
+def parse_product(response, product_index, strategy):
+    """
+    Parse one product JSON object from a chat completion, enforcing the strategy.
+    """
     content = extract_json_from_response(response.choices[0].message.content.strip())
-    print(f"DEBUG Product {product_index}:\n{content}")
 
     try:
         product = json.loads(content)
         product['STRATEGY'] = strategy  # enforce strategy
         return product
     except json.JSONDecodeError as e:
+        record_parse_failure()
         raise ValueError(f"Failed to parse product {product_index}: {content}") from e
 
 
-def generate_product_data(open_ai_client, conn, strategies, num_products=10):
+def product_record_schema(strategies):
+    """Strict JSON schema for one product record, with STRATEGY limited to the given strategies."""
+    return {
+        "type": "object",
+        "properties": {
+            "PRODUCTNAME": {"type": "string"},
+            "STRATEGY": {"type": "string", "enum": list(strategies)},
+            "ASSETCLASS": {"type": "string", "enum": ASSET_CLASSES},
+            "VEHICLETYPE": {"type": "string", "enum": VEHICLE_TYPES},
+            "VEHICLECATEGORY": {"type": "string", "enum": VEHICLE_CATEGORIES},
+            "INCEPTIONDATE": {"type": "string", "description": "YYYY-MM-DD between 2013-01-01 and 2023-12-31"},
+            "STATUS": {"type": "string", "enum": PRODUCT_STATUSES},
+            "CURRENCY": {"type": "string", "enum": ["USD"]},
+            "MANAGER": {"type": "string"},
+        },
+        "required": [
+            "PRODUCTNAME", "STRATEGY", "ASSETCLASS", "VEHICLETYPE", "VEHICLECATEGORY",
+            "INCEPTIONDATE", "STATUS", "CURRENCY", "MANAGER"
+        ],
+        "additionalProperties": False,
+    }
+
+
+def product_record_validator(strategies):
     """
-    Generate multiple products row by row with diverse strategies, avoiding duplicates.
+    Validator for batched product records. Checks enums, the Novalon name prefix,
+    the inception date range and name uniqueness within the run.
     """
-    existing_codes = fetch_existing_product_codes(conn)
+    enums = {
+        "STRATEGY": set(strategies),
+        "ASSETCLASS": set(ASSET_CLASSES),
+        "VEHICLETYPE": set(VEHICLE_TYPES),
+        "VEHICLECATEGORY": set(VEHICLE_CATEGORIES),
+        "STATUS": set(PRODUCT_STATUSES),
+    }
+    seen_names = set()
+
+    def validate(record):
+        name = str(record.get("PRODUCTNAME", "")).strip()
+        if not name.startswith("Novalon") or name.lower() in seen_names:
+            raise ValueError(f"Invalid or duplicate PRODUCTNAME: {name!r}")
+        for field, allowed in enums.items():
+            if record.get(field) not in allowed:
+                raise ValueError(f"Invalid {field}: {record.get(field)!r}")
+        inception = date.fromisoformat(record["INCEPTIONDATE"])
+        if not date(2013, 1, 1) <= inception <= date(2023, 12, 31):
+            raise ValueError(f"INCEPTIONDATE out of range: {inception}")
+        if not str(record.get("MANAGER", "")).strip():
+            raise ValueError("Missing MANAGER")
+
+        seen_names.add(name.lower())
+        return {**record, "PRODUCTNAME": name, "CURRENCY": "USD", "INCEPTIONDATE": inception}
+
+    return validate
+
+
+@llm_step("product_master")
+def generate_product_data(open_ai_client, conn, strategies, num_products=10, code_allocator=None):
+    """
+    Generate multiple products with diverse strategies, one concurrent GPT call per product.
+    PRODUCTCODEs come from the code allocator, so existing codes are not loaded.
+    """
+    code_allocator = code_allocator or CodeAllocator.for_snowflake(conn, "product")
     products = []
 
-    for i in range(num_products):
-        strategy = strategies[i % len(strategies)]
+    # All GPT calls run concurrently; responses come back in request order
+    row_strategies = [strategies[i % len(strategies)] for i in range(num_products)]
+    responses = interact_with_chat_batch(
+        [product_prompt(s) for s in row_strategies], open_ai_client, use_cache=False
+    )
+
+    for i, (strategy, response) in enumerate(zip(row_strategies, responses)):
         try:
-            product = generate_single_product(open_ai_client, i + 1, strategy)
+            if isinstance(response, Exception):
+                raise response
+            product = parse_product(response, i + 1, strategy)
 
-            # Ensure PRODUCTCODE uniqueness
-            while product['PRODUCTCODE'] in existing_codes:
-                product['PRODUCTCODE'] = f"NOV{random.randint(100, 999)}"
-            existing_codes.add(product['PRODUCTCODE'])
+            # Unique PRODUCTCODE from the reserved block
+            product['PRODUCTCODE'] = code_allocator.next_code()
 
             products.append(product)
         except Exception as e:
@@ -105,6 +160,68 @@ def generate_product_data(open_ai_client, conn, strategies, num_products=10):
     return pd.DataFrame(products)
 
 
+def generate_product_data_bulk(strategies, num_products, code_allocator, seed=None, lexicon=None,
+                              start="2013-01-01", end="2023-12-31"):
+    """
+    Generate product records without the LLM, vectorized over all rows.
+    PRODUCTNAME is 'Novalon' + theme + suffix from the lexicon and strategies
+    are assigned round-robin, as in generate_product_data.
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    lexicon = lexicon or load_lexicon()
+
+    start_date = np.datetime64(start, "D")
+    span = (np.datetime64(end, "D") - start_date).astype(int)
+    inception = start_date + rng.integers(0, span + 1, size=num_products)
+    strategies = np.asarray(strategies, dtype=object)
+
+    names = combine_names(rng, [["Novalon"], lexicon["product_themes"], lexicon["product_suffixes"]], num_products)
+    managers = combine_names(
+        rng, [lexicon["manager_first_names"], lexicon["manager_last_names"]], num_products, unique=False
+    )
+
+    return pd.DataFrame({
+        "PRODUCTCODE": code_allocator.allocate(num_products),
+        "PRODUCTNAME": names,
+        "STRATEGY": strategies[np.arange(num_products) % len(strategies)],
+        "ASSETCLASS": choose(rng, ASSET_CLASSES, num_products),
+        "VEHICLETYPE": choose(rng, VEHICLE_TYPES, num_products),
+        "VEHICLECATEGORY": choose(rng, VEHICLE_CATEGORIES, num_products),
+        "INCEPTIONDATE": pd.to_datetime(inception),
+        "STATUS": choose(rng, PRODUCT_STATUSES, num_products),
+        "CURRENCY": "USD",
+        "MANAGER": managers,
+    })
+
+
+@llm_step("product_master")
+def generate_product_data_batched(open_ai_client, conn, strategies, num_products=100, code_allocator=None,
+                                 records_per_call=25):
+    """
+    Generate products with multi-record structured-output calls instead of one call each.
+    Each record is validated on its own and only rejected records are re-requested.
+    """
+    code_allocator = code_allocator or CodeAllocator.for_snowflake(conn, "product")
+    instructions = (
+        "Generate synthetic Novalon hedge fund products. Every PRODUCTNAME must start with 'Novalon' "
+        "and be distinct. Spread records evenly across the allowed STRATEGY values. "
+        "MANAGER is a realistic person name."
+    )
+
+    products, stats = generate_structured_records(
+        open_ai_client, instructions, product_record_schema(strategies), num_products,
+        product_record_validator(strategies), schema_name="products", records_per_call=records_per_call,
+        tokens_per_record=100, temperature=0.9
+    )
+    print(f"Product generation: {stats}")
+    if not products:
+        raise ValueError("No valid products generated.")
+
+    df = pd.DataFrame(products)
+    df['PRODUCTCODE'] = code_allocator.allocate(len(df))
+    return df
+
+
 def insert_into_product_master(conn, df):
     """
     Insert generated products into PRODUCTMASTER, skipping duplicates.
@@ -138,17 +255,69 @@ def insert_into_product_master(conn, df):
     conn.commit()
     print(f"Inserted {len(df)} new rows into {TABLE_NAME}.")
 
+def insert_products_bulk(conn, df):
+    """
+    Insert allocator-coded products in one batched statement.
+    Codes from CodeAllocator are unique, so no per-row existence check is needed.
+    """
+    insert_sql = f"""
+    INSERT INTO {TABLE_NAME} (
+        PRODUCTCODE, PRODUCTNAME, STRATEGY, ASSETCLASS, VEHICLETYPE, VEHICLECATEGORY,
+        INCEPTIONDATE, STATUS, CURRENCY, MANAGER
+    )
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
+    """
+
+    columns = [
+        'PRODUCTCODE', 'PRODUCTNAME', 'STRATEGY', 'ASSETCLASS', 'VEHICLETYPE', 'VEHICLECATEGORY',
+        'INCEPTIONDATE', 'STATUS', 'CURRENCY', 'MANAGER'
+    ]
+    rows = df[columns].copy()
+    rows['INCEPTIONDATE'] = rows['INCEPTIONDATE'].dt.date
+    with conn.cursor() as cur:
+        cur.executemany(insert_sql, rows.astype(object).values.tolist())
+    conn.commit()
+    print(f"Inserted {len(df)} rows into {TABLE_NAME}.")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate PRODUCTMASTER records.")
+    parser.add_argument("--bulk", type=int, default=None,
+                        help="Generate this many products from the name lexicon instead of one GPT call each")
+    parser.add_argument("--seed-lexicon", action="store_true",
+                        help="Sample fresh name parts from GPT once and merge them into the lexicon")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--records-per-call", type=int, default=None,
+                        help="Ask GPT for this many products per structured-output call")
+    parser.add_argument("--count", type=int, default=15)
+    args = parser.parse_args()
+
     conn = get_snowflake_connection()
-    open_ai_client = get_openai_client_obj()
 
     # Fetch diverse strategies
     strategies = fetch_strategies_from_snowflake(conn)
     print(f"Using strategies: {strategies}")
 
-    # Generate products
-    product_df = generate_product_data(open_ai_client, conn, strategies, num_products=15)
-    print("Generated Products:\n", product_df)
+    if args.bulk:
+        lexicon = seed_lexicon_from_llm(get_openai_client_obj()) if args.seed_lexicon else None
+        product_df = generate_product_data_bulk(
+            strategies, args.bulk, CodeAllocator.for_snowflake(conn, "product"), seed=args.seed, lexicon=lexicon
+        )
+        print("Generated Products:\n", product_df.head())
+        insert_products_bulk(conn, product_df)
+    elif args.records_per_call:
+        product_df = generate_product_data_batched(
+            get_openai_client_obj(), conn, strategies, num_products=args.count, records_per_call=args.records_per_call
+        )
+        print("Generated Products:\n", product_df)
+        insert_into_product_master(conn, product_df)
+    else:
+        open_ai_client = get_openai_client_obj()
+
+        # Generate products
+        product_df = generate_product_data(open_ai_client, conn, strategies, num_products=args.count)
+        print("Generated Products:\n", product_df)
+
+        # Insert into PRODUCTMASTER
+        insert_into_product_master(conn, product_df)
 
-    # Insert into PRODUCTMASTER
-    insert_into_product_master(conn, product_df)
+    report_llm_metrics(conn)
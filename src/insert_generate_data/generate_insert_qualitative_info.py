@@ -1,9 +1,15 @@
 from __future__ import annotations
+import re
 import json
-from typing import Iterable, List, Tuple
+import argparse
+from typing import Dict, Iterable, List, Tuple
 from dotenv import load_dotenv
 from src.db_connection import get_snowflake_connection
-from src.open_ai_interactions import get_openai_client_obj, interact_with_chat_application
+from src.reference_data import STRATEGY_NAMES
+from src.open_ai_interactions import get_openai_client_obj, interact_with_chat_application, interact_with_chat_batch, get_cache_stats
+from src.openai_batch import interact_with_chat_batch_offline
+from src.llm_metrics import llm_step, record_parse_failure, report_llm_metrics
+from src.response_cache import request_key
 
 load_dotenv()
 
@@ -27,17 +33,6 @@ FIRM_SECTION_PROMPTS = {
     ),
 }
 
-STRATEGY_NAMES: List[str] = [
-    "130/30 Long-Short Equity",
-    "Global Growth Stocks",
-    "Emerging Markets Equity",
-    "Convertible Bond Arbitrage",
-    "Multi-Asset Long/Short",
-    "ESG Focused Equity",
-    "Technology Growth",
-    "Hedge Fund Core",
-]
-
 STRATEGY_SECTIONS = ["Investment Process", "Team", "Risk Management"]
 
 STRAT_SECTION_PROMPTS = {
@@ -53,11 +48,34 @@ STRAT_SECTION_PROMPTS = {
     ),
 }
 
-def gen_text(client, system_msg: str, user_msg: str) -> str:
-    """Single call to the model, plain text only."""
-    r = interact_with_chat_application(user_msg, client, system_msg)
-    return r.choices[0].message.content.strip()
+# Everything that shapes a section's text; changing any of it changes the prompt hash.
+# Bump PROMPT_VERSION to force regeneration without editing a prompt.
+SECTION_SYSTEM_MSG = "Professional, factual. No markdown."
+SECTION_MODEL = "gpt-4.1"
+SECTION_TEMPERATURE = 0.2
+SECTION_MAX_TOKENS = 256
+PROMPT_VERSION = 1
+
+def section_prompt_hash(user_msg: str) -> str:
+    """Hash of the prompt, system message, model, parameters and version behind a section."""
+    return request_key({
+        "system": SECTION_SYSTEM_MSG,
+        "user": user_msg,
+        "model": SECTION_MODEL,
+        "temperature": SECTION_TEMPERATURE,
+        "max_tokens": SECTION_MAX_TOKENS,
+        "version": PROMPT_VERSION,
+    })
+
+def gen_texts(client, system_msg: str, user_msgs: List[str]) -> List[str]:
+    """Concurrent calls for many prompts sharing one system message, in prompt order."""
+    responses = interact_with_chat_batch(
+        user_msgs, client, system_msg, model=SECTION_MODEL, temperature=SECTION_TEMPERATURE,
+        max_tokens=SECTION_MAX_TOKENS, return_exceptions=False
+    )
+    return [r.choices[0].message.content.strip() for r in responses]
 
+@llm_step("strategy_codes")
 def gen_strategy_codes_with_gpt(client, names: List[str], prefix: str = "NOV") -> List[Tuple[str, str]]:
     """
     Return list of (code, name). Uses GPT to create mnemonic codes like NOV13030.
@@ -78,55 +96,145 @@ def gen_strategy_codes_with_gpt(client, names: List[str], prefix: str = "NOV") -
         if pairs:
             return pairs
     except Exception:
-        pass  # fall back below
+        record_parse_failure()  # fall back below
 
     # Fallback: deterministic codes
-    pairs = []
-    for n in names:
-        base = (
-            n.upper()
-             .replace("LONG-SHORT", "LS")
-             .replace("EQUITY", "EQ")
-             .replace(" ", "")
-             .replace("-", "")
-        )
-        pairs.append((prefix + base[:5], n))
-    return pairs
+    return [(deterministic_strategy_code(n, prefix), n) for n in names]
+
+def deterministic_strategy_code(name: str, prefix: str = "NOV") -> str:
+    """Alphanumeric code derived from the strategy name alone."""
+    base = (
+        name.upper()
+            .replace("LONG-SHORT", "LS")
+            .replace("EQUITY", "EQ")
+    )
+    return prefix + re.sub(r"[^A-Z0-9]", "", base)[:5]
+
+def resolve_strategy_codes(client, names: List[str], existing: Dict[str, str], prefix: str = "NOV") -> List[Tuple[str, str]]:
+    """
+    (code, name) for every strategy, reusing stored codes so they are stable across runs.
+    Only names without a stored code are sent to GPT, and only when there are any.
+    """
+    codes = {name: existing[name] for name in names if name in existing}
+    new_names = [name for name in names if name not in codes]
+    if new_names:
+        taken = set(codes.values())
+        generated = dict((n, c) for c, n in gen_strategy_codes_with_gpt(client, new_names, prefix=prefix))
+        for name in new_names:
+            code = generated.get(name) or deterministic_strategy_code(name, prefix)
+            suffix = 2
+            while code in taken:
+                code = f"{code[:len(prefix) + 4]}{suffix}"
+                suffix += 1
+            codes[name] = code
+            taken.add(code)
+    return [(codes[name], name) for name in names]
+
+def fetch_stored_sections(conn):
+    """
+    Stored prompt hashes per section and the stored strategy codes.
 
-def upsert_firm(conn, section: str, content: str) -> None:
+    Returns:
+        tuple: ({(table, code, section): hash}, {strategy name: code})
+    """
+    hashes, codes = {}, {}
+    with conn.cursor() as cur:
+        cur.execute("SELECT SECTION, PROMPTHASH FROM FIRMINFO")
+        for section, prompt_hash in cur.fetchall():
+            hashes[("FIRMINFO", None, section)] = prompt_hash
+        cur.execute("SELECT STRATEGYCODE, SECTION, STRATEGYNAME, PROMPTHASH FROM STRATEGYINFO")
+        for code, section, name, prompt_hash in cur.fetchall():
+            hashes[("STRATEGYINFO", code, section)] = prompt_hash
+            if name:
+                codes[name] = code
+    return hashes, codes
+
+def upsert_firm(conn, section: str, content: str, prompt_hash: str = None) -> None:
     with conn.cursor() as cur:
         cur.execute("DELETE FROM FIRMINFO WHERE SECTION = %s", (section,))
-        cur.execute("INSERT INTO FIRMINFO (SECTION, CONTENT) VALUES (%s, %s)", (section, content))
+        cur.execute(
+            "INSERT INTO FIRMINFO (SECTION, CONTENT, PROMPTHASH) VALUES (%s, %s, %s)",
+            (section, content, prompt_hash),
+        )
 
-def upsert_strategy(conn, code: str, section: str, content: str) -> None:
+def upsert_strategy(conn, code: str, section: str, content: str, name: str = None, prompt_hash: str = None) -> None:
     with conn.cursor() as cur:
         cur.execute("DELETE FROM STRATEGYINFO WHERE STRATEGYCODE = %s AND SECTION = %s", (code, section))
         cur.execute(
-            "INSERT INTO STRATEGYINFO (STRATEGYCODE, SECTION, CONTENT) VALUES (%s, %s, %s)",
-            (code, section, content),
+            "INSERT INTO STRATEGYINFO (STRATEGYCODE, SECTION, CONTENT, STRATEGYNAME, PROMPTHASH) VALUES (%s, %s, %s, %s, %s)",
+            (code, section, content, name, prompt_hash),
         )
 
-def main() -> None:
+def _generate_section_texts(client, requests, offline_batch):
+    """Texts for every keyed section prompt, live and concurrent or as one Batch API job."""
+    if not offline_batch:
+        # Firm + strategy content in one concurrent batch
+        return dict(zip(requests, gen_texts(client, SECTION_SYSTEM_MSG, list(requests.values()))))
+
+    custom_ids = {key: "|".join(part or "" for part in key) for key in requests}
+    results = interact_with_chat_batch_offline(
+        {custom_ids[key]: prompt for key, prompt in requests.items()}, client, SECTION_SYSTEM_MSG,
+        model=SECTION_MODEL, temperature=SECTION_TEMPERATURE, max_tokens=SECTION_MAX_TOKENS,
+        batch_name="qualitative_info"
+    )
+    texts = {}
+    for key, custom_id in custom_ids.items():
+        result = results[custom_id]
+        if isinstance(result, Exception):
+            print(f"Skipping {custom_id}: {result}")
+            continue
+        texts[key] = result.choices[0].message.content.strip()
+    return texts
+
+def main(offline_batch: bool = False, force: bool = False) -> None:
+    """
+    Generate only the sections whose prompt hash changed or that are missing.
+    A rerun with unchanged prompts makes no LLM calls; force regenerates everything.
+    """
     conn = get_snowflake_connection()
     client = get_openai_client_obj()
 
-    # Firm content
-    for section, prompt in FIRM_SECTION_PROMPTS.items():
-        text = gen_text(client, "Professional, factual. No markdown.", prompt)
-        upsert_firm(conn, section, text)
-        print(f"FIRMINFO -> {section}")
+    stored_hashes, stored_codes = fetch_stored_sections(conn)
+
+    # Stable strategy codes first; every section prompt depends on them
+    code_name_pairs = resolve_strategy_codes(client, STRATEGY_NAMES, stored_codes, prefix="NOV")
+    strategy_names = {code: name for code, name in code_name_pairs}
 
-    # Strategy codes + content
-    code_name_pairs = gen_strategy_codes_with_gpt(client, STRATEGY_NAMES, prefix="NOV")
+    # Every section keyed by (table, code, section) so results join back to their rows
+    prompts = {("FIRMINFO", None, section): prompt for section, prompt in FIRM_SECTION_PROMPTS.items()}
     for code, name in code_name_pairs:
         for section in STRATEGY_SECTIONS:
-            user = STRAT_SECTION_PROMPTS[section].format(name=name)
-            text = gen_text(client, "Professional, factual. No markdown.", user)
-            upsert_strategy(conn, code, section, text)
+            prompts[("STRATEGYINFO", code, section)] = STRAT_SECTION_PROMPTS[section].format(name=name)
+
+    hashes = {key: section_prompt_hash(prompt) for key, prompt in prompts.items()}
+    requests = {key: prompt for key, prompt in prompts.items() if force or stored_hashes.get(key) != hashes[key]}
+    print(f"{len(requests)} of {len(prompts)} sections changed or missing")
+
+    if requests:
+        with llm_step("qualitative_sections"):
+            texts = _generate_section_texts(client, requests, offline_batch)
+    else:
+        texts = {}
+
+    for (table, code, section), text in texts.items():
+        prompt_hash = hashes[(table, code, section)]
+        if table == "FIRMINFO":
+            upsert_firm(conn, section, text, prompt_hash)
+            print(f"FIRMINFO -> {section}")
+        else:
+            upsert_strategy(conn, code, section, text, strategy_names[code], prompt_hash)
             print(f"STRATEGYINFO -> {code} / {section}")
 
+    print(f"Response cache: {get_cache_stats()}")
+    report_llm_metrics(conn)
     conn.commit()
     conn.close()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate FIRMINFO and STRATEGYINFO content.")
+    parser.add_argument("--offline-batch", action="store_true",
+                        help="Submit all section prompts as one Batch API job instead of live calls")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenerate every section even if its prompt hash is unchanged")
+    args = parser.parse_args()
+    main(offline_batch=args.offline_batch, force=args.force)
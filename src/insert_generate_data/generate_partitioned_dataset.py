@@ -0,0 +1,159 @@
+# Partitioned synthetic dataset generation
+
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from src.db_connection import get_snowflake_connection
+from src.insert_generate_data.generate_insert_portfolio_performance import generate_performance_data, get_portfolio_codes
+from src.insert_generate_data.generate_insert_portfolio_attributes import generate_attribute_rows
+from src.insert_generate_data.generate_insert_portfolio_benchmark_association import generate_associations, fetch_benchmarks
+from src.insert_generate_data.generate_insert_holdings_timeseries import (
+    build_price_history, build_security_master, generate_holdings_block, holding_dates, prepare_holdings_inputs
+)
+from src.insert_generate_data.generate_insert_holdings import get_tickers
+
+MASTER_SEED = 42
+OUTPUT_DIR = os.path.join("output", "partitioned")
+PORTFOLIOS_PER_SHARD = 500
+LARGE_FIRM_PORTFOLIOS = 20000
+
+# Stable ids mixed into each shard's seed, so datasets never share a random stream
+DATASETS = {
+    "performance": 1,
+    "attributes": 2,
+    "associations": 3,
+    "holdings": 4,
+}
+
+# Read-only inputs shared by every shard, set once per worker process
+_CONTEXT = {}
+
+def shard_rng(master_seed, dataset, shard_index):
+    """Generator for one shard, derived from (master seed, dataset, shard index) only."""
+    return np.random.default_rng(np.random.SeedSequence([master_seed, DATASETS[dataset], shard_index]))
+
+def split_portfolios(portfolio_codes, portfolios_per_shard=PORTFOLIOS_PER_SHARD):
+    """
+    Split the sorted portfolio universe into fixed-size shards.
+    Shard boundaries depend only on the universe and shard size, never on worker count.
+    """
+    codes = sorted(set(portfolio_codes))
+    return [codes[i:i + portfolios_per_shard] for i in range(0, len(codes), portfolios_per_shard)]
+
+def synthetic_portfolio_codes(num_portfolios, prefix="NVLN"):
+    """Portfolio codes for a synthetic firm of the given size."""
+    width = max(3, len(str(num_portfolios - 1)))
+    return [f"{prefix}{i:0{width}d}" for i in range(num_portfolios)]
+
+def _init_worker(context):
+    _CONTEXT.update(context)
+
+def _generate_shard(task):
+    """Generate and write one (dataset, shard) pair. Runs inside a worker process."""
+    dataset, shard_index, portfolios, master_seed, output_dir = task
+    rng = shard_rng(master_seed, dataset, shard_index)
+
+    if dataset == "performance":
+        df = generate_performance_data(portfolios, _CONTEXT["start_date"], _CONTEXT["end_date"], seed=rng)
+    elif dataset == "attributes":
+        df = generate_attribute_rows(portfolios, seed=rng)
+    elif dataset == "associations":
+        pairs = generate_associations(portfolios, _CONTEXT["benchmarks"], seed=rng)
+        df = pd.DataFrame(pairs, columns=["PORTFOLIOCODE", "BENCHMARKCODE"])
+    elif dataset == "holdings":
+        df = generate_holdings_block(
+            portfolios, _CONTEXT["security_master"], _CONTEXT["price_matrix"], _CONTEXT["holding_dates"], rng
+        )
+    else:
+        raise ValueError(f"Unknown dataset: {dataset}")
+
+    path = os.path.join(output_dir, dataset, f"part-{shard_index:05d}.parquet")
+    df.to_parquet(path, index=False)
+    return dataset, shard_index, len(df), path
+
+def run_partitioned_generation(
+    portfolio_codes,
+    context,
+    datasets=("performance", "attributes", "associations"),
+    output_dir=OUTPUT_DIR,
+    master_seed=MASTER_SEED,
+    portfolios_per_shard=PORTFOLIOS_PER_SHARD,
+    max_workers=None
+):
+    """
+    Generate every requested dataset for the portfolio universe across a process pool.
+
+    Each (dataset, shard) task writes its own Parquet file and seeds its own
+    Generator from the master seed, so the files are byte-identical for any
+    max_workers.
+
+    Args:
+        portfolio_codes (list): Portfolio universe.
+        context (dict): Shared inputs: start_date/end_date (performance),
+            benchmarks (associations), security_master/price_matrix/holding_dates (holdings).
+        datasets (iterable): Names from DATASETS.
+
+    Returns:
+        list: (dataset, shard_index, rows, path) per written shard.
+    """
+    shards = split_portfolios(portfolio_codes, portfolios_per_shard)
+    for dataset in datasets:
+        os.makedirs(os.path.join(output_dir, dataset), exist_ok=True)
+
+    tasks = [
+        (dataset, shard_index, portfolios, master_seed, output_dir)
+        for dataset in datasets
+        for shard_index, portfolios in enumerate(shards)
+    ]
+    print(f"Generating {len(tasks)} shards ({len(shards)} per dataset) for {len(portfolio_codes)} portfolios")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(context,)) as pool:
+        results = list(pool.map(_generate_shard, tasks))
+    elapsed = time.perf_counter() - start
+
+    total_rows = sum(rows for _, _, rows, _ in results)
+    print(f"Wrote {total_rows} rows in {elapsed:.1f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a partitioned synthetic dataset.")
+    parser.add_argument("--portfolios", type=int, default=None,
+                        help="Synthesize this many portfolios instead of reading PORTFOLIOGENERALINFO")
+    parser.add_argument("--datasets", nargs="+", default=["performance", "attributes", "associations"],
+                        choices=list(DATASETS))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=MASTER_SEED)
+    args = parser.parse_args()
+
+    context = {
+        "start_date": datetime(2010, 1, 1),
+        "end_date": datetime(2025, 7, 31),
+    }
+    portfolio_codes = synthetic_portfolio_codes(args.portfolios) if args.portfolios else None
+    if portfolio_codes is None or "associations" in args.datasets:
+        conn = get_snowflake_connection()
+        try:
+            if portfolio_codes is None:
+                portfolio_codes = get_portfolio_codes(conn)
+            if "associations" in args.datasets:
+                context["benchmarks"] = fetch_benchmarks(conn)
+        finally:
+            conn.close()
+
+    if "holdings" in args.datasets:
+        security_master = build_security_master(get_tickers())
+        price_history = build_price_history(security_master["TICKER"].tolist(), "2018-01-01", datetime.today().strftime("%Y-%m-%d"))
+        dates = holding_dates("2018-01-01", datetime.today(), frequency="monthly")
+        context["security_master"], context["price_matrix"] = prepare_holdings_inputs(security_master, price_history, dates)
+        context["holding_dates"] = dates
+
+    run_partitioned_generation(portfolio_codes, context, datasets=args.datasets,
+                               master_seed=args.seed, max_workers=args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from datetime import datetime
 from dotenv import load_dotenv
 from snowflake.connector.pandas_tools import write_pandas
 from src.db_connection import get_snowflake_connection
+from src.schemas import BENCHMARK_PERFORMANCE_SCHEMA, apply_schema, constant_column
 import numpy as np
 
 load_dotenv()
@@ -26,10 +27,12 @@ def get_existing_data_info(conn, table_name):
             print(f"Table {table_name} doesn't exist.")
             return set(), None
         
-        # Get existing benchmark codes and their latest dates
+        # Get existing benchmark codes and their latest price dates; derived
+        # return rows share the table and must not move the price watermark
         cursor.execute(f"""
             SELECT BENCHMARKCODE, MAX(HISTORYDATE) as MAX_DATE
             FROM {table_name}
+            WHERE PERFORMANCEDATATYPE = 'Prices'
             GROUP BY BENCHMARKCODE
         """)
         
@@ -84,13 +87,13 @@ def fetch_benchmark_full_history(ticker, from_date, to_date, column_to_use="Clos
         # Create the standardized DataFrame structure using clean data
         num_rows = len(data_clean)
         result_df = pd.DataFrame({
-            "BENCHMARKCODE": [ticker.upper()] * num_rows,
-            "PERFORMANCEDATATYPE": ["Prices"] * num_rows,
-            "CURRENCYCODE": ["USD"] * num_rows,
-            "CURRENCY": ["US Dollar"] * num_rows,
-            "PERFORMANCEFREQUENCY": ["Daily"] * num_rows,
-            "HISTORYDATE": pd.to_datetime(data_clean["Date"]),
-            "VALUE": data_clean[column_to_use].astype(float)
+            "BENCHMARKCODE": constant_column(ticker.upper(), num_rows),
+            "PERFORMANCEDATATYPE": constant_column("Prices", num_rows),
+            "CURRENCYCODE": constant_column("USD", num_rows),
+            "CURRENCY": constant_column("US Dollar", num_rows),
+            "PERFORMANCEFREQUENCY": constant_column("Daily", num_rows),
+            "HISTORYDATE": pd.to_datetime(data_clean["Date"]).to_numpy(),
+            "VALUE": data_clean[column_to_use].to_numpy(dtype=np.float64)
         })
         
         # Verify no NaN values remain
@@ -103,37 +106,80 @@ def fetch_benchmark_full_history(ticker, from_date, to_date, column_to_use="Clos
         print(f"Error fetching {ticker}: {e}")
         return pd.DataFrame()
 
+def get_boundary_values(conn, table_name):
+    """
+    Get the last stored price per benchmark code.
+
+    Used as boundary context when validating only the new rows of an
+    incremental load, so continuity checks compare the first new price
+    against what is already in Snowflake.
+    """
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT BENCHMARKCODE, VALUE
+            FROM {table_name}
+            WHERE PERFORMANCEDATATYPE = 'Prices'
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY BENCHMARKCODE ORDER BY HISTORYDATE DESC) = 1
+        """)
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    except Exception as e:
+        print(f"Error fetching boundary values: {e}")
+        return {}
+    finally:
+        if cursor:
+            cursor.close()
+
 def filter_new_data(df, existing_benchmarks):
     """Filter dataframe to only include new data that doesn't exist in Snowflake."""
     if not existing_benchmarks or df.empty:
         return df
     
-    new_data_list = []
+    # Compare every row against its benchmark's watermark in one pass
+    watermarks = pd.Series(existing_benchmarks, dtype="object").map(pd.Timestamp)
+    row_watermarks = pd.to_datetime(df['BENCHMARKCODE'].astype(object).map(watermarks))
+    keep = row_watermarks.isna() | (pd.to_datetime(df['HISTORYDATE']) > row_watermarks)
+    new_data = df[keep.to_numpy()]
     
+    counts = new_data['BENCHMARKCODE'].value_counts()
     for benchmark_code in df['BENCHMARKCODE'].unique():
-        benchmark_data = df[df['BENCHMARKCODE'] == benchmark_code].copy()
-        
+        new_rows = int(counts.get(benchmark_code, 0))
         if benchmark_code in existing_benchmarks:
-            # Only keep data after the latest existing date
             latest_existing_date = existing_benchmarks[benchmark_code]
-            benchmark_data = benchmark_data[
-                benchmark_data['HISTORYDATE'] > latest_existing_date
-            ]
-            
-            if not benchmark_data.empty:
-                print(f"Found {len(benchmark_data)} new records for {benchmark_code} after {latest_existing_date}")
+            if new_rows:
+                print(f"Found {new_rows} new records for {benchmark_code} after {latest_existing_date}")
             else:
                 print(f"No new data for {benchmark_code} after {latest_existing_date}")
         else:
-            print(f"New benchmark {benchmark_code}: {len(benchmark_data)} total records")
-        
-        if not benchmark_data.empty:
-            new_data_list.append(benchmark_data)
+            print(f"New benchmark {benchmark_code}: {new_rows} total records")
     
-    if new_data_list:
-        return pd.concat(new_data_list, ignore_index=True)
-    else:
-        return pd.DataFrame()
+    return new_data.reset_index(drop=True)
+
+def validate_price_continuity(df, boundary_values, max_jump=0.5):
+    """
+    Check that prices continue smoothly from the last stored value.
+
+    Only the delta is passed in, so the last stored price per benchmark is
+    prepended before computing day-over-day changes. Returns a list of issues
+    for moves larger than max_jump (as a fraction).
+    """
+    issues = []
+    if df.empty:
+        return issues
+    
+    ordered = df.sort_values(['BENCHMARKCODE', 'HISTORYDATE'])
+    codes = ordered['BENCHMARKCODE'].astype(object)
+    previous = ordered.groupby(codes, sort=False)['VALUE'].shift(1)
+    previous = previous.fillna(codes.map(boundary_values or {}))
+    change = (ordered['VALUE'] / previous - 1).abs()
+    
+    jumps = ordered[change > max_jump]
+    for _, row in jumps.iterrows():
+        issues.append(
+            f"{row['BENCHMARKCODE']} on {row['HISTORYDATE']}: price moved more than {max_jump:.0%} from previous value"
+        )
+    return issues
 
 def validate_data_structure(df, conn, table_name):
     """Validate that DataFrame structure matches existing Snowflake table."""
@@ -217,24 +263,18 @@ def clean_data_for_snowflake(df):
         return df
 
 def upload_to_snowflake(df, table_name):
-    """Upload DataFrame directly to Snowflake with duplicate prevention and validation."""
+    """
+    Upload DataFrame directly to Snowflake with duplicate prevention and validation.
+
+    The watermark filter runs first so cleaning and validation only touch the
+    rows that will actually be inserted.
+    """
     if df.empty:
         print("No data to upload.")
         return
     
     print(f"Preparing to upload {df.shape[0]} rows and {df.shape[1]} columns.")
     
-    # Clean data before upload
-    df = clean_data_for_snowflake(df)
-    
-    if df.empty:
-        print("No data remaining after cleaning.")
-        return
-    
-    # Convert HISTORYDATE column to date
-    if "HISTORYDATE" in df.columns:
-        df["HISTORYDATE"] = pd.to_datetime(df["HISTORYDATE"]).dt.date
-    
     print("Connecting to Snowflake...")
     conn = get_snowflake_connection()
     if conn is None:
@@ -242,21 +282,38 @@ def upload_to_snowflake(df, table_name):
         return
     
     try:
-        # Validate data structure against existing table
-        if not validate_data_structure(df, conn, table_name):
-            print("Upload cancelled due to validation failure.")
-            return
-        
-        # Check existing data
+        # Check existing data and filter to the delta before any validation
         existing_benchmark_codes, existing_benchmarks = get_existing_data_info(conn, table_name)
-        
-        # Filter to only new data
         filtered_df = filter_new_data(df, existing_benchmarks)
         
         if filtered_df.empty:
             print("No new data to upload after filtering for duplicates.")
             return
         
+        # Clean the delta only
+        filtered_df = clean_data_for_snowflake(filtered_df)
+        
+        if filtered_df.empty:
+            print("No data remaining after cleaning.")
+            return
+        
+        # Validate data structure against existing table
+        if not validate_data_structure(filtered_df, conn, table_name):
+            print("Upload cancelled due to validation failure.")
+            return
+        
+        # Continuity against the last stored price per benchmark
+        boundary_values = get_boundary_values(conn, table_name) if existing_benchmarks else {}
+        continuity_issues = validate_price_continuity(filtered_df, boundary_values)
+        if continuity_issues:
+            print(f"Price continuity warnings ({len(continuity_issues)}):")
+            for issue in continuity_issues[:10]:
+                print(f"  - {issue}")
+        
+        # Convert HISTORYDATE column to date
+        filtered_df = filtered_df.copy()
+        filtered_df["HISTORYDATE"] = pd.to_datetime(filtered_df["HISTORYDATE"]).dt.date
+        
         print(f"Uploading {len(filtered_df)} new records to Snowflake table: {table_name}")
         
         # Final data validation before upload
@@ -323,7 +380,10 @@ def fetch_all_benchmark_data(benchmarks, from_date, to_date):
                 clean_columns.append(str(col))
         combined_df.columns = clean_columns
         
+        # Re-encode after concat: per-ticker categoricals union back to object dtype
+        combined_df = apply_schema(combined_df, BENCHMARK_PERFORMANCE_SCHEMA)
         print(f"Final column names: {list(combined_df.columns)}")
+        print(f"Combined frame memory: {combined_df.memory_usage(deep=True).sum() / 1e6:.2f} MB")
         return combined_df
     else:
         print("No data fetched.")
@@ -5,6 +5,7 @@ import requests
 import pandas as pd
 from dotenv import load_dotenv
 from src.db_connection import get_snowflake_connection
+from src.schemas import BENCHMARK_PERFORMANCE_SCHEMA, apply_schema
 
 load_dotenv()
 
@@ -47,10 +48,11 @@ def fetch_foreign_index(symbol: str, outputsize: str = "full") -> pd.DataFrame:
     df["HISTORYDATE"] = df.index
     df["VALUE"] = pd.to_numeric(df["close"], errors="coerce")
 
-    return df[[
+    df = df[[
         "BENCHMARKCODE", "PERFORMANCEDATATYPE", "CURRENCYCODE",
         "PERFORMANCEFREQUENCY", "HISTORYDATE", "VALUE"
     ]].reset_index(drop=True)
+    return apply_schema(df, BENCHMARK_PERFORMANCE_SCHEMA)
 
 def validate_benchmark_data(df: pd.DataFrame):
     """
@@ -118,6 +120,8 @@ if __name__ == "__main__":
 
     if all_data:
         final_df = pd.concat(all_data, ignore_index=True)
+        final_df = apply_schema(final_df, BENCHMARK_PERFORMANCE_SCHEMA)
+        final_df["HISTORYDATE"] = final_df["HISTORYDATE"].dt.date
 
         conn = get_snowflake_connection()
         insert_benchmark_performance(conn, final_df)
@@ -3,7 +3,8 @@ import os
 import requests
 import pandas as pd
 from dotenv import load_dotenv
-from src.db_connection import get_snowflake_connection
+from src.db_connection import get_snowflake_connection, fetch_dataframe
+from src.schemas import BENCHMARK_PERFORMANCE_SCHEMA, apply_schema
 
 load_dotenv()
 POLYGON_API_KEY = os.getenv("POLYGON_API_KEY")
@@ -37,7 +38,7 @@ def fetch_benchmark_full_history(ticker, from_date, to_date, column_to_use="clos
         return pd.DataFrame()
 
     df = pd.DataFrame(all_results)
-    df["HISTORYDATE"] = pd.to_datetime(df["t"], unit="ms").dt.date  # convert to Python date
+    df["HISTORYDATE"] = pd.to_datetime(df["t"], unit="ms")
     df = df.rename(columns={
         "o": "open",
         "h": "high",
@@ -52,10 +53,11 @@ def fetch_benchmark_full_history(ticker, from_date, to_date, column_to_use="clos
     df["PERFORMANCEFREQUENCY"] = "Daily"
     df["VALUE"] = pd.to_numeric(df[column_to_use], errors="coerce")
 
-    return df[[
+    df = df[[
         "BENCHMARKCODE", "PERFORMANCEDATATYPE", "CURRENCYCODE",
         "PERFORMANCEFREQUENCY", "HISTORYDATE", "VALUE"
     ]]
+    return apply_schema(df.copy(), BENCHMARK_PERFORMANCE_SCHEMA)
 
 def validate_benchmark_data(df: pd.DataFrame):
     issues = []
@@ -92,9 +94,10 @@ def filter_existing_rows(conn, df):
         SELECT BENCHMARKCODE, HISTORYDATE
         FROM {TABLE_NAME}
         WHERE BENCHMARKCODE IN ('{benchmark_codes}')
+          AND PERFORMANCEDATATYPE = 'Prices'
           AND HISTORYDATE BETWEEN '2024-12-01' AND '2024-12-31'
     """
-    existing = pd.read_sql(query, conn)
+    existing = fetch_dataframe(query, conn)
     if existing.empty:
         return df
 
@@ -131,6 +134,8 @@ if __name__ == "__main__":
 
     if all_benchmarks:
         final_df = pd.concat(all_benchmarks, ignore_index=True)
+        final_df = apply_schema(final_df, BENCHMARK_PERFORMANCE_SCHEMA)
+        final_df["HISTORYDATE"] = final_df["HISTORYDATE"].dt.date  # convert to Python date
         conn = get_snowflake_connection()
 
         # Filter out existing rows before insert
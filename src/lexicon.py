@@ -0,0 +1,101 @@
+# lexicon.py
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from src.open_ai_interactions import interact_with_chat_application
+from src.llm_metrics import llm_step, record_parse_failure
+
+LEXICON_JSON = os.path.join("config", "name_lexicon.json")
+SEEDED_LEXICON_JSON = os.path.join("cache", "name_lexicon.json")
+
+_SERIES_SUFFIXES = ["II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X"]
+
+def load_lexicon(path=None):
+    """
+    Load the name lexicon. The LLM-seeded lexicon in cache/ is preferred when it
+    exists, otherwise the curated lexicon in config/ is used.
+    """
+    if path is None:
+        path = SEEDED_LEXICON_JSON if os.path.exists(SEEDED_LEXICON_JSON) else LEXICON_JSON
+    with open(path, "r") as f:
+        return json.load(f)
+
+def _merge_terms(existing, new_terms):
+    """Append new terms to a lexicon list, keeping order and dropping duplicates."""
+    seen = {term.lower() for term in existing}
+    merged = list(existing)
+    for term in new_terms:
+        term = str(term).strip()
+        if term and term.lower() not in seen:
+            seen.add(term.lower())
+            merged.append(term)
+    return merged
+
+@llm_step("lexicon_seed")
+def seed_lexicon_from_llm(open_ai_client, sample_size=10, lexicon=None, path=SEEDED_LEXICON_JSON):
+    """
+    Ask the LLM once for a sample of fresh name parts and merge them into the lexicon.
+
+    This is the only LLM call in the bulk path; every record afterwards is
+    assembled from the lexicon combinatorially. The merged lexicon is saved to
+    path so later runs reuse it without calling the LLM again.
+    """
+    lexicon = lexicon or load_lexicon(LEXICON_JSON)
+    prompt = (
+        f"Return a JSON object with these keys, each holding a list of {sample_size} new, distinct entries: "
+        f"portfolio_prefixes (evocative one or two word brand names like 'Silverwood', 'Blue Horizon'), "
+        f"portfolio_themes (investment themes like 'Retirement', 'Climate', 'Income'), "
+        f"portfolio_suffixes (single words like 'Trust', 'Reserve', 'Overlay'), "
+        f"product_themes (hedge fund strategy phrases like 'Relative Value', 'Event Driven'), "
+        f"manager_first_names, manager_last_names. "
+        f"Respond with raw JSON only. No extra text."
+    )
+    response = interact_with_chat_application(prompt, open_ai_client, temperature=0.9, max_tokens=1024, use_cache=False)
+    content = response.choices[0].message.content.strip()
+    if content.startswith("```"):
+        content = content.split("```")[1].removeprefix("json")
+
+    try:
+        sample = json.loads(content)
+    except json.JSONDecodeError as e:
+        record_parse_failure()
+        raise ValueError(f"Failed to parse lexicon sample: {content}") from e
+
+    for key, terms in sample.items():
+        if key in lexicon and isinstance(terms, list):
+            lexicon[key] = _merge_terms(lexicon[key], terms)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(lexicon, f, indent=2)
+    print(f"Seeded lexicon saved to {path}")
+    return lexicon
+
+def choose(rng, values, size):
+    """Vectorized uniform choice from a list, returned as an object array."""
+    values = np.asarray(values, dtype=object)
+    return values[rng.integers(0, len(values), size=size)]
+
+def combine_names(rng, part_lists, size, unique=True):
+    """
+    Build size names by joining one random term from each list in part_lists.
+
+    With unique, repeated combinations get a series suffix (II, III, ...) so
+    names stay distinct even when size exceeds the number of combinations.
+    """
+    names = pd.Series(choose(rng, part_lists[0], size))
+    for parts in part_lists[1:]:
+        names = names + " " + choose(rng, parts, size)
+
+    if unique:
+        repeat = names.groupby(names).cumcount().to_numpy()
+        series = np.array([""] + [f" {s}" for s in _SERIES_SUFFIXES], dtype=object)
+        suffix = np.where(
+            repeat < len(series),
+            series[np.minimum(repeat, len(series) - 1)],
+            " " + pd.Series(repeat + 1).astype(str).to_numpy(dtype=object),
+        )
+        names = names + suffix
+    return names.to_numpy(dtype=object)
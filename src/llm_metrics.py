@@ -0,0 +1,158 @@
+# llm_metrics.py
+
+import os
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+METRICS_TABLE = "LLMCALLMETRICS"
+PERSIST_METRICS = os.getenv("LLM_METRICS_PERSIST", "").lower() in ("1", "true", "yes")
+
+# USD per million (prompt, completion) tokens, for spend estimates only
+MODEL_PRICES_PER_MILLION = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+BATCH_DISCOUNT = 0.5
+
+_current_step = contextvars.ContextVar("llm_step", default="unattributed")
+
+@contextmanager
+def llm_step(name):
+    """Tag every LLM call made inside the block with a pipeline step name."""
+    token = _current_step.set(name)
+    try:
+        yield
+    finally:
+        _current_step.reset(token)
+
+def current_step():
+    return _current_step.get()
+
+class LLMMetrics:
+    """
+    Thread-safe collector of per-call LLM metrics for one process.
+
+    Each event row holds the step, source (api, cache or batch), model,
+    latency, token usage, retries and error type; parse failures are
+    separate events so they can be counted against the step that caused them.
+    """
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex[:12]
+        self._events = []
+        self._persisted = 0
+        self._lock = threading.Lock()
+
+    def record_call(self, model, latency_ms, source="api", usage=None, retries=0, error=None, step=None):
+        event = {
+            "RUNID": self.run_id,
+            "STEP": step or current_step(),
+            "EVENTTYPE": "call",
+            "SOURCE": source,
+            "MODEL": model,
+            "CALLEDAT": datetime.now(),
+            "LATENCYMS": round(latency_ms, 3),
+            "PROMPTTOKENS": getattr(usage, "prompt_tokens", 0) if usage is not None else 0,
+            "COMPLETIONTOKENS": getattr(usage, "completion_tokens", 0) if usage is not None else 0,
+            "RETRIES": retries,
+            "ERRORTYPE": type(error).__name__ if error is not None else None,
+        }
+        with self._lock:
+            self._events.append(event)
+
+    def record_parse_failure(self, step=None):
+        event = {
+            "RUNID": self.run_id, "STEP": step or current_step(), "EVENTTYPE": "parse_failure",
+            "SOURCE": None, "MODEL": None, "CALLEDAT": datetime.now(), "LATENCYMS": None,
+            "PROMPTTOKENS": 0, "COMPLETIONTOKENS": 0, "RETRIES": 0, "ERRORTYPE": None,
+        }
+        with self._lock:
+            self._events.append(event)
+
+    def events(self):
+        with self._lock:
+            return pd.DataFrame(list(self._events), columns=[
+                "RUNID", "STEP", "EVENTTYPE", "SOURCE", "MODEL", "CALLEDAT", "LATENCYMS",
+                "PROMPTTOKENS", "COMPLETIONTOKENS", "RETRIES", "ERRORTYPE",
+            ])
+
+    def summary(self):
+        """
+        Per-step totals and latency percentiles.
+
+        Latency percentiles cover API calls only; cache hits are counted
+        separately so they do not hide slow calls.
+        """
+        events = self.events()
+        calls = events[events["EVENTTYPE"] == "call"].copy()
+        if calls.empty:
+            return pd.DataFrame()
+
+        prices = calls["MODEL"].map(lambda m: MODEL_PRICES_PER_MILLION.get(m, (np.nan, np.nan)))
+        discount = np.where(calls["SOURCE"] == "batch", BATCH_DISCOUNT, 1.0)
+        calls["COST_USD"] = discount * (
+            calls["PROMPTTOKENS"] * prices.str[0] + calls["COMPLETIONTOKENS"] * prices.str[1]
+        ) / 1e6
+        calls["CACHE_HIT"] = calls["SOURCE"] == "cache"
+        calls["FAILED"] = calls["ERRORTYPE"].notna()
+        api_latency = calls["LATENCYMS"].where(calls["SOURCE"] == "api")
+
+        grouped = calls.assign(API_LATENCYMS=api_latency).groupby("STEP")
+        summary = grouped.agg(
+            CALLS=("EVENTTYPE", "size"),
+            CACHE_HITS=("CACHE_HIT", "sum"),
+            FAILED=("FAILED", "sum"),
+            RETRIES=("RETRIES", "sum"),
+            PROMPT_TOKENS=("PROMPTTOKENS", "sum"),
+            COMPLETION_TOKENS=("COMPLETIONTOKENS", "sum"),
+            COST_USD=("COST_USD", "sum"),
+            P50_MS=("API_LATENCYMS", lambda s: s.quantile(0.50)),
+            P95_MS=("API_LATENCYMS", lambda s: s.quantile(0.95)),
+            P99_MS=("API_LATENCYMS", lambda s: s.quantile(0.99)),
+            TOTAL_CALL_SECONDS=("API_LATENCYMS", lambda s: s.sum() / 1000),
+        )
+        parse_failures = events[events["EVENTTYPE"] == "parse_failure"].groupby("STEP").size()
+        summary["PARSE_FAILURES"] = parse_failures.reindex(summary.index, fill_value=0)
+        return summary.sort_values("TOTAL_CALL_SECONDS", ascending=False).round(3)
+
+    def persist(self, conn):
+        """Append events recorded since the last persist to LLMCALLMETRICS."""
+        events = self.events()
+        new_count = len(events)
+        events = events.iloc[self._persisted:new_count]
+        if events.empty:
+            return
+        columns = list(events.columns)
+        insert_sql = f"INSERT INTO {METRICS_TABLE} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        rows = events.astype(object).where(events.notna(), None).values.tolist()
+        with conn.cursor() as cur:
+            cur.executemany(insert_sql, rows)
+        conn.commit()
+        self._persisted = new_count
+        print(f"Inserted {len(rows)} rows into {METRICS_TABLE}.")
+
+METRICS = LLMMetrics()
+
+def record_parse_failure(step=None):
+    METRICS.record_parse_failure(step)
+
+def report_llm_metrics(conn=None):
+    """
+    Print the per-step summary for this process and, when LLM_METRICS_PERSIST
+    is set and a connection is given, append the raw events to LLMCALLMETRICS.
+    """
+    summary = METRICS.summary()
+    if summary.empty:
+        print("No LLM calls recorded.")
+    else:
+        with pd.option_context("display.width", 200, "display.max_columns", None):
+            print(summary)
+    if conn is not None and PERSIST_METRICS:
+        METRICS.persist(conn)
+    return summary
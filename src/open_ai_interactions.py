@@ -1,20 +1,76 @@
 # open_ai_interactions.py
 
 import os
-from openai import OpenAI
+import json
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI, RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
+from openai.types.chat import ChatCompletion
 from dotenv import load_dotenv
+from src.response_cache import get_response_cache, request_key
+from src.llm_metrics import METRICS, llm_step, current_step, record_parse_failure
 
 load_dotenv()
 
+# Defaults for interact_with_chat_batch; override per call or through the environment
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+DEFAULT_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "200000"))
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
 def get_openai_client_obj():
     """
     Returns an OpenAI API client object.
+
+    Set OPENAI_BASE_URL to point the pipeline at an OpenAI-compatible server,
+    e.g. the local stand-in in src/openai_stand_in.py, which needs no API key.
+    OPENAI_CLIENT_MAX_RETRIES sets the SDK's own retries (default 2); set it to
+    0 to leave retrying to interact_with_chat_batch when benchmarking.
     """
-    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    base_url = os.getenv("OPENAI_BASE_URL") or None
+    api_key = os.getenv("OPENAI_API_KEY") or ("stand-in" if base_url else None)
+    max_retries = int(os.getenv("OPENAI_CLIENT_MAX_RETRIES", "2"))
+    return OpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries)
+
+def _cache_key(messages, model, temperature, max_tokens, response_format=None):
+    return request_key({
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "response_format": response_format,
+    })
+
+def lookup_cached_response(messages, **request):
+    """Cached ChatCompletion for an identical earlier request, or None."""
+    cache = get_response_cache()
+    if cache is None:
+        return None
+    payload = cache.get(_cache_key(messages, **request))
+    return ChatCompletion.model_validate_json(payload) if payload else None
+
+def store_response(messages, response, **request):
+    cache = get_response_cache()
+    if cache is None or not hasattr(response, "model_dump_json"):
+        return
+    usage = getattr(response, "usage", None)
+    cache.put(_cache_key(messages, **request), response.model_dump_json(), usage.total_tokens if usage else 0)
+
+def get_cache_stats():
+    """Hit/miss/tokens-saved counters of the response cache for this process."""
+    cache = get_response_cache()
+    return cache.summary() if cache else {}
 
-def interact_with_gpt4(messages, openai_client, model="gpt-4.1", temperature=0.2, max_tokens=256):
+def interact_with_gpt4(messages, openai_client, model="gpt-4.1", temperature=0.2, max_tokens=256, response_format=None,
+                       use_cache=True):
     """
     Calls OpenAI's GPT-4 model with the given messages.
+
+    Identical requests are answered from the persistent response cache. Pass
+    use_cache=False where repeated prompts must produce fresh variety.
     
     Args:
         messages (list): Conversation in OpenAI chat format.
@@ -22,19 +78,45 @@ def interact_with_gpt4(messages, openai_client, model="gpt-4.1", temperature=0.2
         model (str): Model to use.
         temperature (float): Sampling temperature.
         max_tokens (int): Maximum number of tokens to generate.
+        response_format (dict): Optional structured-output format, e.g. a JSON schema.
+        use_cache (bool): Read and write the response cache.
     
     Returns:
         dict: OpenAI API response.
     """
-    response = openai_client.chat.completions.create(
+    request = {"model": model, "temperature": temperature, "max_tokens": max_tokens, "response_format": response_format}
+    start = time.perf_counter()
+    if use_cache:
+        cached = lookup_cached_response(messages, **request)
+        if cached is not None:
+            METRICS.record_call(model, (time.perf_counter() - start) * 1000, source="cache")
+            return cached
+
+    start = time.perf_counter()
+    try:
+        response = _create_completion(messages, openai_client, **request)
+    except Exception as e:
+        METRICS.record_call(model, (time.perf_counter() - start) * 1000, error=e)
+        raise
+    METRICS.record_call(model, (time.perf_counter() - start) * 1000, usage=getattr(response, "usage", None))
+
+    if use_cache:
+        store_response(messages, response, **request)
+    return response
+
+def _create_completion(messages, openai_client, model, temperature, max_tokens, response_format=None):
+    """The raw API call, without caching or metrics."""
+    kwargs = {"response_format": response_format} if response_format else {}
+    return openai_client.chat.completions.create(
         model=model,
         messages=messages,
         temperature=temperature,
-        max_tokens=max_tokens
+        max_tokens=max_tokens,
+        **kwargs
     )
-    return response
 
-def interact_with_chat_application(prompt, openai_client, system_message=None, model="gpt-4.1", temperature=0.2, max_tokens=256):
+def interact_with_chat_application(prompt, openai_client, system_message=None, model="gpt-4.1", temperature=0.2, max_tokens=256,
+                                   use_cache=True):
     """
     Calls OpenAI GPT model with a single prompt and optional system message.
 
@@ -45,6 +127,7 @@ def interact_with_chat_application(prompt, openai_client, system_message=None, m
         model (str): Model to use.
         temperature (float): Sampling temperature.
         max_tokens (int): Maximum tokens to generate.
+        use_cache (bool): Read and write the response cache.
 
     Returns:
         dict: OpenAI API response.
@@ -54,4 +137,237 @@ def interact_with_chat_application(prompt, openai_client, system_message=None, m
         messages.append({"role": "system", "content": system_message})
     messages.append({"role": "user", "content": prompt})
 
-    return interact_with_gpt4(messages, openai_client, model=model, temperature=temperature, max_tokens=max_tokens)
+    return interact_with_gpt4(messages, openai_client, model=model, temperature=temperature, max_tokens=max_tokens,
+                              use_cache=use_cache)
+
+class RateLimiter:
+    """
+    Sliding one-minute window over requests and estimated tokens, shared by all
+    threads of a batch. acquire blocks until the call fits in both budgets.
+    """
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._window = deque()
+        self._tokens_in_window = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens):
+        # A single call larger than the whole budget is let through on an empty window
+        tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else tokens
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._window and now - self._window[0][0] >= 60:
+                    self._tokens_in_window -= self._window.popleft()[1]
+
+                fits_requests = not self.requests_per_minute or len(self._window) < self.requests_per_minute
+                fits_tokens = not self.tokens_per_minute or self._tokens_in_window + tokens <= self.tokens_per_minute
+                if fits_requests and fits_tokens:
+                    self._window.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return
+                wait = 60 - (now - self._window[0][0])
+            time.sleep(max(wait, 0.01))
+
+def estimate_tokens(messages, max_tokens):
+    """Rough token budget for a call: ~4 characters per prompt token plus the completion cap."""
+    return sum(len(m["content"]) for m in messages) // 4 + max_tokens
+
+def _call_with_retries(messages, openai_client, rate_limiter, max_retries, use_cache, **kwargs):
+    """
+    One chat completion under the rate limiter, retrying transient errors with
+    jittered backoff. Cache hits return before taking any rate-limit budget.
+    Recorded latency is time spent in API attempts, excluding limiter waits and backoff.
+    """
+    start = time.perf_counter()
+    if use_cache:
+        cached = lookup_cached_response(messages, **kwargs)
+        if cached is not None:
+            METRICS.record_call(kwargs["model"], (time.perf_counter() - start) * 1000, source="cache")
+            return cached
+
+    api_seconds = 0.0
+    for attempt in range(max_retries + 1):
+        rate_limiter.acquire(estimate_tokens(messages, kwargs["max_tokens"]))
+        start = time.perf_counter()
+        try:
+            response = _create_completion(messages, openai_client, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            api_seconds += time.perf_counter() - start
+            if attempt == max_retries:
+                METRICS.record_call(kwargs["model"], api_seconds * 1000, retries=attempt, error=e)
+                raise
+            time.sleep(min(2 ** attempt, 30) + random.random())
+            continue
+        except Exception as e:
+            api_seconds += time.perf_counter() - start
+            METRICS.record_call(kwargs["model"], api_seconds * 1000, retries=attempt, error=e)
+            raise
+
+        api_seconds += time.perf_counter() - start
+        METRICS.record_call(kwargs["model"], api_seconds * 1000, usage=getattr(response, "usage", None), retries=attempt)
+        if use_cache:
+            store_response(messages, response, **kwargs)
+        return response
+
+def interact_with_chat_batch(
+    prompts,
+    openai_client,
+    system_message=None,
+    model="gpt-4.1",
+    temperature=0.2,
+    max_tokens=256,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    rate_limiter=None,
+    max_retries=3,
+    return_exceptions=True,
+    response_format=None,
+    use_cache=True
+):
+    """
+    Run many single-prompt chat calls concurrently and return responses in prompt order.
+
+    Calls run on a thread pool of max_concurrency workers and pass through a
+    shared requests/tokens-per-minute limiter, so a batch takes about as long
+    as its slowest calls rather than the sum of all of them.
+
+    Args:
+        prompts (list): User prompts.
+        openai_client: OpenAI API client instance (safe to share across threads).
+        system_message (str): Optional system prompt applied to every call.
+        max_concurrency (int): Maximum calls in flight.
+        rate_limiter (RateLimiter): Shared limiter; a default one is created if omitted.
+        max_retries (int): Retries per call for rate-limit, timeout and server errors.
+        return_exceptions (bool): Put a failed call's exception in its slot
+            instead of raising, so one bad call does not sink the batch.
+        response_format (dict): Optional structured-output format for every call.
+        use_cache (bool): Serve repeated prompts from the response cache. Turn it
+            off when the same prompt is sent many times to get different answers.
+
+    Returns:
+        list: OpenAI API responses (or exceptions), aligned with prompts.
+    """
+    rate_limiter = rate_limiter or RateLimiter()
+    kwargs = {"model": model, "temperature": temperature, "max_tokens": max_tokens, "response_format": response_format}
+    # Worker threads do not inherit the caller's context, so carry the step tag over explicitly
+    step = current_step()
+
+    def run(prompt):
+        messages = []
+        if system_message:
+            messages.append({"role": "system", "content": system_message})
+        messages.append({"role": "user", "content": prompt})
+        try:
+            with llm_step(step):
+                return _call_with_retries(messages, openai_client, rate_limiter, max_retries, use_cache, **kwargs)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(prompts)))) as pool:
+        return list(pool.map(run, prompts))
+
+def records_response_format(name, record_schema):
+    """Strict JSON-schema response format for an object holding a list of records."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {"records": {"type": "array", "items": record_schema}},
+                "required": ["records"],
+                "additionalProperties": False,
+            },
+        },
+    }
+
+def generate_structured_records(
+    openai_client,
+    instructions,
+    record_schema,
+    num_records,
+    validate_record,
+    schema_name="records",
+    records_per_call=25,
+    tokens_per_record=80,
+    max_rounds=3,
+    **batch_kwargs
+):
+    """
+    Generate num_records records with a few multi-record structured-output calls.
+
+    Each call asks for up to records_per_call records matching record_schema.
+    Every returned record is validated on its own; invalid ones are dropped and
+    only the shortfall is re-requested in the next round, so one bad record
+    never costs a whole call.
+
+    Args:
+        openai_client: OpenAI API client instance.
+        instructions (str): What to generate; the record count is appended per call.
+        record_schema (dict): JSON schema of one record (strict mode rules apply).
+        num_records (int): Number of valid records wanted.
+        validate_record (callable): Returns the cleaned record or raises ValueError.
+        records_per_call (int): Records requested per completion.
+        tokens_per_record (int): Completion budget per record, used for max_tokens.
+        max_rounds (int): Generation rounds before giving up on the shortfall.
+        **batch_kwargs: Passed through to interact_with_chat_batch.
+
+    Returns:
+        tuple: (list of valid records, stats dict with calls, tokens and rejected count).
+    """
+    response_format = records_response_format(schema_name, record_schema)
+    # Every call in a round sends the same prompt, so cached answers would only repeat records
+    batch_kwargs.setdefault("use_cache", False)
+    records = []
+    stats = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "rejected": 0, "failed_calls": 0}
+
+    for round_number in range(max_rounds):
+        missing = num_records - len(records)
+        if missing <= 0:
+            break
+
+        counts = [records_per_call] * (missing // records_per_call)
+        if missing % records_per_call:
+            counts.append(missing % records_per_call)
+        prompts = [f"{instructions}\nReturn exactly {count} records." for count in counts]
+        responses = interact_with_chat_batch(
+            prompts, openai_client, max_tokens=max(counts) * tokens_per_record + 50,
+            response_format=response_format, **batch_kwargs
+        )
+
+        for response in responses:
+            stats["calls"] += 1
+            if isinstance(response, Exception):
+                stats["failed_calls"] += 1
+                continue
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                stats["prompt_tokens"] += usage.prompt_tokens
+                stats["completion_tokens"] += usage.completion_tokens
+            try:
+                batch = json.loads(response.choices[0].message.content)["records"]
+            except (TypeError, KeyError, json.JSONDecodeError):
+                batch = None
+            if not isinstance(batch, list):
+                stats["failed_calls"] += 1
+                record_parse_failure()
+                continue
+            for record in batch:
+                # Off-schema replies can hold strings or lists where objects belong
+                if not isinstance(record, dict):
+                    stats["rejected"] += 1
+                    record_parse_failure()
+                    continue
+                try:
+                    records.append(validate_record(record))
+                except (ValueError, TypeError, KeyError):
+                    stats["rejected"] += 1
+                    record_parse_failure()
+
+        print(f"Round {round_number + 1}: {len(records)}/{num_records} valid records after {stats['calls']} calls")
+
+    return records[:num_records], stats
@@ -0,0 +1,161 @@
+# openai_batch.py
+
+import os
+import io
+import json
+import time
+from datetime import datetime
+from openai.types.chat import ChatCompletion
+from src.open_ai_interactions import lookup_cached_response, store_response
+from src.llm_metrics import METRICS
+
+BATCH_DIR = os.path.join("output", "batches")
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+class BatchRequestError(Exception):
+    """A batch line that failed, expired or came back without a result."""
+    def __init__(self, custom_id, error):
+        super().__init__(f"Batch request {custom_id} failed: {error}")
+        self.custom_id = custom_id
+        self.error = error
+
+def batch_request_line(custom_id, messages, model="gpt-4.1", temperature=0.2, max_tokens=256, response_format=None):
+    """One Batch API input line for a chat completion."""
+    body = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+    if response_format:
+        body["response_format"] = response_format
+    return {"custom_id": custom_id, "method": "POST", "url": CHAT_COMPLETIONS_ENDPOINT, "body": body}
+
+def write_batch_file(lines, path):
+    """Write batch lines as JSONL and return the path."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return path
+
+def submit_batch(openai_client, path, completion_window="24h", metadata=None):
+    """Upload a JSONL request file and create a batch job for it."""
+    with open(path, "rb") as f:
+        input_file = openai_client.files.create(file=f, purpose="batch")
+    batch = openai_client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=CHAT_COMPLETIONS_ENDPOINT,
+        completion_window=completion_window,
+        metadata=metadata,
+    )
+    print(f"Submitted batch {batch.id} ({path})")
+    return batch
+
+def wait_for_batch(openai_client, batch_id, poll_interval=30, timeout=None):
+    """Poll a batch until it reaches a terminal status, or raise TimeoutError."""
+    start = time.monotonic()
+    while True:
+        batch = openai_client.batches.retrieve(batch_id)
+        if batch.status in TERMINAL_STATUSES:
+            print(f"Batch {batch_id} {batch.status}: {batch.request_counts}")
+            return batch
+        if timeout is not None and time.monotonic() - start > timeout:
+            raise TimeoutError(f"Batch {batch_id} still {batch.status} after {timeout}s")
+        time.sleep(poll_interval)
+
+def _read_jsonl(openai_client, file_id):
+    if not file_id:
+        return []
+    text = openai_client.files.content(file_id).text
+    return [json.loads(line) for line in io.StringIO(text) if line.strip()]
+
+def read_batch_results(openai_client, batch):
+    """
+    Download a finished batch's output and error files.
+
+    Returns:
+        dict: custom_id -> ChatCompletion, or BatchRequestError for failed lines.
+    """
+    results = {}
+    for line in _read_jsonl(openai_client, batch.output_file_id) + _read_jsonl(openai_client, batch.error_file_id):
+        custom_id = line["custom_id"]
+        response = line.get("response") or {}
+        if line.get("error") or response.get("status_code") != 200:
+            results[custom_id] = BatchRequestError(custom_id, line.get("error") or response.get("body"))
+        else:
+            results[custom_id] = ChatCompletion.model_validate(response["body"])
+    return results
+
+def interact_with_chat_batch_offline(
+    requests,
+    openai_client,
+    system_message=None,
+    model="gpt-4.1",
+    temperature=0.2,
+    max_tokens=256,
+    response_format=None,
+    use_cache=True,
+    batch_name="batch",
+    poll_interval=30,
+    timeout=None
+):
+    """
+    Run a set of keyed prompts through the Batch API and join results back by key.
+
+    Cache hits are answered locally; the remaining prompts are written as one
+    JSONL file under output/batches/, submitted once and polled until done.
+    Batch jobs trade latency (up to the completion window) for throughput and
+    lower cost, so this suits large regenerations rather than interactive runs.
+
+    Args:
+        requests (dict): custom_id -> user prompt. Ids must be unique strings and
+            are what ties each result back to its originating row.
+        openai_client: OpenAI API client instance.
+        system_message (str): Optional system prompt applied to every request.
+        use_cache (bool): Serve and store results through the response cache.
+        batch_name (str): Prefix for the JSONL file name.
+        poll_interval (int): Seconds between status checks.
+        timeout (int): Give up waiting after this many seconds.
+
+    Returns:
+        dict: custom_id -> ChatCompletion, or BatchRequestError for failed requests.
+    """
+    request_args = {"model": model, "temperature": temperature, "max_tokens": max_tokens, "response_format": response_format}
+    results = {}
+    pending = {}
+
+    for custom_id, prompt in requests.items():
+        messages = []
+        if system_message:
+            messages.append({"role": "system", "content": system_message})
+        messages.append({"role": "user", "content": prompt})
+
+        cached = lookup_cached_response(messages, **request_args) if use_cache else None
+        if cached is not None:
+            METRICS.record_call(model, 0.0, source="cache")
+            results[custom_id] = cached
+        else:
+            pending[custom_id] = messages
+
+    print(f"{len(results)} of {len(requests)} requests answered from cache; {len(pending)} sent as a batch")
+    if not pending:
+        return results
+
+    path = os.path.join(BATCH_DIR, f"{batch_name}_{datetime.now():%Y%m%d_%H%M%S}.jsonl")
+    write_batch_file(
+        [batch_request_line(custom_id, messages, **request_args) for custom_id, messages in pending.items()], path
+    )
+    start = time.perf_counter()
+    batch = submit_batch(openai_client, path, metadata={"name": batch_name})
+    batch = wait_for_batch(openai_client, batch.id, poll_interval=poll_interval, timeout=timeout)
+    batch_results = read_batch_results(openai_client, batch)
+    # Each request's latency is the batch turnaround, which is what its row waited for
+    turnaround_ms = (time.perf_counter() - start) * 1000
+
+    for custom_id, messages in pending.items():
+        result = batch_results.get(custom_id, BatchRequestError(custom_id, f"no result (batch {batch.status})"))
+        if isinstance(result, Exception):
+            METRICS.record_call(model, turnaround_ms, source="batch", error=result)
+        else:
+            METRICS.record_call(model, turnaround_ms, source="batch", usage=result.usage)
+        if use_cache and not isinstance(result, Exception):
+            store_response(messages, result, **request_args)
+        results[custom_id] = result
+    return results
@@ -0,0 +1,436 @@
+# openai_stand_in.py
+
+import os
+import re
+import ast
+import json
+import math
+import hashlib
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import deque
+from functools import lru_cache
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from src.lexicon import load_lexicon, LEXICON_JSON
+
+# Local OpenAI-compatible stand-in for the parts of the API the pipeline uses,
+# so generators can be load-tested without network access or API spend.
+# Completions are shaped like what each generator's prompt asks for, and
+# latency, server errors and rate limiting are configurable and seeded, so
+# concurrency, retry and caching behaviour can be benchmarked repeatably.
+# Point the pipeline at it with OPENAI_BASE_URL=http://127.0.0.1:8089/v1.
+
+SENTENCES = [
+    "The strategy applies a disciplined, research-driven process across liquid markets.",
+    "Portfolio construction balances conviction with diversification and liquidity constraints.",
+    "Risk is monitored daily against position, sector and drawdown limits.",
+    "The team combines fundamental research with systematic screening.",
+    "Turnover is managed to control transaction costs and market impact.",
+    "Decisions are made by the portfolio managers with input from sector analysts.",
+    "Past performance is not indicative of future results.",
+    "Returns are presented gross of fees unless otherwise stated.",
+    "Investments involve risk, including possible loss of principal.",
+    "This material is provided for institutional investors only.",
+]
+BULLETS = [
+    "Position limits per issuer", "Daily liquidity checks", "Scenario and VaR monitoring",
+    "Sector exposure caps", "Stop-loss review triggers", "Counterparty exposure limits",
+]
+
+# LEXICON_JSON is relative to the repo root; resolve it from this file so the
+# stand-in works whatever directory it is started from
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@lru_cache(maxsize=1)
+def _lexicon():
+    return load_lexicon(os.path.join(REPO_ROOT, LEXICON_JSON))
+
+def _new_id(prefix):
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+def _words(rng, lexicon, *keys):
+    return " ".join(rng.choice(lexicon[key]) for key in keys)
+
+def _quoted_options(prompt, field):
+    """Options listed in the prompt as FIELD (randomly pick from: 'a', 'b', ...)."""
+    match = re.search(rf"{field} \((?:randomly pick from: )?([^)]*)\)", prompt)
+    if not match:
+        return []
+    quoted = re.findall(r"'([^']+)'", match.group(1))
+    return quoted or [option.strip() for option in match.group(1).split(",") if option.strip()]
+
+def _fake_value(name, spec, rng, lexicon):
+    if "enum" in spec:
+        return rng.choice(spec["enum"])
+    if "DATE" in name:
+        return f"{rng.randint(2013, 2023)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    if name == "PRODUCTNAME":
+        return f"Novalon {_words(rng, lexicon, 'product_themes', 'product_suffixes')} {rng.randint(1, 999)}"
+    if name == "MANAGER":
+        return _words(rng, lexicon, "manager_first_names", "manager_last_names")
+    return f"{_words(rng, lexicon, 'portfolio_prefixes', 'portfolio_themes', 'portfolio_suffixes')} {rng.randint(1, 999)}"
+
+def _schema_records(schema, count, rng, lexicon):
+    properties = schema["properties"]["records"]["items"]["properties"]
+    return [{name: _fake_value(name, spec, rng, lexicon) for name, spec in properties.items()} for _ in range(count)]
+
+def fake_content(body, rng):
+    """
+    Completion text matching the shape the prompt asks for: structured
+    records, portfolio/product JSON, strategy codes, lexicon lists,
+    bullets or plain sentences.
+    """
+    prompt = body["messages"][-1]["content"]
+    lexicon = _lexicon()
+    response_format = body.get("response_format") or {}
+
+    if response_format.get("type") == "json_schema":
+        count = int((re.search(r"exactly (\d+) records", prompt) or [None, 1])[1])
+        return json.dumps({"records": _schema_records(response_format["json_schema"]["schema"], count, rng, lexicon)})
+
+    if "strategy codes" in prompt:
+        names = ast.literal_eval(prompt.split("Strategies:", 1)[1].strip())
+        prefix = (re.search(r"prefix '([A-Z0-9]+)'", prompt) or [None, "NOV"])[1]
+        return json.dumps([
+            {"code": f"{prefix}{re.sub(r'[^A-Z0-9]', '', n.upper())[:3]}{i}", "name": n} for i, n in enumerate(names)
+        ])
+
+    if "portfolio_prefixes" in prompt:
+        size = int((re.search(r"list of (\d+)", prompt) or [None, 5])[1])
+        return json.dumps({key: [f"{rng.choice(terms)}{rng.randint(1, 99)}" for _ in range(size)] for key, terms in lexicon.items()})
+
+    if "institutional portfolio" in prompt:
+        return json.dumps({
+            "NAME": _words(rng, lexicon, "portfolio_prefixes", "portfolio_themes", "portfolio_suffixes"),
+            "PORTFOLIOCATEGORY": rng.choice(_quoted_options(prompt, "PORTFOLIOCATEGORY") or ["Composite"]),
+            "INVESTMENTSTYLE": rng.choice(_quoted_options(prompt, "INVESTMENTSTYLE") or ["Growth"]),
+        })
+
+    if "hedge fund product" in prompt:
+        product = {
+            field: rng.choice(_quoted_options(prompt, field) or ["n/a"])
+            for field in ["ASSETCLASS", "VEHICLETYPE", "VEHICLECATEGORY"]
+        }
+        product.update({
+            "PRODUCTNAME": _fake_value("PRODUCTNAME", {}, rng, lexicon),
+            "STRATEGY": (re.search(r"strategy '([^']+)'", prompt) or [None, "Multi-Strategy"])[1],
+            "INCEPTIONDATE": _fake_value("INCEPTIONDATE", {}, rng, lexicon),
+            "STATUS": rng.choice(["Active", "Closed"]),
+            "CURRENCY": "USD",
+            "MANAGER": _fake_value("MANAGER", {}, rng, lexicon),
+        })
+        return json.dumps(product)
+
+    if "bullets" in prompt:
+        return "\n".join(f"- {b}" for b in rng.sample(BULLETS, 3))
+
+    count = int((re.search(r"Write (\d)", prompt) or [None, 2])[1])
+    return " ".join(rng.sample(SENTENCES, min(count, len(SENTENCES))))
+
+def fake_completion(body, rng):
+    """A chat.completion object for a chat request body."""
+    content = fake_content(body, rng)
+    prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+    completion_tokens = max(1, len(content) // 4)
+    return {
+        "id": _new_id("chatcmpl"),
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stand-in"),
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content},
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+class StandInConfig:
+    """
+    Behaviour of the stand-in.
+
+    Args:
+        latency_median_ms (float): Median chat latency; latencies are lognormal around it.
+        latency_sigma (float): Lognormal shape; larger values give a longer tail.
+        error_rate (float): Share of chat calls answered with a 500.
+        rate_limit_rate (float): Share of chat calls answered with a random 429.
+        requests_per_minute (int): Hard per-minute limit; calls beyond it get a 429.
+        batch_delay (float): Seconds each batch stays in progress.
+        seed (int): Seed for latency, error and content draws.
+    """
+    def __init__(self, latency_median_ms=0.0, latency_sigma=0.5, error_rate=0.0, rate_limit_rate=0.0,
+                 requests_per_minute=None, batch_delay=0.0, seed=0):
+        self.latency_median_ms = latency_median_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.requests_per_minute = requests_per_minute
+        self.batch_delay = batch_delay
+        self.seed = seed
+
+class StandInState:
+    """Uploaded files, batch jobs, the rate-limit window and call counters, held in memory."""
+    def __init__(self, config=None):
+        self.config = config or StandInConfig()
+        self.files = {}
+        self.batches = {}
+        self.seen = {}
+        self.window = deque()
+        self.stats = {"chat_requests": 0, "completed": 0, "rate_limited": 0, "server_errors": 0}
+        self.lock = threading.Lock()
+
+    def request_rng(self, body):
+        """
+        Random source for one request, derived from the seed, the request body
+        and how many times that body has been seen. Draws therefore depend on
+        what was asked, not on thread interleaving, so concurrent runs are repeatable.
+        """
+        key = json.dumps(body, sort_keys=True)
+        with self.lock:
+            occurrence = self.seen[key] = self.seen.get(key, 0) + 1
+        digest = hashlib.sha256(f"{self.config.seed}:{occurrence}:{key}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def admit_chat(self, rng):
+        """
+        Decide the outcome of one chat call under the configured limits.
+
+        Returns:
+            tuple: (status code, latency seconds, retry-after seconds).
+        """
+        config = self.config
+        with self.lock:
+            self.stats["chat_requests"] += 1
+            now = time.monotonic()
+            while self.window and now - self.window[0] >= 60:
+                self.window.popleft()
+            if config.requests_per_minute and len(self.window) >= config.requests_per_minute:
+                self.stats["rate_limited"] += 1
+                return 429, 0.0, 60 - (now - self.window[0])
+            self.window.append(now)
+
+        if rng.random() < config.rate_limit_rate:
+            outcome = 429, 0.0, 1.0
+        else:
+            latency = 0.0
+            if config.latency_median_ms > 0:
+                latency = rng.lognormvariate(math.log(config.latency_median_ms / 1000), config.latency_sigma)
+            outcome = (500 if rng.random() < config.error_rate else 200), latency, None
+        with self.lock:
+            self.stats[{429: "rate_limited", 500: "server_errors", 200: "completed"}[outcome[0]]] += 1
+        return outcome
+
+    def add_file(self, filename, purpose, content):
+        file_id = _new_id("file")
+        with self.lock:
+            self.files[file_id] = {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(content),
+                "created_at": int(time.time()),
+                "filename": filename,
+                "purpose": purpose,
+                "status": "processed",
+                "content": content,
+            }
+        return self.file_object(file_id)
+
+    def file_object(self, file_id):
+        return {k: v for k, v in self.files[file_id].items() if k != "content"}
+
+    def create_batch(self, request):
+        batch_id = _new_id("batch")
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": request["endpoint"],
+            "input_file_id": request["input_file_id"],
+            "completion_window": request.get("completion_window", "24h"),
+            "status": "validating",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "metadata": request.get("metadata"),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self.lock:
+            self.batches[batch_id] = batch
+        threading.Thread(target=self._run_batch, args=(batch_id,), daemon=True).start()
+        return dict(batch)
+
+    def _run_batch(self, batch_id):
+        """Answer every line of the batch's input file, then publish output and error files."""
+        batch = self.batches[batch_id]
+        lines = [json.loads(line) for line in self.files[batch["input_file_id"]]["content"].splitlines() if line.strip()]
+        batch.update(status="in_progress", in_progress_at=int(time.time()))
+        batch["request_counts"]["total"] = len(lines)
+        time.sleep(self.config.batch_delay)
+
+        outputs, errors = [], []
+        for line in lines:
+            result = {"id": _new_id("batch_req"), "custom_id": line["custom_id"], "error": None}
+            if line.get("url") != batch["endpoint"]:
+                result["response"] = None
+                result["error"] = {"code": "invalid_url", "message": f"Unsupported url {line.get('url')}"}
+                errors.append(result)
+                continue
+            rng = self.request_rng(line["body"])
+            if rng.random() < self.config.error_rate:
+                result["response"] = {"status_code": 500, "request_id": _new_id("req"),
+                                      "body": {"error": {"message": "Stand-in server error", "type": "server_error"}}}
+                errors.append(result)
+                continue
+            result["response"] = {"status_code": 200, "request_id": _new_id("req"), "body": fake_completion(line["body"], rng)}
+            outputs.append(result)
+
+        def publish(rows, name):
+            if not rows:
+                return None
+            content = "".join(json.dumps(row) + "\n" for row in rows).encode("utf-8")
+            return self.add_file(name, "batch_output", content)["id"]
+
+        batch.update(
+            output_file_id=publish(outputs, f"{batch_id}_output.jsonl"),
+            error_file_id=publish(errors, f"{batch_id}_errors.jsonl"),
+            status="completed",
+            completed_at=int(time.time()),
+        )
+        batch["request_counts"].update(completed=len(outputs), failed=len(errors))
+
+class StandInHandler(BaseHTTPRequestHandler):
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, error_type="invalid_request_error", headers=None):
+        body = json.dumps({"error": {"message": message, "type": error_type, "code": error_type}}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chat_completion(self):
+        body = json.loads(self._read_body())
+        rng = self.state.request_rng(body)
+        status, latency, retry_after = self.state.admit_chat(rng)
+        if status == 429:
+            self._send_error(429, "Stand-in rate limit reached", "rate_limit_exceeded",
+                             {"retry-after": f"{retry_after:.2f}"})
+            return
+        time.sleep(latency)
+        if status == 500:
+            self._send_error(500, "Stand-in server error", "server_error")
+        else:
+            self._send_json(fake_completion(body, rng))
+
+    def _read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        if path == "/v1/chat/completions":
+            self._chat_completion()
+        elif path == "/v1/files":
+            message = BytesParser(policy=default_policy).parsebytes(
+                b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + self._read_body()
+            )
+            fields, filename, content = {}, "upload.jsonl", b""
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                if name == "file":
+                    filename = part.get_filename() or filename
+                    content = part.get_payload(decode=True)
+                else:
+                    fields[name] = part.get_content().strip()
+            self._send_json(self.state.add_file(filename, fields.get("purpose", "batch"), content))
+        elif path == "/v1/batches":
+            request = json.loads(self._read_body())
+            if request.get("input_file_id") not in self.state.files:
+                self._send_error(404, f"No such file: {request.get('input_file_id')}")
+            else:
+                self._send_json(self.state.create_batch(request))
+        else:
+            self._send_error(404, f"Unknown endpoint {path}")
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if parts == ["stats"]:
+            with self.state.lock:
+                self._send_json(dict(self.state.stats))
+        elif parts[:2] == ["v1", "batches"] and len(parts) == 3 and parts[2] in self.state.batches:
+            self._send_json(dict(self.state.batches[parts[2]]))
+        elif parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[3] == "content" and parts[2] in self.state.files:
+            content = self.state.files[parts[2]]["content"]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        elif parts[:2] == ["v1", "files"] and len(parts) == 3 and parts[2] in self.state.files:
+            self._send_json(self.state.file_object(parts[2]))
+        else:
+            self._send_error(404, f"Not found: {self.path}")
+
+def make_server(host="127.0.0.1", port=0, config=None):
+    """HTTP server with its own in-memory state; port 0 picks a free port."""
+    handler = type("BoundStandInHandler", (StandInHandler,), {"state": StandInState(config)})
+    return ThreadingHTTPServer((host, port), handler)
+
+def start_stand_in(host="127.0.0.1", port=0, config=None):
+    """
+    Start the stand-in on a background thread.
+
+    Returns:
+        tuple: (server, base_url). Call server.shutdown() to stop it.
+    """
+    server = make_server(host, port, config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}/v1"
+    print(f"OpenAI stand-in listening on {base_url}")
+    return server, base_url
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-median-ms", type=float, default=0.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of calls answered with a 429")
+    parser.add_argument("--requests-per-minute", type=int, default=None, help="Hard limit before 429s")
+    parser.add_argument("--batch-delay", type=float, default=0.0, help="Seconds each batch stays in progress")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = StandInConfig(
+        latency_median_ms=args.latency_median_ms, latency_sigma=args.latency_sigma, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, requests_per_minute=args.requests_per_minute,
+        batch_delay=args.batch_delay, seed=args.seed,
+    )
+    server = make_server(args.host, args.port, config)
+    print(f"OpenAI stand-in listening on http://{args.host}:{args.port}/v1 (stats at /stats)")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
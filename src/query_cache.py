@@ -0,0 +1,168 @@
+# query_cache.py
+
+import os
+import re
+import json
+import hashlib
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.db_connection import fetch_dataframe
+
+CACHE_DIR = os.getenv("QUERY_CACHE_DIR", os.path.join("cache", "query_results"))
+CACHE_DISABLED = os.getenv("QUERY_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+WATERMARK_METADATA_KEY = b"query_cache_watermarks"
+
+_LITERAL = re.compile(r"('(?:[^']|'')*')")
+_FROM_OR_JOIN = re.compile(r"\b(?:FROM|JOIN)\s+", re.IGNORECASE)
+# A plain table name, an optional alias (not a clause keyword) and the next character
+_TABLE_ITEM = re.compile(
+    r"([A-Za-z_][\w$]*(?:\.[A-Za-z_][\w$]*)*)"
+    r"(?:\s+(?:AS\s+)?(?!(?:WHERE|JOIN|LEFT|RIGHT|INNER|OUTER|FULL|CROSS|NATURAL|ON|USING|GROUP|ORDER|QUALIFY"
+    r"|HAVING|LIMIT|UNION|EXCEPT|INTERSECT|MINUS|WINDOW|SAMPLE|TABLESAMPLE|AT|BEFORE|PIVOT|UNPIVOT)\b)[A-Za-z_][\w$]*)?"
+    r"\s*(.?)",
+    re.IGNORECASE,
+)
+_CTE_NAME = re.compile(r"(?:\bWITH|,)\s*([A-Za-z_][\w$]*)\s+AS\s*\(", re.IGNORECASE)
+
+def normalize_sql(query):
+    """Collapse whitespace outside string literals and drop a trailing semicolon."""
+    parts = _LITERAL.split(query.strip().rstrip(";"))
+    return "".join(part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts)).strip()
+
+def referenced_tables(query):
+    """
+    Upper-cased names of the tables a query reads, excluding its own CTE names.
+
+    Returns None when a FROM or JOIN is followed by anything the parser cannot
+    fully account for (comma joins, quoted identifiers, table functions, stages),
+    since a missed table would leave its changes out of the watermark. Qualified
+    names return None too: watermarks are only read from the current schema.
+    """
+    body = " ".join(_LITERAL.sub("''", query).split())
+    ctes = {name.upper() for name in _CTE_NAME.findall(body)}
+    tables = set()
+    for match in _FROM_OR_JOIN.finditer(body):
+        if body.startswith("(", match.end()):
+            continue  # Subquery; its own FROM clauses are matched separately
+        item = _TABLE_ITEM.match(body, match.end())
+        if item is None or item.group(2) in (",", "(") or "." in item.group(1):
+            return None
+        tables.add(item.group(1).upper())
+    return sorted(tables - ctes)
+
+def query_key(query, params=None, database=None, schema=None):
+    """Content address of a read: SHA-256 of the target schema, normalized SQL and params."""
+    canonical = json.dumps(
+        [database, schema, normalize_sql(query), params or {}], sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def fetch_table_watermarks(conn, tables):
+    """
+    Row count and last-altered time of each table, from INFORMATION_SCHEMA.TABLES.
+
+    This is a metadata lookup, so it is answered without scanning the tables.
+    Names that are not base tables in the current schema (views, other schemas)
+    are missing from the result.
+    """
+    if not tables:
+        return {}
+    query = f"""
+        SELECT TABLE_NAME, ROW_COUNT, LAST_ALTERED
+        FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = CURRENT_SCHEMA() AND TABLE_NAME IN ({', '.join(['%s'] * len(tables))})
+    """
+    with conn.cursor() as cur:
+        cur.execute(query, list(tables))
+        rows = cur.fetchall()
+    return {name: f"{row_count}@{pd.Timestamp(last_altered).isoformat()}" for name, row_count, last_altered in rows}
+
+class QueryCache:
+    """
+    Read-through cache of query results as local Parquet files.
+
+    Entries are keyed by query_key and stamped with the watermarks of every
+    table the query reads. A lookup costs one INFORMATION_SCHEMA query; the
+    stored result is returned only while all watermarks still match, so any
+    insert, delete or truncate on a source table invalidates it. Queries over
+    tables without a watermark are always read from Snowflake.
+    """
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.stats = {"hits": 0, "misses": 0, "uncached": 0}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def _stored_watermarks(self, path):
+        try:
+            metadata = pq.read_schema(path).metadata or {}
+        except (OSError, pa.ArrowInvalid):
+            return None
+        stored = metadata.get(WATERMARK_METADATA_KEY)
+        return json.loads(stored) if stored else None
+
+    def _store(self, path, df, watermarks):
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            return
+        metadata = {**(table.schema.metadata or {}), WATERMARK_METADATA_KEY: json.dumps(watermarks, sort_keys=True)}
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+        os.replace(tmp_path, path)
+
+    def read_sql(self, query, conn, params=None, categories=()):
+        """Same contract as fetch_dataframe(query, conn, params, categories), served from disk while unchanged."""
+        tables = referenced_tables(query)
+        watermarks = fetch_table_watermarks(conn, tables) if tables else {}
+        if not tables or len(watermarks) < len(tables):
+            with self._lock:
+                self.stats["uncached"] += 1
+            return fetch_dataframe(query, conn, params=params, categories=categories)
+
+        path = self._path(query_key(query, params, getattr(conn, "database", None), getattr(conn, "schema", None)))
+        if self._stored_watermarks(path) == watermarks:
+            with self._lock:
+                self.stats["hits"] += 1
+            return pq.read_table(path).to_pandas()
+
+        with self._lock:
+            self.stats["misses"] += 1
+        df = fetch_dataframe(query, conn, params=params, categories=categories)
+        self._store(path, df, watermarks)
+        return df
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".parquet"):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def summary(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups if lookups else 0.0
+        return {**self.stats, "hit_rate": round(hit_rate, 4)}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_query_cache():
+    """Process-wide QueryCache, or None when QUERY_CACHE_DISABLED is set."""
+    global _cache
+    if CACHE_DISABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = QueryCache()
+        return _cache
+
+def cached_read_sql(query, conn, params=None, categories=()):
+    """fetch_dataframe that reads through the query cache."""
+    cache = get_query_cache()
+    if cache is None:
+        return fetch_dataframe(query, conn, params=params, categories=categories)
+    return cache.read_sql(query, conn, params=params, categories=categories)
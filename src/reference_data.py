@@ -0,0 +1,39 @@
+# reference_data.py
+
+from src.query_cache import cached_read_sql
+
+# Code lists several generators read; each goes through the query cache, so
+# repeated reads in and across runs skip the warehouse until the table changes.
+
+def fetch_portfolio_codes(conn):
+    """Distinct PORTFOLIOCODEs in PORTFOLIOGENERALINFO."""
+    df = cached_read_sql("SELECT DISTINCT PORTFOLIOCODE FROM PORTFOLIOGENERALINFO", conn)
+    return df["PORTFOLIOCODE"].dropna().tolist()
+
+def fetch_benchmark_codes(conn):
+    """Distinct BENCHMARKCODEs in BENCHMARKGENERALINFO."""
+    df = cached_read_sql("SELECT DISTINCT BENCHMARKCODE FROM BENCHMARKGENERALINFO", conn)
+    return df["BENCHMARKCODE"].dropna().tolist()
+
+def fetch_product_codes(conn):
+    """Distinct PRODUCTCODEs in PRODUCTMASTER."""
+    df = cached_read_sql("SELECT DISTINCT PRODUCTCODE FROM PRODUCTMASTER", conn)
+    return df["PRODUCTCODE"].dropna().tolist()
+
+# Strategies the qualitative generator writes to STRATEGYINFO; PRODUCTMASTER.STRATEGY
+# falls back to these before any are stored
+STRATEGY_NAMES = [
+    "130/30 Long-Short Equity",
+    "Global Growth Stocks",
+    "Emerging Markets Equity",
+    "Convertible Bond Arbitrage",
+    "Multi-Asset Long/Short",
+    "ESG Focused Equity",
+    "Technology Growth",
+    "Hedge Fund Core",
+]
+
+def fetch_strategy_names(conn):
+    """Distinct STRATEGYNAMEs in STRATEGYINFO."""
+    df = cached_read_sql("SELECT DISTINCT STRATEGYNAME FROM STRATEGYINFO", conn)
+    return sorted(df["STRATEGYNAME"].dropna().tolist())
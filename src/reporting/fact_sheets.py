@@ -0,0 +1,243 @@
+# fact_sheets.py
+
+import os
+import time
+import argparse
+from html import escape
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src.db_connection import get_snowflake_connection
+from src.query_cache import cached_read_sql
+from src.create_tables.create_disclosure_info import TABLE_NAME as DISCLOSURE_TABLE
+from src.analytics.period_returns import load_performance_matrix
+
+OUTPUT_DIR = os.path.join("output", "fact_sheets")
+PORTFOLIOS_PER_TASK = 200
+
+RETURN_COLUMNS = ["MTD", "QTD", "YTD", "1Y", "3Y", "5Y", "10Y", "SI_ANN"]
+RETURN_LABELS = {"SI_ANN": "Since Inception"}
+EXPOSURE_TITLES = {
+    "SECTOR": "Sector", "REGION": "Region", "CURRENCY": "Currency",
+    "ASSETCLASS": "Asset Class", "POSITION": "Long / Short",
+}
+
+# Sections shared by every fact sheet (firm text, disclosures), set once per worker process
+_CONTEXT = {}
+
+def fetch_portfolio_info(conn):
+    """General info for every portfolio with its product and strategy."""
+    query = """
+        SELECT g.PORTFOLIOCODE, g.NAME, g.INVESTMENTSTYLE, g.PORTFOLIOCATEGORY, g.PERFORMANCEINCEPTIONDATE,
+               g.BASECURRENCYCODE, p.PRODUCTNAME, p.STRATEGY, p.VEHICLETYPE, p.MANAGER
+        FROM PORTFOLIOGENERALINFO g
+        LEFT JOIN PRODUCTMASTER p ON g.PRODUCTCODE = p.PRODUCTCODE
+    """
+    return cached_read_sql(query, conn)
+
+def fetch_attributes(conn):
+    return cached_read_sql("SELECT PORTFOLIOCODE, ATTRIBUTETYPE, ATTRIBUTETYPEVALUE FROM PORTFOLIOATTRIBUTES", conn)
+
+def fetch_benchmark_links(conn):
+    query = """
+        SELECT a.PORTFOLIOCODE, a.BENCHMARKCODE, b.BENCHMARKNAME
+        FROM PORTFOLIOBENCHMARKASSOCIATION a
+        LEFT JOIN BENCHMARKGENERALINFO b ON a.BENCHMARKCODE = b.BENCHMARKCODE
+    """
+    return cached_read_sql(query, conn)
+
+def fetch_latest_exposures(conn, as_of):
+    """Exposure cube rows of each portfolio's latest holdings snapshot on or before as_of."""
+    query = """
+        SELECT PORTFOLIOCODE, HISTORYDATE, DIMENSION, DIMENSIONVALUE, NETWEIGHT
+        FROM HOLDINGSEXPOSURE
+        WHERE HISTORYDATE <= %(as_of)s
+        QUALIFY HISTORYDATE = MAX(HISTORYDATE) OVER (PARTITION BY PORTFOLIOCODE)
+    """
+    return cached_read_sql(query, conn, params={"as_of": as_of})
+
+def fetch_qualitative_sections(conn):
+    """(firm sections, strategy sections) from FIRMINFO and STRATEGYINFO."""
+    firm = cached_read_sql("SELECT SECTION, CONTENT FROM FIRMINFO", conn)
+    strategy = cached_read_sql("SELECT STRATEGYNAME, SECTION, CONTENT FROM STRATEGYINFO", conn)
+    return firm, strategy
+
+def fetch_active_disclosures(conn, as_of):
+    """The most recent disclosure of each type in effect on as_of."""
+    query = f"""
+        SELECT DISCLOSURETYPE, DISCLOSURETEXT
+        FROM {DISCLOSURE_TABLE}
+        WHERE EFFECTIVEDATE <= %(as_of)s AND (EXPIRYDATE IS NULL OR EXPIRYDATE >= %(as_of)s)
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY DISCLOSURETYPE ORDER BY EFFECTIVEDATE DESC, CREATED_AT DESC) = 1
+    """
+    return cached_read_sql(query, conn, params={"as_of": as_of})
+
+def _partition(df, key="PORTFOLIOCODE"):
+    """Split a frame into {key value: list of row dicts} in one pass over its rows."""
+    partitions = {}
+    for code, record in zip(df[key].tolist(), df.drop(columns=key).to_dict("records")):
+        partitions.setdefault(code, []).append(record)
+    return partitions
+
+def build_fact_sheet_contexts(info, attributes, benchmarks, exposures, returns, strategy_sections):
+    """
+    Partition the bulk-read tables in memory into one plain dict per portfolio.
+
+    Every table is grouped once, so building the contexts costs one pass per
+    table rather than one query per portfolio and table.
+
+    Returns:
+        list: Per-portfolio dicts, picklable for worker processes.
+    """
+    attributes_by_portfolio = _partition(attributes)
+    benchmarks_by_portfolio = _partition(benchmarks)
+    exposures_by_portfolio = _partition(exposures)
+    sections_by_strategy = _partition(strategy_sections, key="STRATEGYNAME")
+    returns = returns.reindex(columns=RETURN_COLUMNS)
+    returns_by_portfolio = dict(zip(returns.index, returns.to_dict("records")))
+
+    contexts = []
+    for row in info.to_dict("records"):
+        code = row["PORTFOLIOCODE"]
+        contexts.append({
+            "info": row,
+            "attributes": attributes_by_portfolio.get(code, []),
+            "benchmarks": benchmarks_by_portfolio.get(code, []),
+            "exposures": exposures_by_portfolio.get(code, []),
+            "returns": returns_by_portfolio.get(code, {}),
+            "strategy_sections": sections_by_strategy.get(row.get("STRATEGY"), []),
+        })
+    return contexts
+
+def _pct(value):
+    return "n/a" if value is None or pd.isna(value) else f"{value:.2%}"
+
+def _text(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NaT:
+        return ""
+    if isinstance(value, pd.Timestamp):
+        value = value.date()
+    return escape(str(value))
+
+def render_fact_sheet(context, firm_sections, disclosures, as_of):
+    """Render one portfolio's fact sheet as a standalone HTML page."""
+    info = context["info"]
+    returns = context["returns"]
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        f"<title>{_text(info['NAME'])} – Fact Sheet</title>",
+        "<style>body{font-family:Arial,sans-serif;margin:32px;color:#222}table{border-collapse:collapse;margin:8px 0 20px}"
+        "td,th{border:1px solid #ccc;padding:4px 10px;text-align:right}th:first-child,td:first-child{text-align:left}"
+        "h1{margin-bottom:0}.meta{color:#666}.disclosure{font-size:11px;color:#555}</style></head><body>",
+        f"<h1>{_text(info['NAME'])}</h1>",
+        f"<p class='meta'>{_text(info['PORTFOLIOCODE'])} · {_text(info.get('PRODUCTNAME'))} · "
+        f"{_text(info.get('STRATEGY'))} · As of {_text(as_of)}</p>",
+        "<h2>Overview</h2><table>",
+        f"<tr><td>Investment Style</td><td>{_text(info.get('INVESTMENTSTYLE'))}</td></tr>",
+        f"<tr><td>Category</td><td>{_text(info.get('PORTFOLIOCATEGORY'))}</td></tr>",
+        f"<tr><td>Base Currency</td><td>{_text(info.get('BASECURRENCYCODE'))}</td></tr>",
+        f"<tr><td>Inception</td><td>{_text(info.get('PERFORMANCEINCEPTIONDATE'))}</td></tr>",
+        f"<tr><td>Manager</td><td>{_text(info.get('MANAGER'))}</td></tr>",
+    ]
+    for benchmark in context["benchmarks"]:
+        parts.append(f"<tr><td>Benchmark</td><td>{_text(benchmark.get('BENCHMARKNAME') or benchmark['BENCHMARKCODE'])}</td></tr>")
+    for attribute in context["attributes"]:
+        parts.append(f"<tr><td>{_text(attribute['ATTRIBUTETYPE'])}</td><td>{_text(attribute['ATTRIBUTETYPEVALUE'])}</td></tr>")
+    parts.append("</table>")
+
+    parts.append("<h2>Performance</h2><table><tr>")
+    parts += [f"<th>{RETURN_LABELS.get(column, column)}</th>" for column in RETURN_COLUMNS]
+    parts.append("</tr><tr>")
+    parts += [f"<td>{_pct(returns.get(column))}</td>" for column in RETURN_COLUMNS]
+    parts.append("</tr></table>")
+
+    if context["exposures"]:
+        exposures = context["exposures"]
+        parts.append(f"<h2>Allocation</h2><p class='meta'>Holdings as of {_text(exposures[0]['HISTORYDATE'])}</p>")
+        for dimension, title in EXPOSURE_TITLES.items():
+            rows = sorted((e for e in exposures if e["DIMENSION"] == dimension), key=lambda e: -e["NETWEIGHT"])
+            if not rows:
+                continue
+            parts.append(f"<table><tr><th>{title}</th><th>Net Weight</th></tr>")
+            parts += [f"<tr><td>{_text(e['DIMENSIONVALUE'])}</td><td>{_pct(e['NETWEIGHT'])}</td></tr>" for e in rows]
+            parts.append("</table>")
+
+    for section in context["strategy_sections"]:
+        parts.append(f"<h2>{_text(section['SECTION'])}</h2><p>{_text(section['CONTENT'])}</p>")
+    for section, content in firm_sections:
+        parts.append(f"<h2>{_text(section)}</h2><p>{_text(content)}</p>")
+    if disclosures:
+        parts.append("<h2>Disclosures</h2>")
+        parts += [f"<p class='disclosure'><b>{_text(kind)}.</b> {_text(text)}</p>" for kind, text in disclosures]
+    parts.append("</body></html>")
+    return "".join(parts)
+
+def _init_worker(context):
+    _CONTEXT.update(context)
+
+def _render_shard(task):
+    """Render and write the fact sheets of one shard. Runs inside a worker process."""
+    contexts, output_dir = task
+    written = 0
+    for context in contexts:
+        html = render_fact_sheet(context, _CONTEXT["firm_sections"], _CONTEXT["disclosures"], _CONTEXT["as_of"])
+        path = os.path.join(output_dir, f"{context['info']['PORTFOLIOCODE']}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        written += 1
+    return written
+
+def run_fact_sheet_batch(contexts, shared, output_dir=OUTPUT_DIR, portfolios_per_task=PORTFOLIOS_PER_TASK, max_workers=None):
+    """
+    Render every fact sheet across a process pool and report throughput.
+
+    Args:
+        contexts (list): Per-portfolio dicts from build_fact_sheet_contexts.
+        shared (dict): firm_sections, disclosures and as_of, common to every page.
+
+    Returns:
+        int: Number of pages written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(contexts[i:i + portfolios_per_task], output_dir) for i in range(0, len(contexts), portfolios_per_task)]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(shared,)) as pool:
+        pages = sum(pool.map(_render_shard, tasks))
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {pages} fact sheets in {elapsed:.1f}s ({pages / max(elapsed, 1e-9):,.0f} pages/s) to {output_dir}")
+    return pages
+
+def main():
+    parser = argparse.ArgumentParser(description="Render HTML fact sheets for every portfolio.")
+    parser.add_argument("--as-of", default=None, help="Report date (YYYY-MM-DD); defaults to the latest performance date")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    conn = get_snowflake_connection()
+    start = time.perf_counter()
+    try:
+        matrix = load_performance_matrix(conn)
+        as_of = pd.Timestamp(args.as_of) if args.as_of else matrix.dates[-1]
+        returns = matrix.period_returns(as_of)
+        info = fetch_portfolio_info(conn)
+        attributes = fetch_attributes(conn)
+        benchmarks = fetch_benchmark_links(conn)
+        exposures = fetch_latest_exposures(conn, as_of.date())
+        firm, strategy = fetch_qualitative_sections(conn)
+        disclosures = fetch_active_disclosures(conn, as_of.date())
+    finally:
+        conn.close()
+    print(f"Read source tables in {time.perf_counter() - start:.1f}s")
+
+    contexts = build_fact_sheet_contexts(info, attributes, benchmarks, exposures, returns, strategy)
+    shared = {
+        "firm_sections": list(zip(firm["SECTION"], firm["CONTENT"])),
+        "disclosures": list(zip(disclosures["DISCLOSURETYPE"], disclosures["DISCLOSURETEXT"])),
+        "as_of": as_of.date(),
+    }
+    run_fact_sheet_batch(contexts, shared, output_dir=args.output_dir, max_workers=args.workers)
+
+if __name__ == "__main__":
+    main()
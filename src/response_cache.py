@@ -0,0 +1,100 @@
+# response_cache.py
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+CACHE_PATH = os.getenv("OPENAI_CACHE_PATH", os.path.join("cache", "openai_responses.sqlite"))
+CACHE_MAX_ENTRIES = int(os.getenv("OPENAI_CACHE_MAX_ENTRIES", "20000"))
+CACHE_DISABLED = os.getenv("OPENAI_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+def request_key(request):
+    """Content address of a chat request: SHA-256 of its canonical JSON."""
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Persistent chat-completion cache in a local SQLite file.
+
+    Entries are keyed by request_key of (model, messages, temperature,
+    max_tokens, response_format) and evicted least-recently-used once the
+    cache holds more than max_entries. Hits, misses and the tokens a hit
+    avoided paying for are counted for the lifetime of the process.
+    """
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "tokens_saved": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                KEY TEXT PRIMARY KEY,
+                RESPONSE TEXT NOT NULL,
+                TOTAL_TOKENS INTEGER NOT NULL,
+                CREATED_AT REAL NOT NULL,
+                LAST_USED REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (LAST_USED)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached response JSON for key, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT RESPONSE, TOTAL_TOKENS FROM responses WHERE KEY = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE responses SET LAST_USED = ? WHERE KEY = ?", (time.time(), key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+            self.stats["tokens_saved"] += row[1]
+            return row[0]
+
+    def put(self, key, response_json, total_tokens):
+        """Store a response and evict the least recently used entries beyond max_entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (KEY, RESPONSE, TOTAL_TOKENS, CREATED_AT, LAST_USED) VALUES (?, ?, ?, ?, ?)",
+                (key, response_json, total_tokens, now, now),
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE KEY IN (SELECT KEY FROM responses ORDER BY LAST_USED LIMIT ?)",
+                    (excess,),
+                )
+                self.stats["evictions"] += excess
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def summary(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups if lookups else 0.0
+        return {**self.stats, "hit_rate": round(hit_rate, 4)}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Process-wide ResponseCache, or None when OPENAI_CACHE_DISABLED is set."""
+    global _cache
+    if CACHE_DISABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,97 @@
+# schemas.py
+
+import numpy as np
+import pandas as pd
+
+# Canonical in-memory dtypes for the frames we build before loading to Snowflake.
+# Low-cardinality text columns are stored as categoricals (dictionary encoded),
+# numerics as fixed-width numpy types and dates as datetime64.
+
+BENCHMARK_PERFORMANCE_SCHEMA = {
+    "BENCHMARKCODE": "category",
+    "PERFORMANCEDATATYPE": "category",
+    "CURRENCYCODE": "category",
+    "CURRENCY": "category",
+    "PERFORMANCEFREQUENCY": "category",
+    "HISTORYDATE": "datetime64[ns]",
+    "VALUE": "float64",
+}
+
+PORTFOLIO_PERFORMANCE_SCHEMA = {
+    "PORTFOLIOCODE": "category",
+    "HISTORYDATE": "datetime64[ns]",
+    "CURRENCYCODE": "category",
+    "PERFORMANCECATEGORYNAME": "category",
+    "PERFORMANCEINCEPTIONDATE": "datetime64[ns]",
+    "PERFORMANCEFREQUENCY": "category",
+    "PERFORMANCEFACTOR": "float64",
+    "PERFORMANCETYPE": "category",
+}
+
+PORTFOLIO_ATTRIBUTES_SCHEMA = {
+    "PORTFOLIOCODE": "category",
+    "ATTRIBUTETYPE": "category",
+    "ATTRIBUTETYPECODE": "category",
+    "ATTRIBUTETYPEVALUE": "category",
+}
+
+HOLDINGS_SCHEMA = {
+    "CUSIP": "category",
+    "ISINCODE": "category",
+    "ISSUENAME": "category",
+    "TICKER": "category",
+    "PRICE": "float64",
+    "SHARES": "float64",
+    "MARKETVALUE": "float64",
+    "CURRENCYCODE": "category",
+    "HQCOUNTRY": "category",
+    "ISSUECOUNTRY": "category",
+    "ASSETCLASSNAME": "category",
+    "BOOKVALUE": "float64",
+    "COSTBASIS": "float64",
+    "DIVIDENDYIELD": "float64",
+    "HISTORYDATE": "datetime64[ns]",
+    "POSITION_FLAG": "category",
+    "PRIMARYINDUSTRYNAME": "category",
+    "PRIMARYSECTORNAME": "category",
+    "PRIMARYSUBSECTORNAME": "category",
+    "REGIONNAME": "category",
+    "PORTFOLIOCODE": "category",
+}
+
+def constant_column(value, num_rows):
+    """
+    Build a categorical column holding the same value on every row.
+    Stores one category plus an int8 code per row instead of num_rows Python strings.
+    """
+    return pd.Categorical.from_codes(np.zeros(num_rows, dtype=np.int8), categories=[value])
+
+def apply_schema(df, schema):
+    """
+    Cast the columns of df that appear in schema to their canonical dtype.
+
+    Columns missing from df are skipped and columns not in the schema are left
+    untouched, so the same schema can be applied to partial frames. Call this
+    again after pd.concat: concatenating categoricals with different categories
+    falls back to object dtype.
+
+    Args:
+        df (DataFrame): Frame to convert.
+        schema (dict): Column name -> dtype string.
+
+    Returns:
+        DataFrame: The converted frame (same object, modified in place).
+    """
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        if dtype.startswith("datetime64"):
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        elif dtype == "category":
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype("category")
+            else:
+                df[col] = df[col].cat.remove_unused_categories()
+        elif df[col].dtype != dtype:
+            df[col] = df[col].astype(dtype)
+    return df
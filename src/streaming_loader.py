@@ -0,0 +1,81 @@
+# streaming_loader.py
+
+import queue
+import threading
+import time
+
+_DONE = object()
+
+class _ProducerError:
+    def __init__(self, error):
+        self.error = error
+
+def _put(buffer, item, stop_event):
+    """Block until item fits in the buffer; give up once the consumer has stopped."""
+    while not stop_event.is_set():
+        try:
+            buffer.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _produce(chunks, buffer, stop_event):
+    """Pull chunks from the generator into the bounded buffer until done or stopped."""
+    try:
+        for chunk in chunks:
+            if not _put(buffer, chunk, stop_event):
+                return
+        _put(buffer, _DONE, stop_event)
+    except Exception as e:
+        _put(buffer, _ProducerError(e), stop_event)
+
+def stream_chunks(chunks, load_chunk, max_pending=2):
+    """
+    Load chunks from a generator while the next chunks are being generated.
+
+    Generation runs in a background thread and hands chunks over through a
+    queue holding at most max_pending chunks. When the loader falls behind,
+    the generator blocks, so memory stays bounded at roughly
+    (max_pending + 2) chunks no matter how large the dataset is.
+
+    Args:
+        chunks (iterable): Generator of DataFrame chunks.
+        load_chunk (callable): Called with each chunk, in order, on the calling thread.
+        max_pending (int): Chunks allowed to wait between generator and loader.
+
+    Returns:
+        dict: chunks/rows loaded and seconds spent waiting on the generator and in the loader.
+    """
+    buffer = queue.Queue(maxsize=max_pending)
+    stop_event = threading.Event()
+    producer = threading.Thread(target=_produce, args=(chunks, buffer, stop_event), daemon=True)
+    producer.start()
+
+    stats = {"chunks": 0, "rows": 0, "wait_seconds": 0.0, "load_seconds": 0.0}
+    try:
+        while True:
+            start = time.perf_counter()
+            chunk = buffer.get()
+            stats["wait_seconds"] += time.perf_counter() - start
+
+            if chunk is _DONE:
+                break
+            if isinstance(chunk, _ProducerError):
+                raise chunk.error
+
+            start = time.perf_counter()
+            load_chunk(chunk)
+            stats["load_seconds"] += time.perf_counter() - start
+            stats["chunks"] += 1
+            stats["rows"] += len(chunk)
+            print(f"Loaded chunk {stats['chunks']} ({len(chunk)} rows, {stats['rows']} total)")
+    finally:
+        stop_event.set()
+        producer.join()
+
+    print(
+        f"Streamed {stats['rows']} rows in {stats['chunks']} chunks "
+        f"(waited {stats['wait_seconds']:.1f}s on generation, {stats['load_seconds']:.1f}s loading)"
+    )
+    return stats
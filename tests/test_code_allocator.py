@@ -0,0 +1,101 @@
+import re
+
+from src.code_allocator import CodeAllocator
+
+
+class _FakeSequence:
+    """In-memory stand-in for a Snowflake sequence with a fixed INCREMENT."""
+    def __init__(self, increment):
+        self.increment = increment
+        self.next_value = 0
+        self.queries = []
+
+    def nextval(self):
+        value = self.next_value
+        self.next_value += self.increment
+        return value
+
+
+class _FakeCursor:
+    def __init__(self, sequence):
+        self.sequence = sequence
+        self.rows = []
+        self.description = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.sequence.queries.append(query)
+        if query.startswith("SHOW SEQUENCES"):
+            self.description = [("name",), ("database_name",), ("schema_name",), ("next_value",), ("interval",)]
+            self.rows = [("PORTFOLIOCODE_SEQ", "DB", "SCHEMA", self.sequence.next_value, self.sequence.increment)]
+            return
+        generator = re.search(r"ROWCOUNT => (\d+)", query)
+        count = int(generator.group(1)) if generator else 1
+        self.rows = [(self.sequence.nextval(),) for _ in range(count)]
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class _FakeConnection:
+    def __init__(self, sequence):
+        self.sequence = sequence
+
+    def cursor(self):
+        return _FakeCursor(self.sequence)
+
+
+def _numbers(codes, prefix="NVLN"):
+    return [int(code[len(prefix):]) for code in codes]
+
+
+def test_codes_stay_unique_and_contiguous_across_blocks_and_allocators():
+    sequence = _FakeSequence(increment=10)
+    first = CodeAllocator.for_snowflake(_FakeConnection(sequence), "portfolio")
+    second = CodeAllocator.for_snowflake(_FakeConnection(sequence), "portfolio")
+
+    codes_first = first.allocate(7) + [first.next_code() for _ in range(8)]
+    codes_second = second.allocate(25)
+    codes_first += first.allocate(3)
+
+    all_codes = codes_first + codes_second
+    assert len(all_codes) == len(set(all_codes)) == 43
+    assert all(re.fullmatch(r"NVLN\d{6}", code) for code in all_codes)
+
+    # Within a block numbers are consecutive; every run starts on a block boundary
+    for numbers in (_numbers(codes_first), _numbers(codes_second)):
+        runs = [[numbers[0]]]
+        for previous, number in zip(numbers, numbers[1:]):
+            if number == previous + 1 and number % sequence.increment:
+                runs[-1].append(number)
+            else:
+                runs.append([number])
+        assert all(run[0] % sequence.increment == 0 for run in runs)
+        assert all(len(run) <= sequence.increment for run in runs)
+
+
+def test_bulk_allocation_reserves_all_blocks_in_one_query():
+    sequence = _FakeSequence(increment=100)
+    allocator = CodeAllocator.for_snowflake(_FakeConnection(sequence), "portfolio")
+
+    codes = allocator.allocate(30)
+    codes += allocator.allocate(1000)
+
+    assert _numbers(codes) == list(range(1030))
+    nextval_queries = [query for query in sequence.queries if "NEXTVAL" in query]
+    assert len(nextval_queries) == 2
+
+
+def test_worker_allocators_never_overlap_and_use_offline_prefix():
+    workers = [CodeAllocator.for_worker("portfolio", "R1", index, 3, block_size=5) for index in range(3)]
+    codes = [code for worker in workers for code in worker.allocate(12)]
+    assert len(codes) == len(set(codes))
+    assert all(code.startswith("NVLXR1-") for code in codes)
@@ -0,0 +1,119 @@
+import importlib
+import pkgutil
+
+import pandas as pd
+import pytest
+
+import src.create_tables
+import src.query_cache
+from src.query_cache import referenced_tables
+from src.reporting import fact_sheets
+
+
+class _RecordingCursor:
+    def __init__(self, queries):
+        self.queries = queries
+        self.description = [("PORTFOLIOCODE",)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.queries.append(query)
+
+    def fetch_arrow_batches(self):
+        return iter(())
+
+
+class _RecordingConnection:
+    def __init__(self):
+        self.queries = []
+
+    def cursor(self):
+        return _RecordingCursor(self.queries)
+
+
+def _created_tables():
+    """Every table name defined by a module in src/create_tables."""
+    names = set()
+    for module_info in pkgutil.iter_modules(src.create_tables.__path__):
+        module = importlib.import_module(f"src.create_tables.{module_info.name}")
+        for attribute, value in vars(module).items():
+            if (attribute == "TABLE_NAME" or attribute.endswith("_TABLE")) and isinstance(value, str):
+                names.add(value.upper())
+    return names
+
+
+def test_fact_sheet_queries_only_read_created_tables(monkeypatch):
+    monkeypatch.setattr(src.query_cache, "CACHE_DISABLED", True)
+    conn = _RecordingConnection()
+    as_of = pd.Timestamp("2025-06-30").date()
+
+    fact_sheets.fetch_portfolio_info(conn)
+    fact_sheets.fetch_attributes(conn)
+    fact_sheets.fetch_benchmark_links(conn)
+    fact_sheets.fetch_latest_exposures(conn, as_of)
+    fact_sheets.fetch_qualitative_sections(conn)
+    fact_sheets.fetch_active_disclosures(conn, as_of)
+
+    created = _created_tables()
+    assert len(conn.queries) == 7
+    for query in conn.queries:
+        tables = referenced_tables(query)
+        assert tables, query
+        assert set(tables) <= created, f"unknown tables {set(tables) - created} in {query}"
+
+
+def test_partition_groups_rows_by_key_in_order():
+    df = pd.DataFrame({
+        "PORTFOLIOCODE": ["P2", "P1", "P2"],
+        "ATTRIBUTETYPE": ["Domicile", "Vehicle", "Style"],
+    })
+    assert fact_sheets._partition(df) == {
+        "P2": [{"ATTRIBUTETYPE": "Domicile"}, {"ATTRIBUTETYPE": "Style"}],
+        "P1": [{"ATTRIBUTETYPE": "Vehicle"}],
+    }
+    assert fact_sheets._partition(df.iloc[:0]) == {}
+
+
+def test_build_fact_sheet_contexts_joins_each_table_per_portfolio():
+    info = pd.DataFrame({
+        "PORTFOLIOCODE": ["P1", "P2"],
+        "NAME": ["Fund One", "Fund Two"],
+        "STRATEGY": ["Global Growth Stocks", "Unknown Strategy"],
+    })
+    attributes = pd.DataFrame({
+        "PORTFOLIOCODE": ["P1", "P1"],
+        "ATTRIBUTETYPE": ["Domicile", "Vehicle"],
+        "ATTRIBUTETYPEVALUE": ["US", "Fund"],
+    })
+    benchmarks = pd.DataFrame({"PORTFOLIOCODE": ["P2"], "BENCHMARKCODE": ["^GSPC"], "BENCHMARKNAME": ["S&P 500"]})
+    exposures = pd.DataFrame({
+        "PORTFOLIOCODE": ["P1"], "HISTORYDATE": [pd.Timestamp("2025-06-30")],
+        "DIMENSION": ["SECTOR"], "DIMENSIONVALUE": ["Technology"], "NETWEIGHT": [1.0],
+    })
+    returns = pd.DataFrame({"MTD": [0.01], "YTD": [0.05]}, index=pd.Index(["P1"], name="PORTFOLIOCODE"))
+    strategy_sections = pd.DataFrame({
+        "STRATEGYNAME": ["Global Growth Stocks"], "SECTION": ["Team"], "CONTENT": ["Ten analysts."],
+    })
+
+    contexts = fact_sheets.build_fact_sheet_contexts(info, attributes, benchmarks, exposures, returns, strategy_sections)
+    by_code = {context["info"]["PORTFOLIOCODE"]: context for context in contexts}
+
+    assert [context["info"]["PORTFOLIOCODE"] for context in contexts] == ["P1", "P2"]
+    assert by_code["P1"]["attributes"] == [
+        {"ATTRIBUTETYPE": "Domicile", "ATTRIBUTETYPEVALUE": "US"},
+        {"ATTRIBUTETYPE": "Vehicle", "ATTRIBUTETYPEVALUE": "Fund"},
+    ]
+    assert by_code["P1"]["benchmarks"] == []
+    assert by_code["P2"]["benchmarks"] == [{"BENCHMARKCODE": "^GSPC", "BENCHMARKNAME": "S&P 500"}]
+    assert by_code["P1"]["exposures"][0]["DIMENSIONVALUE"] == "Technology"
+    assert by_code["P2"]["exposures"] == []
+    assert by_code["P1"]["returns"]["MTD"] == pytest.approx(0.01)
+    assert pd.isna(by_code["P1"]["returns"]["QTD"])
+    assert by_code["P2"]["returns"] == {}
+    assert by_code["P1"]["strategy_sections"] == [{"SECTION": "Team", "CONTENT": "Ten analysts."}]
+    assert by_code["P2"]["strategy_sections"] == []
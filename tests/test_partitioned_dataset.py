@@ -0,0 +1,61 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from src.insert_generate_data.generate_partitioned_dataset import (
+    run_partitioned_generation, synthetic_portfolio_codes
+)
+
+DATASETS = ("performance", "attributes", "associations")
+CONTEXT = {
+    "start_date": datetime(2020, 1, 1),
+    "end_date": datetime(2021, 12, 31),
+    "benchmarks": ["^GSPC", "^IXIC", "^DJI"],
+}
+
+
+def _generate(output_dir, max_workers, master_seed=7):
+    run_partitioned_generation(
+        synthetic_portfolio_codes(60),
+        CONTEXT,
+        datasets=DATASETS,
+        output_dir=str(output_dir),
+        master_seed=master_seed,
+        portfolios_per_shard=20,
+        max_workers=max_workers,
+    )
+
+
+def _read_dataset(output_dir, dataset):
+    directory = os.path.join(output_dir, dataset)
+    parts = [pd.read_parquet(os.path.join(directory, name)) for name in sorted(os.listdir(directory))]
+    return pd.concat(parts, ignore_index=True)
+
+
+@pytest.fixture(scope="module")
+def serial_dir(tmp_path_factory):
+    output_dir = tmp_path_factory.mktemp("serial")
+    _generate(output_dir, max_workers=1)
+    return output_dir
+
+
+@pytest.fixture(scope="module")
+def parallel_dir(tmp_path_factory):
+    output_dir = tmp_path_factory.mktemp("parallel")
+    _generate(output_dir, max_workers=3)
+    return output_dir
+
+
+@pytest.mark.parametrize("dataset", DATASETS)
+def test_same_seed_gives_same_frames_for_any_worker_count(serial_dir, parallel_dir, dataset):
+    serial = _read_dataset(serial_dir, dataset)
+    assert len(serial) > 0
+    pd.testing.assert_frame_equal(serial, _read_dataset(parallel_dir, dataset))
+
+
+def test_different_seed_gives_different_performance(serial_dir, tmp_path):
+    _generate(tmp_path, max_workers=1, master_seed=8)
+
+    assert not _read_dataset(serial_dir, "performance").equals(_read_dataset(tmp_path, "performance"))
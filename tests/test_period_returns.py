@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analytics.period_returns import PerformanceMatrix
+
+MONTH_ENDS = pd.date_range("2022-01-31", "2024-06-30", freq="ME")
+# Constant monthly returns starting at different month ends, so every figure is a power of (1 + r)
+HISTORIES = {
+    "FULL": ("2022-01-31", 0.01),      # 30 months, no 3Y track record
+    "ONEYEAR": ("2023-07-31", 0.02),   # exactly the 12 returns of the 1Y window
+    "RECENT": ("2023-10-31", 0.03),    # inception inside the 1Y window
+    "MIDYEAR": ("2024-03-31", -0.01),  # inception after the year starts, before the quarter does
+}
+
+
+@pytest.fixture(scope="module")
+def returns():
+    rows = [
+        (code, date, factor)
+        for code, (first_date, factor) in HISTORIES.items()
+        for date in MONTH_ENDS[MONTH_ENDS >= first_date]
+    ]
+    df = pd.DataFrame(rows, columns=["PORTFOLIOCODE", "HISTORYDATE", "PERFORMANCEFACTOR"])
+    return PerformanceMatrix.from_frame(df).period_returns()
+
+
+def _compound(factor, months):
+    return (1 + factor) ** months - 1
+
+
+def test_as_of_defaults_to_latest_date(returns):
+    assert (returns["ASOFDATE"] == pd.Timestamp("2024-06-30")).all()
+
+
+@pytest.mark.parametrize("code", ["FULL", "ONEYEAR", "RECENT"])
+def test_calendar_periods_compound_returns_since_period_start(returns, code):
+    factor = HISTORIES[code][1]
+    assert returns.loc[code, "MTD"] == pytest.approx(factor)
+    assert returns.loc[code, "QTD"] == pytest.approx(_compound(factor, 3))
+    assert returns.loc[code, "YTD"] == pytest.approx(_compound(factor, 6))
+
+
+def test_periods_before_inception_are_nan(returns):
+    row = returns.loc["MIDYEAR"]
+    assert row["MTD"] == pytest.approx(-0.01)
+    assert row["QTD"] == pytest.approx(_compound(-0.01, 3))
+    assert np.isnan(row["YTD"])
+
+
+def test_trailing_year_needs_a_full_year_of_returns(returns):
+    assert returns.loc["FULL", "1Y"] == pytest.approx(_compound(0.01, 12))
+    assert returns.loc["ONEYEAR", "1Y"] == pytest.approx(_compound(0.02, 12))
+    assert np.isnan(returns.loc["RECENT", "1Y"])
+    assert np.isnan(returns.loc["MIDYEAR", "1Y"])
+
+
+def test_trailing_years_longer_than_history_are_nan(returns):
+    assert returns[["3Y", "5Y", "10Y"]].isna().all().all()
+
+
+def test_since_inception_annualizes_once_a_year_has_elapsed(returns):
+    full = returns.loc["FULL"]
+    assert full["SI"] == pytest.approx(_compound(0.01, 30))
+    assert full["SI_ANN"] == pytest.approx(_compound(0.01, 12))  # 30 months is 2.5 years
+    assert full["INCEPTIONDATE"] == pd.Timestamp("2022-01-31")
+
+    one_year = returns.loc["ONEYEAR"]
+    assert one_year["SI"] == pytest.approx(_compound(0.02, 12))
+    assert one_year["SI_ANN"] == pytest.approx(one_year["SI"])
+
+    recent = returns.loc["RECENT"]
+    assert recent["SI"] == pytest.approx(_compound(0.03, 9))
+    assert recent["SI_ANN"] == pytest.approx(recent["SI"])  # under a year stays cumulative
+
+
+def test_trailing_three_years_annualized():
+    dates = pd.date_range("2020-01-31", "2024-06-30", freq="ME")
+    df = pd.DataFrame({"PORTFOLIOCODE": "LONG", "HISTORYDATE": dates, "PERFORMANCEFACTOR": 0.01})
+    row = PerformanceMatrix.from_frame(df).period_returns("2024-06-30").loc["LONG"]
+
+    assert row["3Y"] == pytest.approx(_compound(0.01, 12))
+    assert np.isnan(row["5Y"])
+    assert row["SI"] == pytest.approx(_compound(0.01, len(dates)))
+    assert row["SI_ANN"] == pytest.approx(_compound(0.01, 12))
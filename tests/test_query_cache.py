@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import src.query_cache
+from src.query_cache import QueryCache, referenced_tables
+
+
+@pytest.mark.parametrize("query, tables", [
+    ("SELECT * FROM PORTFOLIOGENERALINFO", ["PORTFOLIOGENERALINFO"]),
+    ("select p.x from portfolioperformance p where p.y = 1", ["PORTFOLIOPERFORMANCE"]),
+    (
+        "SELECT * FROM A JOIN B ON A.X = B.X LEFT OUTER JOIN C AS CC ON CC.X = A.X CROSS JOIN D",
+        ["A", "B", "C", "D"],
+    ),
+    ("SELECT * FROM A INNER JOIN B USING (X) WHERE A.Y > 0 ORDER BY 1", ["A", "B"]),
+    ("SELECT * FROM A\n  JOIN\tB\n  ON A.X = B.X;", ["A", "B"]),
+    ("SELECT 'FROM X JOIN Y' AS LABEL FROM A", ["A"]),
+    ("SELECT 1", []),
+])
+def test_referenced_tables_reads_joins_and_aliases(query, tables):
+    assert referenced_tables(query) == tables
+
+
+@pytest.mark.parametrize("query, tables", [
+    ("WITH LATEST AS (SELECT * FROM A) SELECT * FROM LATEST JOIN B ON 1 = 1", ["A", "B"]),
+    ("WITH X AS (SELECT * FROM A), Y AS (SELECT * FROM X JOIN B ON 1 = 1) SELECT * FROM Y", ["A", "B"]),
+    ("SELECT * FROM (SELECT * FROM A) S JOIN B ON S.X = B.X", ["A", "B"]),
+    ("SELECT * FROM A WHERE X IN (SELECT X FROM B WHERE Y IN (SELECT Y FROM C))", ["A", "B", "C"]),
+    ("SELECT * FROM A JOIN (SELECT X, MAX(Y) FROM B GROUP BY X) M ON M.X = A.X", ["A", "B"]),
+])
+def test_referenced_tables_excludes_ctes_and_reads_subqueries(query, tables):
+    assert referenced_tables(query) == tables
+
+
+@pytest.mark.parametrize("query", [
+    'SELECT * FROM "PortfolioGeneralInfo"',
+    'SELECT * FROM A JOIN "B" ON 1 = 1',
+    "SELECT * FROM OTHER_SCHEMA.A",
+    "SELECT * FROM DB.SCHEMA.A JOIN B ON 1 = 1",
+    "SELECT * FROM A, B",
+    "SELECT * FROM TABLE(GENERATOR(ROWCOUNT => 10))",
+    "SELECT * FROM @STAGE",
+])
+def test_referenced_tables_gives_up_on_quoted_qualified_and_unparsed_sources(query):
+    assert referenced_tables(query) is None
+
+
+class _WatermarkCursor:
+    def __init__(self, known_tables):
+        self.known_tables = known_tables
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.rows = [(name, 10, datetime(2024, 1, 1)) for name in params if name in self.known_tables]
+
+    def fetchall(self):
+        return self.rows
+
+
+class _WatermarkConnection:
+    database, schema = "DB", "PUBLIC"
+
+    def __init__(self, known_tables):
+        self.known_tables = known_tables
+
+    def cursor(self):
+        return _WatermarkCursor(self.known_tables)
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    calls = []
+
+    def fake_fetch_dataframe(query, conn, params=None, categories=()):
+        calls.append(query)
+        return pd.DataFrame({"X": [1, 2]})
+
+    monkeypatch.setattr(src.query_cache, "fetch_dataframe", fake_fetch_dataframe)
+    return calls
+
+
+def test_known_tables_are_served_from_cache(tmp_path, reads):
+    cache = QueryCache(str(tmp_path))
+    conn = _WatermarkConnection({"A"})
+
+    first = cache.read_sql("SELECT X FROM A", conn)
+    second = cache.read_sql("SELECT  X\nFROM A", conn)
+
+    pd.testing.assert_frame_equal(first, second)
+    assert len(reads) == 1
+    assert cache.stats == {"hits": 1, "misses": 1, "uncached": 0}
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT X FROM A JOIN UNKNOWN_VIEW ON 1 = 1",  # no watermark for one table
+    'SELECT X FROM "A"',                          # referenced_tables is None
+    "SELECT 1",                                   # no tables at all
+])
+def test_unwatermarked_reads_bypass_the_cache(tmp_path, reads, query):
+    cache = QueryCache(str(tmp_path))
+    conn = _WatermarkConnection({"A"})
+
+    cache.read_sql(query, conn)
+    cache.read_sql(query, conn)
+
+    assert len(reads) == 2
+    assert cache.stats == {"hits": 0, "misses": 0, "uncached": 2}
+    assert list(tmp_path.iterdir()) == []
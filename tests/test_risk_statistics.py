@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analytics.risk_statistics import compute_rolling_statistics
+
+WINDOWS = (12, 36)
+
+
+@pytest.fixture(scope="module")
+def returns():
+    rng = np.random.default_rng(3)
+    benchmark = rng.normal(0.006, 0.04, size=(4, 90))
+    portfolio = 1.1 * benchmark + rng.normal(0.001, 0.015, size=benchmark.shape)
+    portfolio[1, :20] = np.nan   # history starts late
+    benchmark[2, :7] = np.nan    # benchmark series starts late
+    portfolio[3, 40] = np.nan    # one missing month mid-history
+    return portfolio, benchmark
+
+
+@pytest.fixture(scope="module")
+def results(returns):
+    return compute_rolling_statistics(*returns, windows=WINDOWS)
+
+
+def _rolling_frame(returns, row):
+    """Portfolio, benchmark and active return series of one row, NaN wherever either is missing."""
+    portfolio, benchmark = returns
+    df = pd.DataFrame({"r": portfolio[row], "b": benchmark[row]})
+    df[df.isna().any(axis=1)] = np.nan
+    df["a"] = df["r"] - df["b"]
+    return df
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+@pytest.mark.parametrize("row", range(4))
+def test_moments_match_pandas_rolling(returns, results, window, row):
+    df = _rolling_frame(returns, row)
+    rolling = df.rolling(window)
+    mean, std = rolling.mean(), rolling.std()
+    expected_beta = df["r"].rolling(window).cov(df["b"]) / df["b"].rolling(window).var()
+    stats = results[window]
+
+    np.testing.assert_allclose(stats["VOLATILITY"][row], std["r"] * np.sqrt(12), rtol=1e-8, atol=1e-12)
+    np.testing.assert_allclose(stats["TRACKINGERROR"][row], std["a"] * np.sqrt(12), rtol=1e-8, atol=1e-12)
+    np.testing.assert_allclose(stats["INFORMATIONRATIO"][row], mean["a"] / std["a"] * np.sqrt(12), rtol=1e-7)
+    np.testing.assert_allclose(stats["SHARPERATIO"][row], mean["r"] / std["r"] * np.sqrt(12), rtol=1e-7)
+    np.testing.assert_allclose(stats["BETA"][row], expected_beta, rtol=1e-7)
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+@pytest.mark.parametrize("row", range(4))
+def test_incomplete_windows_are_nan(returns, results, window, row):
+    complete = _rolling_frame(returns, row)["r"].rolling(window).count().to_numpy() == window
+    for name, values in results[window].items():
+        assert np.array_equal(~np.isnan(values[row]), complete), name
+
+
+def test_leading_nan_windows_start_after_history(results):
+    volatility = results[12]["VOLATILITY"]
+    assert np.isnan(volatility[1, :31]).all() and not np.isnan(volatility[1, 31])
+    assert np.isnan(volatility[2, :18]).all() and not np.isnan(volatility[2, 18])
+    assert np.isnan(volatility[3, 40:52]).all() and not np.isnan(volatility[3, 52])
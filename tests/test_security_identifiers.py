@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from src.insert_generate_data.generate_insert_holdings_timeseries import (
+    cusip_check_digits, generate_cusips, isin_check_digits, isins_from_cusips
+)
+
+# Published identifiers; the last character is the check digit
+CUSIPS = ["037833100", "594918104", "02079K305", "38259P508", "459200101"]
+ISINS = [
+    "US0378331005", "US5949181045", "US02079K3059", "US38259P5089", "US4592001014",
+    "GB0002634946", "DE0007236101", "CH0038863350", "JP3633400001", "AU0000XVGZA3",
+]
+
+
+@pytest.mark.parametrize("cusip", CUSIPS)
+def test_cusip_check_digit_matches_published(cusip):
+    assert cusip_check_digits([cusip[:8]]).tolist() == [int(cusip[8])]
+
+
+@pytest.mark.parametrize("isin", ISINS)
+def test_isin_check_digit_matches_published(isin):
+    assert isin_check_digits([isin[:11]]).tolist() == [int(isin[11])]
+
+
+def test_check_digits_are_computed_per_row():
+    assert cusip_check_digits([c[:8] for c in CUSIPS]).tolist() == [int(c[8]) for c in CUSIPS]
+    assert isin_check_digits([i[:11] for i in ISINS]).tolist() == [int(i[11]) for i in ISINS]
+
+
+def test_generated_identifiers_carry_valid_check_digits():
+    cusips = generate_cusips(np.random.default_rng(0), 500)
+    isins = isins_from_cusips(cusips, ["US", "CA"] * 250)
+
+    assert cusip_check_digits([c[:8] for c in cusips]).tolist() == [int(c[8]) for c in cusips]
+    assert isin_check_digits([i[:11] for i in isins]).tolist() == [int(i[11]) for i in isins]
+    assert [i[2:11] for i in isins] == cusips.tolist()